@@ -12,9 +12,10 @@ Features:
 
 import json
 import os
+import re
 import datetime
 import asyncio
-import sqlite3
+import uuid
 import aiosqlite
 import sys
 from typing import Dict, Any, Optional, List, TypedDict
@@ -25,7 +26,10 @@ from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 # Import our professional LLM client
-from llm_client import llm_call, get_model_stats, HAIKU_MODEL, SONNET_MODEL
+from llm_client import (
+    llm_call, get_model_stats, parse_json, json_array_complete, utc_timestamp, warm_llm_connection,
+    HAIKU_MODEL, SONNET_MODEL
+)
 from nodes import planner_node as new_planner_node, worker_node as new_worker_node, analyze_node, brief_node, memory_node
 
 load_dotenv()
@@ -39,6 +43,16 @@ DB_PATH = BASE_DIR / "agent_state.db"
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
 
+# The checkpointer writes after every node; WAL with synchronous=NORMAL
+# avoids an fsync per transition, and mmap serves hot pages without read()
+CHECKPOINT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
 
 class AgentState(TypedDict):
     """State that gets passed between nodes in the graph."""
@@ -46,7 +60,8 @@ class AgentState(TypedDict):
     plan: List[str]
     current_step: int
     completed_actions: List[Dict[str, Any]]
-    messages: List[str]  # Changed from List[BaseMessage] to List[str]
+    messages: List[str]  # Changed from List[BaseMessage] to List[str]; last MESSAGE_WINDOW only
+    thread_id: str  # Checkpoint thread; keys the messages archive
     status: str  # planning, working, completed, failed, capped
     spent_today: float  # Track budget here
     last_date: str  # Track the date to reset spent_today on new day
@@ -62,6 +77,7 @@ class AgentState(TypedDict):
     brief_text: Optional[str]  # Brief text if emitted
     discovered_pools: List[str]  # Discovered pools from brief
     last_brief_at: int  # Last brief timestamp
+    completed_context: str  # Recent completed step descriptions, prebuilt for worker prompts
 
 
 def _reset_spent_if_new_day(state: AgentState) -> AgentState:
@@ -76,6 +92,121 @@ def _reset_spent_if_new_day(state: AgentState) -> AgentState:
     return state
 
 
+# Previous actions shown in worker prompts; older ones are dropped
+CONTEXT_ACTIONS = 10
+
+
+def _completed_context(state: AgentState) -> str:
+    """Bullet list of recent completed steps, built once and then extended."""
+    context = state.get("completed_context")
+    if context is None:
+        # State from before completed_context existed
+        context = "".join(
+            f"- {action['description']}\n" for action in state["completed_actions"][-CONTEXT_ACTIONS:]
+        )
+    return context
+
+
+def _extend_completed_context(context: str, descriptions: List[str]) -> str:
+    """Append step descriptions, keeping only the last CONTEXT_ACTIONS."""
+    lines = context.splitlines(keepends=True) + [f"- {description}\n" for description in descriptions]
+    return "".join(lines[-CONTEXT_ACTIONS:])
+
+
+def _step_prompt(state: AgentState, step_idx: int) -> str:
+    """Worker prompt for one plan step."""
+    return f"""
+Goal: {state['goal']}
+Current step ({step_idx + 1}/{len(state['plan'])}): {state['plan'][step_idx]}
+
+Previous completed actions:
+{_completed_context(state) or 'None'}
+
+Execute this step and provide a detailed description of what you accomplished.
+Be specific about what was done and any important findings or results.
+"""
+
+
+# Steps that consume earlier results; everything before one can run at once
+_DEPENDENT_STEP_RE = re.compile(r"\b(synthesi[sz]e|combine|summari[sz]e|compile|write)\b", re.I)
+# Concurrent LLM calls per parallel worker pass
+WORKER_CONCURRENCY = 4
+
+
+def _ready_steps(plan: List[str], start: int) -> List[int]:
+    """
+    Indices of the steps from start that can run concurrently.
+    
+    A step that synthesizes earlier results waits for everything before it,
+    so the ready set runs up to (not including) the next such step; a
+    dependent step at start runs on its own.
+    """
+    ready = [start]
+    for idx in range(start + 1, len(plan)):
+        if _DEPENDENT_STEP_RE.search(plan[idx]):
+            break
+        ready.append(idx)
+    return ready
+
+
+# Messages kept in checkpointed state; older ones go to messages_archive so
+# each checkpoint write stays the same size however long the run. Every node
+# that adds messages goes through _append_messages; the recon nodes in nodes/
+# pass them through unchanged.
+MESSAGE_WINDOW = 20
+
+
+async def _append_messages(state: AgentState, *lines: str) -> List[str]:
+    """Messages with lines appended, archiving whatever falls out of the window."""
+    messages = state["messages"] + list(lines)
+    if len(messages) <= MESSAGE_WINDOW:
+        return messages
+    
+    from json_storage import archive_messages
+    await archive_messages(state.get("thread_id", "default"), messages[:-MESSAGE_WINDOW])
+    return messages[-MESSAGE_WINDOW:]
+
+
+# First [...] span in a reply, for plans wrapped in prose or code fences
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.S)
+MAX_PLAN_STEPS = 10
+
+
+def _load_json_reply(text: str) -> Any:
+    """
+    Parse a model reply that should be JSON.
+    
+    Falls back to the bracketed array inside the reply when the whole text
+    is not JSON, so surrounding prose does not fail the step.
+    
+    Raises:
+        json.JSONDecodeError: No JSON array could be parsed
+    """
+    try:
+        return parse_json(text)
+    except json.JSONDecodeError:
+        match = _JSON_ARRAY_RE.search(text)
+        if match is None:
+            raise
+        return parse_json(match.group(0))
+
+
+def _parse_plan(text: str) -> List[str]:
+    """
+    Parse a planner reply into a list of step strings.
+    
+    Raises:
+        json.JSONDecodeError: No JSON array could be parsed
+        ValueError: The array is not 1-MAX_PLAN_STEPS non-empty strings
+    """
+    plan = _load_json_reply(text)
+    
+    if (not isinstance(plan, list) or not 1 <= len(plan) <= MAX_PLAN_STEPS
+            or not all(isinstance(step, str) and step.strip() for step in plan)):
+        raise ValueError(f"Plan must be a list of 1-{MAX_PLAN_STEPS} non-empty strings")
+    return plan
+
+
 def legacy_planner_node(state: AgentState) -> AgentState:
     """
     Planner node: Analyzes the goal and creates/updates the plan.
@@ -110,10 +241,7 @@ Goal: {state['goal']}
             max_tokens=400
         )
         
-        plan = json.loads(result["text"])
-        
-        if not isinstance(plan, list):
-            raise ValueError("Plan must be a list")
+        plan = _parse_plan(result["text"])
             
         print(f"    Created plan with {len(plan)} steps (using {result['model_used']}, cost: ${result['estimated_cost']:.6f})")
         
@@ -165,16 +293,7 @@ def legacy_worker_node(state: AgentState) -> AgentState:
     print(f"  Executing step {step_number}: {current_step_description}")
     
     # Create prompt for the worker
-    context = f"""
-Goal: {state['goal']}
-Current step ({step_number}/{len(state['plan'])}): {current_step_description}
-
-Previous completed actions:
-{json.dumps([action['description'] for action in state['completed_actions']], indent=2) if state['completed_actions'] else 'None'}
-
-Execute this step and provide a detailed description of what you accomplished.
-Be specific about what was done and any important findings or results.
-"""
+    context = _step_prompt(state, state["current_step"])
     
     try:
         # Use our professional LLM client with Haiku for execution
@@ -189,7 +308,7 @@ Be specific about what was done and any important findings or results.
             "step": state["current_step"],
             "description": current_step_description,
             "result": result["text"],
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "timestamp": utc_timestamp(),
             "usage": result["usage"],
             "model_used": result["model_used"],
             "cost": result["estimated_cost"]
@@ -220,6 +339,7 @@ Be specific about what was done and any important findings or results.
             **state,
             "current_step": new_step,
             "completed_actions": new_completed_actions,
+            "completed_context": _extend_completed_context(_completed_context(state), [current_step_description]),
             "messages": new_messages,
             "status": next_status
         }
@@ -235,7 +355,244 @@ Be specific about what was done and any important findings or results.
         }
 
 
-def budget_node(state: AgentState) -> AgentState:
+async def step_planner_node(state: AgentState) -> AgentState:
+    """
+    Planner for the step graph: turns the goal into a list of plan steps.
+    
+    A plan that still has steps left is kept, so a resumed run carries on
+    where it stopped.
+    """
+    state = _reset_spent_if_new_day(state)
+    
+    if state["plan"] and state["current_step"] < len(state["plan"]):
+        print(f"    Plan has {len(state['plan']) - state['current_step']} steps remaining")
+        return {**state, "status": "working"}
+    
+    print(f"  Planning: {state['goal']}")
+    prompt = f"""
+Create a step-by-step plan to accomplish this goal: {state['goal']}
+
+Break it down into 3-5 specific, actionable steps. Return ONLY a JSON array of strings.
+
+Example format: ["Step 1: Research X", "Step 2: Create Y", "Step 3: Test Z"]
+"""
+    
+    try:
+        result = await llm_call(
+            messages=[
+                {"role": "system", "content": "You are a concise planner."},
+                {"role": "user", "content": prompt}
+            ],
+            model=SONNET_MODEL,
+            max_tokens=400,
+            # Deterministic, so a repeated goal is served from the LLM cache
+            temperature=0
+        )
+        state = {**state, "spent_today": state.get("spent_today", 0.0) + result["estimated_cost"]}
+        plan = _parse_plan(result["text"])
+        
+        print(f"    Created plan with {len(plan)} steps (using {result['model']}, cost: ${result['estimated_cost']:.6f})")
+        
+        return {
+            **state,
+            "plan": plan,
+            "current_step": 0,
+            "messages": await _append_messages(
+                state,
+                f"AI(plan): created plan with {len(plan)} steps (cost ${result['estimated_cost']:.4f})"
+            ),
+            "status": "working"
+        }
+        
+    except Exception as e:
+        error_msg = f"Failed to create plan: {str(e)}"
+        print(f"    Error: {error_msg}")
+        
+        return {
+            **state,
+            "status": "failed",
+            "messages": await _append_messages(state, f"AI(error): {error_msg}")
+        }
+
+
+async def batch_worker_node(state: AgentState) -> AgentState:
+    """
+    Worker node variant that executes every remaining plan step in one LLM call.
+    
+    The goal and previous actions are sent once rather than once per step.
+    Only suitable for plans whose steps do not depend on each other's results;
+    use the per-step worker otherwise.
+    """
+    state = _reset_spent_if_new_day(state)
+    
+    first_step = state["current_step"]
+    steps = state["plan"][first_step:]
+    if not steps:
+        print("  All steps completed!")
+        return {**state, "status": "completed"}
+    
+    print(f"  Executing steps {first_step + 1}-{len(state['plan'])} in one call")
+    
+    step_lines = "\n".join(f"{first_step + i}: {step}" for i, step in enumerate(steps))
+    context = f"""
+Goal: {state['goal']}
+
+Previous completed actions:
+{_completed_context(state) or 'None'}
+
+Execute each of these {len(steps)} steps in order:
+{step_lines}
+
+Return ONLY a JSON array with one object per step, in the same order:
+[{{"step_idx": <step number>, "result": "<what you accomplished>"}}]
+"""
+    
+    # Charged whenever the call returns, even if its reply fails to parse
+    call_cost = 0.0
+    try:
+        result = await llm_call(
+            messages=[
+                {"role": "system", "content": "You are a precise worker."},
+                {"role": "user", "content": context}
+            ],
+            model=HAIKU_MODEL,
+            max_tokens=600 * len(steps),
+            temperature=0,
+            # Stop reading once the array closes instead of waiting out any trailing prose
+            stop_when=json_array_complete
+        )
+        call_cost = result["estimated_cost"]
+        
+        outputs = _load_json_reply(result["text"])
+        if not isinstance(outputs, list) or len(outputs) != len(steps):
+            raise ValueError(f"Expected {len(steps)} step results")
+        
+        # The call's cost is split evenly across the steps it covered
+        step_cost = result["estimated_cost"] / len(steps)
+        timestamp = utc_timestamp()
+        new_completed_actions = state["completed_actions"] + [
+            {
+                "step": first_step + i,
+                "description": step,
+                "result": output["result"],
+                "timestamp": timestamp,
+                "usage": result["usage"],
+                "model_used": result["model"],
+                "cost": step_cost
+            }
+            for i, (step, output) in enumerate(zip(steps, outputs))
+        ]
+        
+        print(f"    {len(steps)} steps completed using {result['model']} (cost: ${result['estimated_cost']:.6f})")
+        
+        return {
+            **state,
+            "current_step": len(state["plan"]),
+            "completed_actions": new_completed_actions,
+            "completed_context": _extend_completed_context(_completed_context(state), steps),
+            "messages": await _append_messages(
+                state, f"AI(work-{result['model']}): completed {len(steps)} steps in one call"
+            ),
+            "spent_today": state.get("spent_today", 0.0) + call_cost,
+            "status": "completed"
+        }
+        
+    except Exception as e:
+        error_msg = f"Failed to execute steps {first_step + 1}-{len(state['plan'])}: {str(e)}"
+        print(f"    Error: {error_msg}")
+        
+        return {
+            **state,
+            "status": "failed",
+            "messages": await _append_messages(state, f"AI(error): {error_msg}"),
+            "spent_today": state.get("spent_today", 0.0) + call_cost
+        }
+
+
+async def parallel_worker_node(state: AgentState) -> AgentState:
+    """
+    Worker node variant that runs independent plan steps concurrently.
+    
+    Each pass executes the ready set from _ready_steps with one LLM call per
+    step, at most WORKER_CONCURRENCY in flight, so the pass takes as long as
+    its slowest step instead of the sum. Steps that synthesize earlier
+    results start a new pass once those results are recorded.
+    """
+    state = _reset_spent_if_new_day(state)
+    
+    first_step = state["current_step"]
+    if first_step >= len(state["plan"]):
+        print("  All steps completed!")
+        return {**state, "status": "completed"}
+    
+    ready = _ready_steps(state["plan"], first_step)
+    print(f"  Executing steps {first_step + 1}-{ready[-1] + 1} concurrently")
+    
+    semaphore = asyncio.Semaphore(WORKER_CONCURRENCY)
+    
+    async def run_step(step_idx: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await llm_call(
+                messages=[
+                    {"role": "system", "content": "You are a precise worker."},
+                    {"role": "user", "content": _step_prompt(state, step_idx)}
+                ],
+                model=HAIKU_MODEL,
+                max_tokens=600,
+                temperature=0
+            )
+    
+    results = await asyncio.gather(*(run_step(idx) for idx in ready), return_exceptions=True)
+    
+    # Every finished call was paid for, even when a sibling step failed
+    pass_cost = sum(r["estimated_cost"] for r in results if not isinstance(r, BaseException))
+    
+    # Record results in plan order up to the first failure
+    new_completed_actions = list(state["completed_actions"])
+    descriptions = []
+    failure = None
+    timestamp = utc_timestamp()
+    for step_idx, result in zip(ready, results):
+        if isinstance(result, BaseException):
+            failure = (step_idx, result)
+            break
+        new_completed_actions.append({
+            "step": step_idx,
+            "description": state["plan"][step_idx],
+            "result": result["text"],
+            "timestamp": timestamp,
+            "usage": result["usage"],
+            "model_used": result["model"],
+            "cost": result["estimated_cost"]
+        })
+        descriptions.append(state["plan"][step_idx])
+    
+    new_step = first_step + len(descriptions)
+    if failure is not None:
+        step_idx, error = failure
+        error_msg = f"Failed to execute step {step_idx + 1}: {str(error)}"
+        print(f"    Error: {error_msg}")
+        new_messages = await _append_messages(state, f"AI(error): {error_msg}")
+        next_status = "failed"
+    else:
+        print(f"    {len(descriptions)} steps completed (cost: ${pass_cost:.6f})")
+        new_messages = await _append_messages(
+            state, f"AI(work-parallel): completed steps {first_step + 1}-{new_step}"
+        )
+        next_status = "completed" if new_step >= len(state["plan"]) else "working"
+    
+    return {
+        **state,
+        "current_step": new_step,
+        "completed_actions": new_completed_actions,
+        "completed_context": _extend_completed_context(_completed_context(state), descriptions),
+        "messages": new_messages,
+        "spent_today": state.get("spent_today", 0.0) + pass_cost,
+        "status": next_status
+    }
+
+
+async def budget_node(state: AgentState) -> AgentState:
     """Check if we've exceeded the daily budget."""
     from nodes.rich_output import formatter
     
@@ -262,14 +619,15 @@ def budget_node(state: AgentState) -> AgentState:
     formatter.log_node_progress("Budget", f"Checking limits (${spent:.2f}/${cap:.2f})")
     
     if spent >= cap:
-        state["status"] = "capped"  # Use distinct status for budget cap
-        state["messages"].append(f"Budget cap hit: ${spent:.2f}/{cap:.2f}")
         formatter.log_node_progress("Budget", f"Exceeded: ${spent:.2f}/${cap:.2f}")
-    else:
-        state["status"] = "planning"  # Continue to new planner
-        formatter.log_node_progress("Budget", "OK - continuing to planner")
+        return {
+            **state,
+            "status": "capped",  # Use distinct status for budget cap
+            "messages": await _append_messages(state, f"Budget cap hit: ${spent:.2f}/{cap:.2f}")
+        }
     
-    return state
+    formatter.log_node_progress("Budget", "OK - continuing to planner")
+    return {**state, "status": "planning"}  # Continue to new planner
 
 
 def should_continue(state: AgentState) -> str:
@@ -288,176 +646,135 @@ def should_continue(state: AgentState) -> str:
         return END
 
 
-def new_planner_wrapper(state: AgentState) -> AgentState:
-    """Wrapper to call the async planner_node."""
-    import asyncio
-    result = asyncio.run(new_planner_node(state))
-    return result
+# The graph is a fixed chain: each node either hands over to its one
+# successor or ends the run (capped, failed, nothing to do), so each gets a
+# two-way branch rather than dispatching over every node
+_SUCCESSORS = {
+    "budget": "new_plan",
+    "new_plan": "new_work",
+    "new_work": "analyze",
+    "analyze": "brief",
+}
 
 
-def new_worker_wrapper(state: AgentState) -> AgentState:
-    """Wrapper to call the async worker_node."""
-    import asyncio
-    result = asyncio.run(new_worker_node(state))
-    return result
+def _route_to(successor: str):
+    """Router for a node that continues to successor or stops."""
+    def route(state: AgentState) -> str:
+        return successor if should_continue(state) == successor else END
+    return route
 
 
-def analyze_wrapper(state: AgentState) -> AgentState:
-    """Wrapper to call the async analyze_node."""
-    import asyncio
-    result = asyncio.run(analyze_node(state))
-    return result
+# Step graph workers: "batch" runs all remaining plan steps in one call,
+# "parallel" runs each pass of independent steps concurrently
+_STEP_WORKERS = {
+    "batch": batch_worker_node,
+    "parallel": parallel_worker_node,
+}
 
 
-def brief_wrapper(state: AgentState) -> AgentState:
-    """Wrapper to call the async brief_node."""
-    import asyncio
-    result = asyncio.run(brief_node(state))
-    return result
+def _route_on(status: str, node: str):
+    """Router that goes to node while the state has status, else ends the run."""
+    def route(state: AgentState) -> str:
+        return node if state["status"] == status else END
+    return route
 
 
-def memory_wrapper(state: AgentState) -> AgentState:
-    """Wrapper to call the async memory_node."""
-    import asyncio
-    result = asyncio.run(memory_node(state))
-    return result
+def _build_step_workflow(step_mode: str) -> StateGraph:
+    """
+    Build the goal-execution graph: budget -> step_plan -> step_work.
+    
+    step_work loops on itself while plan steps remain.
+    """
+    workflow = StateGraph(AgentState)
+    workflow.add_node("budget", budget_node)
+    workflow.add_node("step_plan", step_planner_node)
+    workflow.add_node("step_work", _STEP_WORKERS[step_mode])
+    workflow.set_entry_point("budget")
+    
+    workflow.add_conditional_edges("budget", _route_on("planning", "step_plan"), ["step_plan", END])
+    workflow.add_conditional_edges("step_plan", _route_on("working", "step_work"), ["step_work", END])
+    workflow.add_conditional_edges("step_work", _route_on("working", "step_work"), ["step_work", END])
+    return workflow
+
+
+def _build_workflow(step_mode: Optional[str] = None) -> StateGraph:
+    """
+    Build the (uncompiled) agent graph.
+    
+    Args:
+        step_mode: None for the recon chain; a _STEP_WORKERS key to work
+            through an LLM-made plan for the goal instead
+    """
+    if step_mode is not None:
+        return _build_step_workflow(step_mode)
+    
+    workflow = StateGraph(AgentState)
+    
+    # Add nodes; the async nodes run on the caller's event loop
+    workflow.add_node("budget", budget_node)
+    workflow.add_node("new_plan", new_planner_node)
+    workflow.add_node("new_work", new_worker_node)
+    workflow.add_node("analyze", analyze_node)
+    workflow.add_node("brief", brief_node)
+    workflow.add_node("memory", memory_node)
+    
+    # Set entry point
+    workflow.set_entry_point("budget")
+    
+    for node, successor in _SUCCESSORS.items():
+        workflow.add_conditional_edges(node, _route_to(successor), [successor, END])
+    
+    # brief always hands over to memory, which always completes the run
+    workflow.add_edge("brief", "memory")
+    workflow.add_edge("memory", END)
+    
+    return workflow
 
 
 class LangGraphAgent:
     """Main agent class that manages the LangGraph workflow."""
     
-    def __init__(self):
-        # Set up the graph
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes
-        workflow.add_node("budget", budget_node)
-        workflow.add_node("new_plan", new_planner_wrapper)
-        workflow.add_node("new_work", new_worker_wrapper)
-        workflow.add_node("analyze", analyze_wrapper)
-        workflow.add_node("brief", brief_wrapper)
-        workflow.add_node("memory", memory_wrapper)
-        
-        # Set entry point
-        workflow.set_entry_point("budget")
-        
-        # Add conditional edges for budget node
-        workflow.add_conditional_edges(
-            "budget",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
-        
-        # Add conditional edges for new_plan node
-        workflow.add_conditional_edges(
-            "new_plan",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
-        
-        # Add conditional edges for new_work node
-        workflow.add_conditional_edges(
-            "new_work",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
-        
-        # Add conditional edges for analyze node
-        workflow.add_conditional_edges(
-            "analyze",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
-        
-        # Add conditional edges for brief node
-        workflow.add_conditional_edges(
-            "brief",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
+    def __init__(self, batch_steps: bool = False, parallel_steps: bool = False):
+        """
+        Args:
+            batch_steps: Plan the goal into steps and execute all of them in
+                one LLM call, instead of running the recon chain
+            parallel_steps: Plan the goal into steps and execute independent
+                ones concurrently, one LLM call per step
+        """
+        if batch_steps and parallel_steps:
+            raise ValueError("batch_steps and parallel_steps are mutually exclusive")
+        step_mode = "batch" if batch_steps else "parallel" if parallel_steps else None
         
-        # Add conditional edges for memory node
-        workflow.add_conditional_edges(
-            "memory",
-            should_continue,
-            {
-                "new_plan": "new_plan",
-                "new_work": "new_work",
-                "analyze": "analyze",
-                "brief": "brief",
-                "memory": "memory",
-                END: END
-            }
-        )
+        # Set up the graph
+        self._workflow = _build_workflow(step_mode)
         
         # Set up SQLite persistence
         self.db_path = str(DB_PATH)
         self._checkpointer_cache = None
-        self.app = workflow.compile()
+        self.app = self._workflow.compile()
+        
+        # Pay the LiteLLM connection setup during startup rather than in the
+        # first planner call; only possible when constructed inside a loop
+        self._warmup = None
+        try:
+            self._warmup = asyncio.get_running_loop().create_task(warm_llm_connection())
+        except RuntimeError:
+            pass
         
     async def _get_checkpointer(self):
         """Get or create the async checkpointer.
         
-        Note: This duplicates the workflow graph setup because LangGraph requires the
-        checkpointer to be attached during graph compilation - it can't be added to an
-        already-compiled graph. While redundant, this is a framework limitation.
-        The checkpointer needs to track state transitions between nodes, not just
-        save final state to the DB.
+        LangGraph attaches the checkpointer at compile time, so the first call
+        recompiles the graph built in __init__ with it. The checkpointer tracks
+        state transitions between nodes, not just the final state.
         """
         if self._checkpointer_cache is None:
             conn = await aiosqlite.connect(self.db_path)
+            for pragma in CHECKPOINT_PRAGMAS:
+                await conn.execute(pragma)
             self._checkpointer_cache = AsyncSqliteSaver(conn)
-            # Recompile the app with checkpointer
-            workflow = StateGraph(AgentState)
-            workflow.add_node("budget", budget_node)
-            workflow.add_node("new_plan", new_planner_wrapper)
-            workflow.add_node("new_work", new_worker_wrapper)
-            workflow.add_node("analyze", analyze_wrapper)
-            workflow.add_node("brief", brief_wrapper)
-            workflow.add_node("memory", memory_wrapper)
-            workflow.set_entry_point("budget")
-            workflow.add_conditional_edges("budget", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            workflow.add_conditional_edges("new_plan", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            workflow.add_conditional_edges("new_work", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            workflow.add_conditional_edges("analyze", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            workflow.add_conditional_edges("brief", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            workflow.add_conditional_edges("memory", should_continue, {"new_plan": "new_plan", "new_work": "new_work", "analyze": "analyze", "brief": "brief", "memory": "memory", END: END})
-            self.app = workflow.compile(checkpointer=self._checkpointer_cache)
+            self.app = self._workflow.compile(checkpointer=self._checkpointer_cache)
         return self._checkpointer_cache
         
     async def run(self, goal: str, thread_id: str = "default") -> AgentState:
@@ -480,6 +797,7 @@ class LangGraphAgent:
             "current_step": 0,
             "completed_actions": [],
             "messages": [f"Human: Goal: {goal}"],  # Use strings instead of BaseMessage
+            "thread_id": thread_id,
             "status": "planning",
             "spent_today": 0.0,  # Track budget here
             "last_date": datetime.date.today().isoformat(),  # Initialize with today's date
@@ -494,7 +812,8 @@ class LangGraphAgent:
             "signals": {},
             "brief_text": None,
             "discovered_pools": [],
-            "last_brief_at": 0
+            "last_brief_at": 0,
+            "completed_context": ""
         }
         
         try:
@@ -515,8 +834,38 @@ class LangGraphAgent:
             initial_state["messages"].append(f"AI(error): Execution failed: {str(e)}")
             return initial_state
     
-    async def resume(self, thread_id: str = "default") -> Optional[AgentState]:
-        """Resume an existing conversation."""
+    async def run_many(self, goals: List[str], max_concurrency: int = 10) -> List[AgentState]:
+        """
+        Run the agent for several goals concurrently, each on its own thread.
+        
+        Args:
+            goals: Goals to work toward
+            max_concurrency: Maximum runs in flight at once; keep this below
+                the LiteLLM rate limit since each run makes its own LLM calls
+        
+        Returns:
+            Final states in the same order as goals
+        """
+        # Attach the checkpointer up front so concurrent runs share one
+        await self._get_checkpointer()
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _run_one(goal: str) -> AgentState:
+            async with semaphore:
+                return await self.run(goal, thread_id=f"bulk-{uuid.uuid4()}")
+        
+        return await asyncio.gather(*(_run_one(goal) for goal in goals))
+    
+    async def resume(self, thread_id: str = "default", full_history: bool = False) -> Optional[AgentState]:
+        """
+        Resume an existing conversation.
+        
+        Args:
+            thread_id: Thread to continue
+            full_history: Prepend archived messages to the final state's
+                messages; by default only the last MESSAGE_WINDOW are kept
+        """
         try:
             print(f"Resuming thread: {thread_id}")
             
@@ -539,26 +888,31 @@ class LangGraphAgent:
                     # Node completion is now handled by the output formatter
                     final_state = node_state
             
+            if full_history and final_state is not None:
+                from json_storage import get_archived_messages
+                final_state["messages"] = await get_archived_messages(thread_id) + final_state["messages"]
+            
             return final_state
             
         except Exception as e:
             print(f"Error resuming thread {thread_id}: {e}")
             return None
     
-    def list_threads(self) -> List[str]:
+    async def list_threads(self) -> List[str]:
         """List all available thread IDs."""
         try:
-            # Query the SQLite database directly
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.execute("SELECT DISTINCT thread_id FROM checkpoints")
-            threads = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return threads
+            # Query through the checkpointer's connection rather than
+            # opening a second, blocking one on the same file
+            checkpointer = await self._get_checkpointer()
+            async with checkpointer.conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cursor:
+                return [row[0] for row in await cursor.fetchall()]
         except Exception:
-            return []  # Return empty if no database or error
+            return []  # Return empty if no checkpoints table yet or error
     
     async def close(self):
         """Close the database connection."""
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
         if hasattr(self, '_checkpointer_cache') and self._checkpointer_cache:
             if hasattr(self._checkpointer_cache, 'conn'):
                 await self._checkpointer_cache.conn.close()
@@ -579,10 +933,11 @@ async def main():
         print("=" * 60)
         
         # Check if we have an existing session
-        existing_threads = agent.list_threads()
+        existing_threads = await agent.list_threads()
         if thread_id in existing_threads:
             print(f"📂 Found existing thread: {thread_id}")
-            choice = input("Resume existing session? (y/n): ").lower()
+            # Prompt off the loop so the connection warm-up keeps running meanwhile
+            choice = (await asyncio.to_thread(input, "Resume existing session? (y/n): ")).lower()
             if choice == 'y':
                 final_state = await agent.resume(thread_id)
                 if final_state:
@@ -17,6 +17,7 @@ from nodes.config import DEBUG, is_discord_enabled
 from wallet_service import WalletService
 from nodes.rich_output import formatter
 from agent import LangGraphAgent
+from llm_client import close_llm_client
 
 
 class CLIError(Exception):
@@ -125,7 +126,7 @@ async def run_wallet_brief_mode() -> int:
         # Handle Discord notification if brief was generated
         if final_state.get('brief_text') and not final_state.get('brief_skipped', False):
             if is_discord_enabled():
-                from discord_notifier import send_discord_notification
+                from discord_notifier import send_discord_notification, close_notifier
                 
                 try:
                     success = await send_discord_notification(
@@ -150,6 +151,8 @@ async def run_wallet_brief_mode() -> int:
                     formatter.update_execution_data(
                         notifications=[f"Discord: Error - {str(e)}"]
                     )
+                finally:
+                    await close_notifier()
             else:
                 formatter.update_execution_data(
                     notifications=["Discord: Notifications disabled (no webhook configured)"]
@@ -171,6 +174,7 @@ async def run_wallet_brief_mode() -> int:
     finally:
         if agent:
             await agent.close()  # Close the database connection
+        await close_llm_client()
 
 
 async def run_legacy_mode(args: argparse.Namespace) -> None:
@@ -179,7 +183,7 @@ async def run_legacy_mode(args: argparse.Namespace) -> None:
     
     try:
         if args.list:
-            threads = agent.list_threads()
+            threads = await agent.list_threads()
             print("Available threads:")
             for thread in threads:
                 print(f"  - {thread}")
@@ -203,6 +207,7 @@ async def run_legacy_mode(args: argparse.Namespace) -> None:
         
     finally:
         await agent.close()  # Close the database connection
+        await close_llm_client()
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -17,7 +17,13 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 import logging
-from dataclasses import dataclass, asdict
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
+from dataclasses import dataclass, asdict, fields
+
+from json_storage import DECODE_ERRORS, json_bytes, payload_json
+from json_storage import compute_content_hash  # noqa: F401 - part of this module's API
 
 # Use the same database as the agent
 BASE_DIR = Path(__file__).resolve().parent
@@ -34,8 +40,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Max provenance chains kept per data model instance
+PROVENANCE_CACHE_SIZE = 256
+
+
+def _dumps_raw(obj: Any) -> str:
+    """Serialize a raw payload to JSON text."""
+    return json_bytes(obj).decode()
+
 
-@dataclass
+@dataclass(slots=True)
 class NormalizedEvent:
     """Normalized event schema for recurring entities."""
     event_id: str  # Deterministic: f"{txHash}:{logIndex}"
@@ -48,7 +62,17 @@ class NormalizedEvent:
     chain: str = "base"  # Default to base chain
 
 
-@dataclass
+# Event fields serialized alongside the value JSON in normalize_events_bulk's JSON lines
+_EVENT_JSON_FIELDS = tuple(f.name for f in fields(NormalizedEvent) if f.name != "value")
+
+
+def _event_json_line(event: NormalizedEvent, value_json: str) -> bytes:
+    """One JSON line for event, splicing in the value JSON stored in its row."""
+    head = json.dumps({name: getattr(event, name) for name in _EVENT_JSON_FIELDS})
+    return f'{head[:-1]}, "value": {value_json}}}\n'.encode()
+
+
+@dataclass(slots=True)
 class Artifact:
     """Human-readable summary artifact."""
     artifact_id: str  # Deterministic: f"brief_{timestamp}"
@@ -71,6 +95,8 @@ class ThreeLayerDataModel:
     
     def __init__(self, db_path: Path):
         self.db_path = db_path
+        # artifact_id -> provenance chain, least recently used first
+        self._provenance_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
     
     async def initialize(self):
         """Initialize database with three-layer schema."""
@@ -101,6 +127,21 @@ class ThreeLayerDataModel:
             # Column already exists, ignore
             pass
         
+        # Add content hash column if it doesn't exist
+        try:
+            await conn.execute("ALTER TABLE json_cache_scratch ADD COLUMN content_hash TEXT")
+        except:
+            # Column already exists, ignore
+            pass
+        
+        # Compressed payload columns written by json_storage; read back here
+        for column in ("raw_blob BLOB", "codec TEXT"):
+            try:
+                await conn.execute(f"ALTER TABLE json_cache_scratch ADD COLUMN {column}")
+            except:
+                # Column already exists, ignore
+                pass
+        
         # Layer 2: Normalized Events
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS normalized_events (
@@ -175,21 +216,36 @@ class ThreeLayerDataModel:
     
     # Layer 1: Scratch JSON Cache (extended)
     async def save_raw_response(self, response_id: str, source: str, raw_data: Dict[str, Any], 
-                               provenance: Optional[Dict[str, Any]] = None) -> str:
-        """Save raw API/MCP response to scratch cache."""
+                               provenance: Optional[Dict[str, Any]] = None,
+                               content_hash: Optional[str] = None) -> str:
+        """
+        Save raw API/MCP response to scratch cache.
+        
+        When content_hash (see compute_content_hash) matches the stored row,
+        the write is skipped.
+        """
         conn = await self._get_connection()
         
         try:
+            if content_hash:
+                async with conn.execute("""
+                    SELECT 1 FROM json_cache_scratch WHERE id = ? AND content_hash = ?
+                """, (response_id, content_hash)) as cursor:
+                    if await cursor.fetchone():
+                        logger.debug(f"Raw response unchanged, skipped write: {response_id}")
+                        return response_id
+            
             # Validate JSON serialization
-            raw_json = json.dumps(raw_data)
+            raw_json = _dumps_raw(raw_data)
             provenance_json = json.dumps(provenance) if provenance else None
             
             await conn.execute("""
-                INSERT OR REPLACE INTO json_cache_scratch (id, source, raw_json, provenance)
-                VALUES (?, ?, ?, ?)
-            """, (response_id, source, raw_json, provenance_json))
+                INSERT OR REPLACE INTO json_cache_scratch (id, source, raw_json, provenance, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+            """, (response_id, source, raw_json, provenance_json, content_hash))
             
             await conn.commit()
+            self._provenance_cache.clear()
             logger.debug(f"Saved raw response: {response_id} from {source}")
             return response_id
             
@@ -202,18 +258,18 @@ class ThreeLayerDataModel:
         
         try:
             async with conn.execute("""
-                SELECT raw_json, provenance FROM json_cache_scratch WHERE id = ?
+                SELECT raw_json, raw_blob, codec, provenance FROM json_cache_scratch WHERE id = ?
             """, (response_id,)) as cursor:
                 row = await cursor.fetchone()
                 
                 if row:
-                    raw_json, provenance = row
+                    raw_json, raw_blob, codec, provenance = row
                     try:
-                        data = json.loads(raw_json)
+                        data = json.loads(payload_json(raw_json, raw_blob, codec))
                         if provenance:
                             data['_provenance'] = json.loads(provenance)
                         return data
-                    except json.JSONDecodeError:
+                    except DECODE_ERRORS:
                         logger.warning(f"Corrupted JSON data for id: {response_id}")
                         return None
                 return None
@@ -239,12 +295,50 @@ class ThreeLayerDataModel:
             ))
             
             await conn.commit()
+            self._provenance_cache.clear()
             logger.debug(f"Normalized event: {event.event_id} ({event.event_type})")
             return event.event_id
             
         finally:
             await conn.close()
     
+    async def normalize_events_bulk(self, events: List[NormalizedEvent], out_fh=None) -> List[str]:
+        """
+        Save a batch of normalized events in a single transaction.
+        
+        When out_fh (a binary file) is given, the saved events are also
+        written to it as JSON lines, reusing each row's value JSON.
+        """
+        if not events:
+            return []
+        
+        value_jsons = [json.dumps(event.value) for event in events]
+        conn = await self._get_connection()
+        
+        try:
+            await conn.executemany("""
+                INSERT OR REPLACE INTO normalized_events 
+                (event_id, wallet, event_type, pool, value, timestamp, source_id, chain)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    event.event_id, event.wallet, event.event_type, event.pool,
+                    value_json, event.timestamp, event.source_id, event.chain
+                )
+                for event, value_json in zip(events, value_jsons)
+            ])
+            
+            await conn.commit()
+            self._provenance_cache.clear()
+            logger.debug(f"Normalized {len(events)} events in bulk")
+        finally:
+            await conn.close()
+        
+        if out_fh is not None:
+            for event, value_json in zip(events, value_jsons):
+                out_fh.write(_event_json_line(event, value_json))
+        return [event.event_id for event in events]
+    
     async def get_events_by_wallet(self, wallet: str, since_ts: int = 0) -> List[NormalizedEvent]:
         """Get normalized events for a wallet since timestamp."""
         conn = await self._get_connection()
@@ -257,7 +351,7 @@ class ThreeLayerDataModel:
                 WHERE wallet = ? AND timestamp >= ?
                 ORDER BY timestamp DESC
             """, (wallet, since_ts)) as cursor:
-                async for row in cursor:
+                for row in await cursor.fetchall():
                     event_id, wallet, event_type, pool, value_json, timestamp, source_id, chain = row
                     try:
                         value = json.loads(value_json)
@@ -291,7 +385,7 @@ class ThreeLayerDataModel:
                 WHERE event_type = ? AND timestamp >= ?
                 ORDER BY timestamp DESC
             """, (event_type, since_ts)) as cursor:
-                async for row in cursor:
+                for row in await cursor.fetchall():
                     event_id, wallet, event_type, pool, value_json, timestamp, source_id, chain = row
                     try:
                         value = json.loads(value_json)
@@ -325,7 +419,7 @@ class ThreeLayerDataModel:
                 WHERE timestamp >= ?
                 ORDER BY timestamp DESC
             """, (since_ts,)) as cursor:
-                async for row in cursor:
+                for row in await cursor.fetchall():
                     event_id, wallet, event_type, pool, value_json, timestamp, source_id, chain = row
                     try:
                         value = json.loads(value_json)
@@ -374,6 +468,7 @@ class ThreeLayerDataModel:
             ))
             
             await conn.commit()
+            self._provenance_cache.pop(artifact.artifact_id, None)
             logger.debug(f"Persisted artifact: {artifact.artifact_id}")
             return artifact.artifact_id
             
@@ -393,7 +488,7 @@ class ThreeLayerDataModel:
                 ORDER BY timestamp DESC 
                 LIMIT ?
             """, (limit,)) as cursor:
-                async for row in cursor:
+                for row in await cursor.fetchall():
                     (artifact_id, timestamp, summary_text, signals_json, discovered_pools_json, source_ids_json, event_count,
                      summary_text_llm, llm_struct_json, llm_validation_json, llm_model, llm_tokens) = row
                     try:
@@ -450,6 +545,7 @@ class ThreeLayerDataModel:
             """.format(artifacts_days))
             
             await conn.commit()
+            self._provenance_cache.clear()
             
             logger.info(f"Cleanup: {scratch_deleted.rowcount} scratch, {events_deleted.rowcount} events, {artifacts_deleted.rowcount} artifacts")
             
@@ -458,32 +554,82 @@ class ThreeLayerDataModel:
     
     # Provenance tracking
     async def get_provenance_chain(self, artifact_id: str) -> Dict[str, Any]:
-        """Get full provenance chain from artifact back to raw responses."""
+        """
+        Get full provenance chain from artifact back to raw responses.
+        
+        Chains are cached per artifact until a write to any layer could change
+        them; the returned dict is shared and must not be mutated.
+        """
+        cached = self._provenance_cache.get(artifact_id)
+        if cached is not None:
+            self._provenance_cache.move_to_end(artifact_id)
+            return cached
+        
+        chain = await self._load_provenance_chain(artifact_id)
+        if chain:
+            self._provenance_cache[artifact_id] = chain
+            if len(self._provenance_cache) > PROVENANCE_CACHE_SIZE:
+                self._provenance_cache.popitem(last=False)
+        return chain
+    
+    async def _load_provenance_chain(self, artifact_id: str) -> Dict[str, Any]:
+        """Build the provenance chain for an artifact from the database."""
         conn = await self._get_connection()
         
         try:
-            # Get artifact
+            # Artifact, its sources, their raw rows and events in one query:
+            # one row per (source, event), or per source when it has no events
             async with conn.execute("""
-                SELECT source_ids FROM artifacts WHERE artifact_id = ?
+                SELECT s.key, s.value, r.raw_json, r.raw_blob, r.codec, r.provenance,
+                       e.event_id, e.wallet, e.event_type, e.pool, e.value, e.timestamp, e.source_id, e.chain
+                FROM artifacts a
+                LEFT JOIN json_each(a.source_ids) s
+                LEFT JOIN json_cache_scratch r ON r.id = s.value
+                LEFT JOIN normalized_events e ON e.source_id = s.value
+                WHERE a.artifact_id = ?
+                ORDER BY s.key, e.timestamp DESC
             """, (artifact_id,)) as cursor:
-                row = await cursor.fetchone()
-                if not row:
-                    return {}
-                
-                source_ids = json.loads(row[0])
+                rows = await cursor.fetchall()
             
-            # Get source raw responses
-            raw_responses = []
-            for source_id in source_ids:
-                response = await self.get_raw_response(source_id)
-                if response:
-                    raw_responses.append(response)
+            if not rows:
+                return {}
             
-            # Get events from those sources
+            raw_responses = []
             events = []
-            for source_id in source_ids:
-                source_events = await self.get_events_by_source(source_id)
-                events.extend(source_events)
+            for source_key, source_rows in groupby(rows, key=itemgetter(0)):
+                if source_key is None:
+                    # Artifact has no source_ids
+                    continue
+                
+                source_rows = list(source_rows)
+                _, source_id, raw_json, raw_blob, codec, provenance = source_rows[0][:6]
+                if raw_json is not None:
+                    try:
+                        data = json.loads(payload_json(raw_json, raw_blob, codec))
+                        if provenance:
+                            data['_provenance'] = json.loads(provenance)
+                        if data:
+                            raw_responses.append(data)
+                    except DECODE_ERRORS:
+                        logger.warning(f"Corrupted JSON data for id: {source_id}")
+                
+                for row in source_rows:
+                    event_id, wallet, event_type, pool, value_json, timestamp, event_source_id, chain = row[6:]
+                    if event_id is None:
+                        continue
+                    try:
+                        events.append(NormalizedEvent(
+                            event_id=event_id,
+                            wallet=wallet,
+                            event_type=event_type,
+                            pool=pool,
+                            value=json.loads(value_json),
+                            timestamp=timestamp,
+                            source_id=event_source_id,
+                            chain=chain
+                        ))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Corrupted event value for: {event_id}")
             
             return {
                 "artifact_id": artifact_id,
@@ -506,7 +652,7 @@ class ThreeLayerDataModel:
                 WHERE source_id = ?
                 ORDER BY timestamp DESC
             """, (source_id,)) as cursor:
-                async for row in cursor:
+                for row in await cursor.fetchall():
                     event_id, wallet, event_type, pool, value_json, timestamp, source_id, chain = row
                     try:
                         value = json.loads(value_json)
@@ -543,16 +689,22 @@ async def get_data_model() -> ThreeLayerDataModel:
 
 # Convenience functions for the three layers
 async def save_raw_response(response_id: str, source: str, raw_data: Dict[str, Any], 
-                           provenance: Optional[Dict[str, Any]] = None) -> str:
+                           provenance: Optional[Dict[str, Any]] = None,
+                           content_hash: Optional[str] = None) -> str:
     """Save raw API/MCP response to scratch cache."""
     model = await get_data_model()
-    return await model.save_raw_response(response_id, source, raw_data, provenance)
+    return await model.save_raw_response(response_id, source, raw_data, provenance, content_hash)
 
 async def normalize_event(event: NormalizedEvent) -> str:
     """Save normalized event with provenance tracking."""
     model = await get_data_model()
     return await model.normalize_event(event)
 
+async def normalize_events_bulk(events: List[NormalizedEvent], out_fh=None) -> List[str]:
+    """Save a batch of normalized events in a single transaction, optionally as JSON lines to out_fh."""
+    model = await get_data_model()
+    return await model.normalize_events_bulk(events, out_fh)
+
 async def persist_brief(artifact: Artifact) -> str:
     """Persist human-readable brief artifact."""
     model = await get_data_model()
@@ -0,0 +1,46 @@
+"""
+Shared helpers for the demo scripts.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        """Serialize obj to compact JSON text."""
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def dumps(obj) -> str:
+        """Serialize obj to compact JSON text."""
+        return json.dumps(obj, separators=(",", ":"))
+
+# Literals repeated across demo fixtures, interned once so every event
+# and raw payload shares the same string objects
+CHAIN_BASE = sys.intern("base")
+KIND_WALLET_ACTIVITY = sys.intern("wallet_activity")
+EVENT_SWAP = sys.intern("swap")
+EVENT_LP_ADD = sys.intern("lp_add")
+POOL_WETH_USDC = sys.intern("WETH/USDC")
+
+@contextlib.contextmanager
+def temp_env(key: str, value: str):
+    """Set an environment variable for the duration of the block."""
+    original = os.environ.get(key)
+    os.environ[key] = value
+    try:
+        yield
+    finally:
+        if original is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = original
+
+# Bounds concurrent DB-touching coroutines in demos that fan out with
+# asyncio.gather. SQLite has a single writer even under WAL, so keeping
+# the queue short avoids SQLITE_BUSY retries.
+DEMO_CONCURRENCY = asyncio.Semaphore(int(os.getenv("DEMO_CONCURRENCY", "4")))
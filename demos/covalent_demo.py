@@ -7,7 +7,7 @@ Tests Covalent adapter integration with pagination and cursor management.
 import os
 import asyncio
 import sys
-from datetime import datetime
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -76,10 +76,10 @@ async def demo_covalent_integration():
         if events:
             print("   💡 Sample transactions:")
             for i, event in enumerate(events[:3]):
-                ts = datetime.fromtimestamp(event.get('ts', 0))
+                hhmm = time.strftime('%H:%M', time.localtime(event.get('ts', 0)))
                 event_type = event.get('type', 'unknown')
                 counterparty = event.get('counterparty', 'unknown')[:10]
-                print(f"      {i+1}. {ts.strftime('%H:%M')} - {event_type} with {counterparty}...")
+                print(f"      {i+1}. {hhmm} - {event_type} with {counterparty}...")
 
         print()
         print("🎉 Covalent integration test completed successfully!")
@@ -4,9 +4,13 @@ Demo script for the integrated Planner/Worker flow using the main agent.
 """
 import asyncio
 import json
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
+# Add parent directory to path to import agent
+sys.path.append(str(Path(__file__).parent.parent))
+
 from agent import LangGraphAgent
 
 
@@ -51,8 +55,8 @@ async def demo_complete_flow():
             print(f"   Events retrieved: {len(result.get('events', []))}")
         if 'brief_text' in result and result.get('brief_text'):
             print(f"   Brief emitted: {len(result.get('brief_text', ''))} chars")
-        if 'next_watchlist' in result:
-            print(f"   Next watchlist: {result.get('next_watchlist')}")
+        if 'discovered_pools' in result:
+            print(f"   Discovered pools: {result.get('discovered_pools')}")
         
         print()
         
@@ -69,6 +73,9 @@ async def demo_complete_flow():
         print(f"❌ Error running agent: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Clean up agent resources
+        await agent.close()
 
 
 async def demo_multiple_runs():
@@ -95,6 +102,8 @@ async def demo_multiple_runs():
         except Exception as e:
             print(f"   Error: {e}")
     
+    # Clean up agent resources
+    await agent.close()
     print("\n✅ Multiple runs completed!")
 
 
@@ -4,11 +4,11 @@ Demo for LLM-backed briefs with different modes and token management.
 """
 
 import sys
-import json
 import asyncio
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import patch, AsyncMock
+from types import MappingProxyType
+from unittest.mock import patch
 sys.path.append(str(Path(__file__).parent.parent))
 
 from nodes.config import (
@@ -20,19 +20,20 @@ from nodes.brief_utils import estimate_tokens, reduce_events
 from data_model import (
     ThreeLayerDataModel, NormalizedEvent, Artifact,
     save_raw_response, normalize_event, persist_brief,
-    get_events_by_wallet, get_recent_briefs
+    get_events_by_wallet, get_recent_briefs, get_data_model
 )
+from _shared import CHAIN_BASE, EVENT_LP_ADD, dumps
 
 # Test fixtures
 MOCK_EVENT = NormalizedEvent(
     event_id="tx123:0",
     wallet="0x123",
-    event_type="lp_add",
+    event_type=EVENT_LP_ADD,
     pool="pool123",
     value={"usd_value": 1000},
     timestamp=int(datetime.now().timestamp()),
     source_id="source123",
-    chain="base"
+    chain=CHAIN_BASE
 )
 
 MOCK_SIGNALS = {
@@ -43,34 +44,49 @@ MOCK_SIGNALS = {
     "lp_churn_rate_24h": 0.42
 }
 
+# Encoded once at import; every mocked llm_call returns the same text
+MOCK_LLM_STRUCT = {
+    "summary_text": "Test LLM brief summary",
+    "struct": {
+        "top_wallets": [{"address": "0x123", "score": 0.95, "reason": "High activity"}],
+        "notable_events": [{"type": EVENT_LP_ADD, "pool": "pool123", "usd": 1000, "why": "Large add"}],
+        "signals": {"churn": 0.42, "concentration": "high"},
+        "risk_flags": ["price_divergence_possible"],
+        "confidence": 0.77
+    },
+    "validation": {
+        "consistency_ok": True,
+        "discrepancies": []
+    }
+}
+
+MOCK_LLM_TEXT = dumps(MOCK_LLM_STRUCT)
+
 MOCK_LLM_RESPONSE = {
-    "text": json.dumps({
-        "summary_text": "Test LLM brief summary",
-        "struct": {
-            "top_wallets": [{"address": "0x123", "score": 0.95, "reason": "High activity"}],
-            "notable_events": [{"type": "lp_add", "pool": "pool123", "usd": 1000, "why": "Large add"}],
-            "signals": {"churn": 0.42, "concentration": "high"},
-            "risk_flags": ["price_divergence_possible"],
-            "confidence": 0.77
-        },
-        "validation": {
-            "consistency_ok": True,
-            "discrepancies": []
-        }
-    }),
+    "text": MOCK_LLM_TEXT,
     "usage": {"total_tokens": 500},
     "model": "haiku",
     "estimated_cost": 0.001
 }
 
+async def _fake_llm_call(messages, model=None, **_):
+    """Stand-in for llm_call that returns the canned response."""
+    return MOCK_LLM_RESPONSE
+
+# Read-only template; each demo takes its own shallow copy
+_BASE_BRIEF_STATE = MappingProxyType({
+    "last24h_counts": {EVENT_LP_ADD: 5},
+    "signals": MOCK_SIGNALS,
+    "last_brief_at": 0,
+    "source_ids": ("test_source",)
+})
+
 async def demo_deterministic_mode():
     """Demo deterministic brief mode."""
-    print("\n📋 Deterministic Mode Demo")
-    print("=" * 50)
+    print("\n📋 Deterministic Mode Demo", "=" * 50, sep="\n")
     
-    # Initialize data model
-    data_model = ThreeLayerDataModel(Path("agent_state.db"))
-    await data_model.initialize()
+    # Same data model brief_node persists to, so the brief can be read back
+    data_model = await get_data_model()
     
     # Create test events
     events = [MOCK_EVENT]
@@ -86,34 +102,30 @@ async def demo_deterministic_mode():
         await data_model.normalize_event(event)
     
     # Run brief node in deterministic mode
-    with patch("nodes.config.BRIEF_MODE", "deterministic"):
-        state = {
-            "last24h_counts": {"lp_add": 5},
-            "signals": MOCK_SIGNALS,
-            "last_brief_at": 0,
-            "source_ids": ["test_source"]
-        }
+    with patch("nodes.brief.BRIEF_MODE", "deterministic"):
+        state = dict(_BASE_BRIEF_STATE)
         result = await brief_node(state)
         
-        print("✅ Brief generated:")
-        print(f"📝 Content: {result['brief_text']}")
-        print(f"📋 Next Watchlist: {result['next_watchlist']}")
-        print("🔍 LLM fields should be None:")
         briefs = await data_model.get_recent_briefs(1)
-        print(f"   - summary_text_llm: {briefs[0].summary_text_llm}")
-        print(f"   - llm_struct: {briefs[0].llm_struct}")
-        print(f"   - llm_validation: {briefs[0].llm_validation}")
-        print(f"   - llm_model: {briefs[0].llm_model}")
-        print(f"   - llm_tokens: {briefs[0].llm_tokens}")
+        print(
+            "✅ Brief generated:",
+            f"📝 Content: {result['brief_text']}",
+            f"📋 Discovered Pools: {result['discovered_pools']}",
+            "🔍 LLM fields should be None:",
+            f"   - summary_text_llm: {briefs[0].summary_text_llm}",
+            f"   - llm_struct: {briefs[0].llm_struct}",
+            f"   - llm_validation: {briefs[0].llm_validation}",
+            f"   - llm_model: {briefs[0].llm_model}",
+            f"   - llm_tokens: {briefs[0].llm_tokens}",
+            sep="\n"
+        )
 
 async def demo_llm_mode():
     """Demo LLM brief mode."""
-    print("\n📋 LLM Mode Demo")
-    print("=" * 50)
+    print("\n📋 LLM Mode Demo", "=" * 50, sep="\n")
     
-    # Initialize data model
-    data_model = ThreeLayerDataModel(Path("agent_state.db"))
-    await data_model.initialize()
+    # Same data model brief_node persists to, so the brief can be read back
+    data_model = await get_data_model()
     
     # Create test events
     events = [MOCK_EVENT]
@@ -129,35 +141,31 @@ async def demo_llm_mode():
         await data_model.normalize_event(event)
     
     # Run brief node in LLM mode
-    with patch("nodes.config.BRIEF_MODE", "llm"), \
-         patch("nodes.brief_llm.llm_call", AsyncMock(return_value=MOCK_LLM_RESPONSE)):
-        state = {
-            "last24h_counts": {"lp_add": 5},
-            "signals": MOCK_SIGNALS,
-            "last_brief_at": 0,
-            "source_ids": ["test_source"]
-        }
+    with patch("nodes.brief.BRIEF_MODE", "llm"), \
+         patch("nodes.brief_llm.llm_call", _fake_llm_call):
+        state = dict(_BASE_BRIEF_STATE)
         result = await brief_node(state)
         
-        print("✅ Brief generated:")
-        print(f"📝 Content: {result['brief_text']}")
-        print(f"📋 Next Watchlist: {result['next_watchlist']}")
-        print("🔍 LLM fields should be populated:")
         briefs = await data_model.get_recent_briefs(1)
-        print(f"   - summary_text_llm: {briefs[0].summary_text_llm}")
-        print(f"   - llm_struct: {briefs[0].llm_struct}")
-        print(f"   - llm_validation: {briefs[0].llm_validation}")
-        print(f"   - llm_model: {briefs[0].llm_model}")
-        print(f"   - llm_tokens: {briefs[0].llm_tokens}")
+        print(
+            "✅ Brief generated:",
+            f"📝 Content: {result['brief_text']}",
+            f"📋 Discovered Pools: {result['discovered_pools']}",
+            "🔍 LLM fields should be populated:",
+            f"   - summary_text_llm: {briefs[0].summary_text_llm}",
+            f"   - llm_struct: {briefs[0].llm_struct}",
+            f"   - llm_validation: {briefs[0].llm_validation}",
+            f"   - llm_model: {briefs[0].llm_model}",
+            f"   - llm_tokens: {briefs[0].llm_tokens}",
+            sep="\n"
+        )
 
 async def demo_both_mode():
     """Demo both (deterministic + LLM) brief mode."""
-    print("\n📋 Both Mode Demo")
-    print("=" * 50)
+    print("\n📋 Both Mode Demo", "=" * 50, sep="\n")
     
-    # Initialize data model
-    data_model = ThreeLayerDataModel(Path("agent_state.db"))
-    await data_model.initialize()
+    # Same data model brief_node persists to, so the brief can be read back
+    data_model = await get_data_model()
     
     # Create test events
     events = [MOCK_EVENT]
@@ -173,33 +181,30 @@ async def demo_both_mode():
         await data_model.normalize_event(event)
     
     # Run brief node in both mode
-    with patch("nodes.config.BRIEF_MODE", "both"), \
-         patch("nodes.brief_llm.llm_call", AsyncMock(return_value=MOCK_LLM_RESPONSE)):
-        state = {
-            "last24h_counts": {"lp_add": 5},
-            "signals": MOCK_SIGNALS,
-            "last_brief_at": 0,
-            "source_ids": ["test_source"]
-        }
+    with patch("nodes.brief.BRIEF_MODE", "both"), \
+         patch("nodes.brief_llm.llm_call", _fake_llm_call):
+        state = dict(_BASE_BRIEF_STATE)
         result = await brief_node(state)
         
-        print("✅ Brief generated:")
-        print(f"📝 Deterministic: {result['brief_text']}")
-        print(f"📝 LLM: {result['llm_summary']}")
-        print(f"📋 Next Watchlist: {result['next_watchlist']}")
-        print("🔍 Both fields should be populated:")
         briefs = await data_model.get_recent_briefs(1)
-        print(f"   - summary_text: {briefs[0].summary_text}")
-        print(f"   - summary_text_llm: {briefs[0].summary_text_llm}")
-        print(f"   - llm_struct: {briefs[0].llm_struct}")
-        print(f"   - llm_validation: {briefs[0].llm_validation}")
-        print(f"   - llm_model: {briefs[0].llm_model}")
-        print(f"   - llm_tokens: {briefs[0].llm_tokens}")
+        print(
+            "✅ Brief generated:",
+            f"📝 Deterministic: {result['brief_text']}",
+            f"📝 LLM: {result['llm_summary']}",
+            f"📋 Discovered Pools: {result['discovered_pools']}",
+            "🔍 Both fields should be populated:",
+            f"   - summary_text: {briefs[0].summary_text}",
+            f"   - summary_text_llm: {briefs[0].summary_text_llm}",
+            f"   - llm_struct: {briefs[0].llm_struct}",
+            f"   - llm_validation: {briefs[0].llm_validation}",
+            f"   - llm_model: {briefs[0].llm_model}",
+            f"   - llm_tokens: {briefs[0].llm_tokens}",
+            sep="\n"
+        )
 
 async def demo_token_management():
     """Demo token management with different input policies."""
-    print("\n📋 Token Management Demo")
-    print("=" * 50)
+    print("\n📋 Token Management Demo", "=" * 50, sep="\n")
     
     # Create large event set
     large_events = [MOCK_EVENT] * 1000  # Should exceed token cap
@@ -207,28 +212,37 @@ async def demo_token_management():
     # Test full input policy
     with patch("nodes.config.LLM_INPUT_POLICY", "full"):
         events, signals = reduce_events(large_events, MOCK_SIGNALS, LLM_TOKEN_CAP)
-        print("✅ Full input policy:")
-        print(f"   - Original events: {len(large_events)}")
-        print(f"   - After reduction: {len(events)}")
-        print(f"   - Reduction info: {signals.get('reduction_info', 'None')}")
+        print(
+            "✅ Full input policy:",
+            f"   - Original events: {len(large_events)}",
+            f"   - After reduction: {len(events)}",
+            f"   - Reduction info: {signals.get('reduction_info', 'None')}",
+            sep="\n"
+        )
     
     # Test budgeted input policy
     with patch("nodes.config.LLM_INPUT_POLICY", "budgeted"):
         events, signals = reduce_events(large_events, MOCK_SIGNALS, 1000)  # Small cap
-        print("\n✅ Budgeted input policy:")
-        print(f"   - Original events: {len(large_events)}")
-        print(f"   - After reduction: {len(events)}")
-        print(f"   - Reduction info: {signals.get('reduction_info', 'None')}")
+        print(
+            "\n✅ Budgeted input policy:",
+            f"   - Original events: {len(large_events)}",
+            f"   - After reduction: {len(events)}",
+            f"   - Reduction info: {signals.get('reduction_info', 'None')}",
+            sep="\n"
+        )
 
 async def main():
     """Run all demos."""
-    print("🚀 LLM-Backed Briefs Demo")
-    print("=" * 50)
-    print(f"Current settings:")
-    print(f"   - BRIEF_MODE: {BRIEF_MODE}")
-    print(f"   - LLM_INPUT_POLICY: {LLM_INPUT_POLICY}")
-    print(f"   - LLM_TOKEN_CAP: {LLM_TOKEN_CAP}")
-    print(f"   - LLM_BRIEF_MODEL: {LLM_BRIEF_MODEL}")
+    print(
+        "🚀 LLM-Backed Briefs Demo",
+        "=" * 50,
+        "Current settings:",
+        f"   - BRIEF_MODE: {BRIEF_MODE}",
+        f"   - LLM_INPUT_POLICY: {LLM_INPUT_POLICY}",
+        f"   - LLM_TOKEN_CAP: {LLM_TOKEN_CAP}",
+        f"   - LLM_BRIEF_MODEL: {LLM_BRIEF_MODEL}",
+        sep="\n"
+    )
     
     await demo_deterministic_mode()
     await demo_llm_mode()
@@ -18,30 +18,38 @@ from nodes.analyze import analyze_node
 from nodes.brief import brief_node
 from nodes.memory import memory_node
 from data_model import get_data_model
+from _shared import DEMO_CONCURRENCY
 
 
-async def demo_lp_e2e_flow():
-    """Demonstrate complete LP end-to-end flow."""
-    print("🚀 LP End-to-End Demo: Three-Layer Data Flow")
-    print("=" * 60)
+def _default_since_ts() -> int:
+    """Cursor used by every demo step: ten hours ago."""
+    return int((datetime.now() - timedelta(hours=10)).timestamp())
+
+
+async def demo_lp_e2e_flow(since_ts: int = None):
+    """Demonstrate complete LP end-to-end flow; returns the LP events the worker fetched."""
+    since_ts = since_ts or _default_since_ts()
+    print("🚀 LP End-to-End Demo: Three-Layer Data Flow", "=" * 60, sep="\n")
     
     # Initialize data model
     data_model = await get_data_model()
     print("✅ Data model initialized")
     
     # Step 1: Worker - Fetch LP Activity and Save to Scratch Layer
-    print("\n📋 Step 1: Worker - Fetch LP Activity")
-    print("-" * 40)
+    print("\n📋 Step 1: Worker - Fetch LP Activity", "-" * 40, sep="\n")
     
     worker_state = {
         "selected_action": "lp_recon",
-        "cursors": {"lp": int((datetime.now() - timedelta(hours=10)).timestamp())},
+        "cursors": {"lp": since_ts},
         "use_realistic_fixtures": True  # Use realistic fixtures for demo
     }
     
     worker_result = await worker_node(worker_state)
-    print(f"✅ Worker completed: {len(worker_result['events'])} events retrieved")
-    print(f"📊 Source IDs: {worker_result['source_ids']}")
+    print(
+        f"✅ Worker completed: {len(worker_result['events'])} events retrieved",
+        f"📊 Source IDs: {worker_result['source_ids']}",
+        sep="\n"
+    )
     
     # Verify scratch layer
     source_id = worker_result["source_ids"][0]
@@ -49,8 +57,7 @@ async def demo_lp_e2e_flow():
     print(f"📦 Scratch Layer: Raw response saved with {len(raw_response.get('events', []))} events")
     
     # Step 2: Analyze - Normalize Events and Compute Signals
-    print("\n📋 Step 2: Analyze - Normalize Events")
-    print("-" * 40)
+    print("\n📋 Step 2: Analyze - Normalize Events", "-" * 40, sep="\n")
     
     analyze_state = {
         **worker_result,
@@ -62,19 +69,21 @@ async def demo_lp_e2e_flow():
     
     # Display LP signals
     signals = analyze_result["signals"]
-    print(f"💧 LP Signals:")
-    print(f"   - Net Liquidity Delta: {signals.get('net_liquidity_delta_24h', 0)}")
-    print(f"   - LP Churn Rate: {signals.get('lp_churn_rate_24h', 0):.2f}")
-    print(f"   - Pool Activity Score: {signals.get('pool_activity_score', 0):.2f}")
-    print(f"   - Net Liquidity Value: {signals.get('net_liquidity_value', 0):.0f}")
+    print(
+        "💧 LP Signals:",
+        f"   - Net Liquidity Delta: {signals.get('net_liquidity_delta_24h', 0)}",
+        f"   - LP Churn Rate: {signals.get('lp_churn_rate_24h', 0):.2f}",
+        f"   - Pool Activity Score: {signals.get('pool_activity_score', 0):.2f}",
+        f"   - Net Liquidity Value: {signals.get('net_liquidity_value', 0):.0f}",
+        sep="\n"
+    )
     
     # Verify events layer
     events = await data_model.get_events_by_type("lp_add")
     print(f"📊 Events Layer: {len(events)} LP add events stored")
     
     # Step 3: Brief - Generate LP-Focused Summary
-    print("\n📋 Step 3: Brief - Generate Summary")
-    print("-" * 40)
+    print("\n📋 Step 3: Brief - Generate Summary", "-" * 40, sep="\n")
     
     brief_state = {
         **analyze_result,
@@ -86,20 +95,25 @@ async def demo_lp_e2e_flow():
     if "brief_skipped" in brief_result:
         print(f"⏰ Brief skipped: {brief_result['reason']}")
     else:
-        print(f"✅ Brief emitted: {len(brief_result['brief_text'])} characters")
-        print(f"📝 Content: {brief_result['brief_text']}")
-        print(f"📋 Next Watchlist: {brief_result['next_watchlist']}")
+        print(
+            f"✅ Brief emitted: {len(brief_result['brief_text'])} characters",
+            f"📝 Content: {brief_result['brief_text']}",
+            f"📋 Discovered Pools: {brief_result['discovered_pools']}",
+            sep="\n"
+        )
     
     # Verify artifacts layer
     briefs = await data_model.get_recent_briefs(limit=5)
     if briefs:
         latest_brief = briefs[0]
-        print(f"📦 Artifacts Layer: Brief saved with {latest_brief.event_count} events")
-        print(f"🔗 Provenance: {len(latest_brief.source_ids)} source IDs")
+        print(
+            f"📦 Artifacts Layer: Brief saved with {latest_brief.event_count} events",
+            f"🔗 Provenance: {len(latest_brief.source_ids)} source IDs",
+            sep="\n"
+        )
     
     # Step 4: Memory - Persist and Update Cursors
-    print("\n📋 Step 4: Memory - Persist and Update")
-    print("-" * 40)
+    print("\n📋 Step 4: Memory - Persist and Update", "-" * 40, sep="\n")
     
     memory_state = {
         **brief_result,
@@ -110,17 +124,19 @@ async def demo_lp_e2e_flow():
     print(f"✅ Memory completed: Cursors updated")
     
     # Step 5: Provenance Chain Demo
-    print("\n📋 Step 5: Provenance Chain Demo")
-    print("-" * 40)
+    print("\n📋 Step 5: Provenance Chain Demo", "-" * 40, sep="\n")
     
     if briefs:
         latest_brief = briefs[0]
         provenance_chain = await data_model.get_provenance_chain(latest_brief.artifact_id)
         
-        print(f"🔗 Full Provenance Chain:")
-        print(f"   - Artifact ID: {provenance_chain['artifact_id']}")
-        print(f"   - Raw Responses: {len(provenance_chain['raw_responses'])}")
-        print(f"   - Normalized Events: {len(provenance_chain['events'])}")
+        print(
+            "🔗 Full Provenance Chain:",
+            f"   - Artifact ID: {provenance_chain['artifact_id']}",
+            f"   - Raw Responses: {len(provenance_chain['raw_responses'])}",
+            f"   - Normalized Events: {len(provenance_chain['events'])}",
+            sep="\n"
+        )
         
         # Show sample raw response
         if provenance_chain['raw_responses']:
@@ -133,31 +149,33 @@ async def demo_lp_e2e_flow():
             print(f"   - Sample Event: {sample_event['event_type']} in {sample_event['pool']}")
     
     # Step 6: Data Layer Summary
-    print("\n📋 Step 6: Three-Layer Data Summary")
-    print("-" * 40)
+    print("\n📋 Step 6: Three-Layer Data Summary", "-" * 40, sep="\n")
     
     # Count data in each layer
-    scratch_count = len(await data_model.get_raw_response("dummy")) if await data_model.get_raw_response("dummy") else 0
     events_count = len(await data_model.get_events_by_type("lp_add")) + len(await data_model.get_events_by_type("lp_remove"))
     artifacts_count = len(await data_model.get_recent_briefs(limit=100))
     
-    print(f"📊 Layer 1 (Scratch): {len(worker_result['source_ids'])} raw responses")
-    print(f"📊 Layer 2 (Events): {events_count} normalized events")
-    print(f"📊 Layer 3 (Artifacts): {artifacts_count} brief artifacts")
-    
-    print("\n🎉 Demo Complete!")
-    print("=" * 60)
+    print(
+        f"📊 Layer 1 (Scratch): {len(worker_result['source_ids'])} raw responses",
+        f"📊 Layer 2 (Events): {events_count} normalized events",
+        f"📊 Layer 3 (Artifacts): {artifacts_count} brief artifacts",
+        "",
+        "🎉 Demo Complete!",
+        "=" * 60,
+        sep="\n"
+    )
+    return worker_result["events"]
 
 
-async def demo_idempotency():
-    """Demonstrate idempotent behavior."""
-    print("\n🔄 Idempotency Demo")
-    print("=" * 40)
+async def demo_idempotency(since_ts: int = None):
+    """Demonstrate idempotent behavior; returns the LP events of the first run."""
+    since_ts = since_ts or _default_since_ts()
+    print("\n🔄 Idempotency Demo", "=" * 40, sep="\n")
     
     # Run the same worker operation twice
     worker_state = {
         "selected_action": "lp_recon",
-        "cursors": {"lp": int((datetime.now() - timedelta(hours=10)).timestamp())},
+        "cursors": {"lp": since_ts},
         "use_realistic_fixtures": False  # Use simple fixtures
     }
     
@@ -166,70 +184,81 @@ async def demo_idempotency():
     result1 = await worker_node(worker_state)
     result2 = await worker_node(worker_state)
     
-    print(f"✅ First run: {len(result1['events'])} events")
-    print(f"✅ Second run: {len(result2['events'])} events")
-    print(f"🔄 Idempotent: {len(result1['events']) == len(result2['events'])}")
+    print(
+        f"✅ First run: {len(result1['events'])} events",
+        f"✅ Second run: {len(result2['events'])} events",
+        f"🔄 Idempotent: {len(result1['events']) == len(result2['events'])}",
+        sep="\n"
+    )
     
     # Check that no duplicate events were created
     data_model = await get_data_model()
     events = await data_model.get_events_by_type("lp_add")
     unique_event_ids = set(event.event_id for event in events)
-    print(f"📊 Total LP add events: {len(events)}")
-    print(f"📊 Unique event IDs: {len(unique_event_ids)}")
-    print(f"🔄 No duplicates: {len(events) == len(unique_event_ids)}")
+    print(
+        f"📊 Total LP add events: {len(events)}",
+        f"📊 Unique event IDs: {len(unique_event_ids)}",
+        f"🔄 No duplicates: {len(events) == len(unique_event_ids)}",
+        sep="\n"
+    )
+    return result1["events"]
 
 
-async def demo_signal_variations():
+async def demo_signal_variations(simple_events=None, realistic_events=None):
     """Demonstrate signal variations with different fixture types."""
-    print("\n📊 Signal Variations Demo")
-    print("=" * 40)
-    
-    # Test with simple fixtures
-    print("📋 Simple Fixtures (3 events):")
-    simple_events = fetch_lp_activity(int((datetime.now() - timedelta(hours=10)).timestamp()), use_realistic=False)
-    
-    simple_state = {
-        "events": simple_events,
-        "source_ids": ["simple_test"]
-    }
-    
-    simple_result = await analyze_node(simple_state)
+    print("\n📊 Signal Variations Demo", "=" * 40, sep="\n")
+    
+    if simple_events is None or realistic_events is None:
+        since_ts = _default_since_ts()
+        simple_events = fetch_lp_activity(since_ts, use_realistic=False)
+        realistic_events = fetch_lp_activity(since_ts, use_realistic=True)
+    
+    async def analyze(events, source_id):
+        # Each analysis writes to the events layer
+        async with DEMO_CONCURRENCY:
+            return await analyze_node({"events": events, "source_ids": [source_id]})
+    
+    # The two fixture sets are independent, so analyze them concurrently
+    simple_result, realistic_result = await asyncio.gather(
+        analyze(simple_events, "simple_test"),
+        analyze(realistic_events, "realistic_test")
+    )
     simple_signals = simple_result["signals"]
-    
-    print(f"   - Net Delta: {simple_signals.get('net_liquidity_delta_24h', 0)}")
-    print(f"   - Churn Rate: {simple_signals.get('lp_churn_rate_24h', 0):.2f}")
-    print(f"   - Activity Score: {simple_signals.get('pool_activity_score', 0):.2f}")
-    
-    # Test with realistic fixtures
-    print("\n📋 Realistic Fixtures (5 events):")
-    realistic_events = fetch_lp_activity(int((datetime.now() - timedelta(hours=10)).timestamp()), use_realistic=True)
-    
-    realistic_state = {
-        "events": realistic_events,
-        "source_ids": ["realistic_test"]
-    }
-    
-    realistic_result = await analyze_node(realistic_state)
     realistic_signals = realistic_result["signals"]
     
-    print(f"   - Net Delta: {realistic_signals.get('net_liquidity_delta_24h', 0)}")
-    print(f"   - Churn Rate: {realistic_signals.get('lp_churn_rate_24h', 0):.2f}")
-    print(f"   - Activity Score: {realistic_signals.get('pool_activity_score', 0):.2f}")
+    print(
+        "📋 Simple Fixtures (3 events):",
+        f"   - Net Delta: {simple_signals.get('net_liquidity_delta_24h', 0)}",
+        f"   - Churn Rate: {simple_signals.get('lp_churn_rate_24h', 0):.2f}",
+        f"   - Activity Score: {simple_signals.get('pool_activity_score', 0):.2f}",
+        "",
+        "📋 Realistic Fixtures (5 events):",
+        f"   - Net Delta: {realistic_signals.get('net_liquidity_delta_24h', 0)}",
+        f"   - Churn Rate: {realistic_signals.get('lp_churn_rate_24h', 0):.2f}",
+        f"   - Activity Score: {realistic_signals.get('pool_activity_score', 0):.2f}",
+        sep="\n"
+    )
 
 
 async def main():
     """Run the complete LP end-to-end demo."""
     try:
-        await demo_lp_e2e_flow()
-        await demo_idempotency()
-        await demo_signal_variations()
+        # One cursor for the whole run; the signal demo reuses the fixtures
+        # the worker demos fetched instead of loading both sets again
+        since_ts = _default_since_ts()
+        realistic_events = await demo_lp_e2e_flow(since_ts)
+        simple_events = await demo_idempotency(since_ts)
+        await demo_signal_variations(simple_events, realistic_events)
         
-        print("\n🎯 Demo Summary:")
-        print("✅ Task Card #1: Tools → Worker → Analyze + Signals + Tests")
-        print("✅ Task Card #2: Brief/Gating + Tests")
-        print("✅ End-to-End Flow: Complete three-layer data transformation")
-        print("✅ Idempotent Operations: No duplicate data across layers")
-        print("✅ Provenance Chain: Full traceability from brief to raw data")
+        print(
+            "\n🎯 Demo Summary:",
+            "✅ Task Card #1: Tools → Worker → Analyze + Signals + Tests",
+            "✅ Task Card #2: Brief/Gating + Tests",
+            "✅ End-to-End Flow: Complete three-layer data transformation",
+            "✅ Idempotent Operations: No duplicate data across layers",
+            "✅ Provenance Chain: Full traceability from brief to raw data",
+            sep="\n"
+        )
         
     except Exception as e:
         print(f"❌ Demo failed: {e}")
@@ -57,8 +57,8 @@ async def demo_complete_flow():
             print(f"   Events retrieved: {len(result.get('events', []))}")
         if 'brief_text' in result and result.get('brief_text'):
             print(f"   Brief emitted: {len(result.get('brief_text', ''))} chars")
-        if 'next_watchlist' in result:
-            print(f"   Next watchlist: {result.get('next_watchlist')}")
+        if 'discovered_pools' in result:
+            print(f"   Discovered pools: {result.get('discovered_pools')}")
 
         print()
 
@@ -5,6 +5,7 @@ Test LLM logging functionality.
 
 import sys
 import json
+import datetime
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -28,32 +29,32 @@ async def test_error_logging():
     # Check the log file
     log_path = Path(__file__).parent.parent / "logs" / f"llm-errors-{datetime.date.today().isoformat()}.jsonl"
     if log_path.exists():
-        with open(log_path) as f:
-            content = f.read()
-            print("\n📝 Error log content:")
-            print(content)
-            
-            # Verify JSON formatting
-            try:
-                for line in content.strip().split("\n\n"):
-                    if line.strip():
-                        entry = json.loads(line)
-                        assert isinstance(entry, dict)
-                        assert "timestamp" in entry
-                        assert "error" in entry
-                        assert "model" in entry
-                        assert "messages" in entry
-                        assert isinstance(entry["messages"], list)
-                        for msg in entry["messages"]:
-                            assert "role" in msg
-                            assert "content" in msg
-                print("✅ Log entries are valid JSON with correct structure")
-            except Exception as e:
-                print(f"❌ Error validating log format: {e}")
+        print("\n📝 Error log content:")
+        
+        # Stream the JSONL file one record at a time
+        try:
+            with open(log_path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    print(line)
+                    entry = json.loads(line)
+                    assert isinstance(entry, dict)
+                    assert "timestamp" in entry
+                    assert "error" in entry
+                    assert "model" in entry
+                    assert "messages" in entry
+                    assert isinstance(entry["messages"], list)
+                    for msg in entry["messages"]:
+                        assert "role" in msg
+                        assert "content" in msg
+            print("✅ Log entries are valid JSON with correct structure")
+        except Exception as e:
+            print(f"❌ Error validating log format: {e}")
     else:
         print("❌ No error log file found")
 
 if __name__ == "__main__":
     import asyncio
-    import datetime
     asyncio.run(test_error_logging())
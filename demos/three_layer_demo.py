@@ -5,6 +5,7 @@ Shows the complete flow: mock wallet fetch → scratch JSON → normalized Event
 """
 
 import asyncio
+import io
 import sys
 from pathlib import Path
 
@@ -12,18 +13,22 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from data_model import (
-    save_raw_response, normalize_event, persist_brief, get_provenance_chain,
+    save_raw_response, normalize_events_bulk, persist_brief, get_provenance_chain,
     NormalizedEvent, Artifact
 )
-from mock_tools import fetch_wallet_activity
+from mock_tools import fetch_wallet_activity, parse_wallet_events
+from nodes.analyze import compute_wallet_signals
+from _shared import CHAIN_BASE, EVENT_SWAP, KIND_WALLET_ACTIVITY, POOL_WETH_USDC, dumps
 
 
 async def demo_three_layer_flow():
     """Demonstrate the complete three-layer data flow."""
-    print("🔍 Three-Layer Data Model Demo")
-    print("=" * 50)
-    print("Flow: Mock wallet fetch → Scratch JSON → Normalized Event → Brief → Persisted with provenance")
-    print()
+    print(
+        "🔍 Three-Layer Data Model Demo",
+        "=" * 50,
+        "Flow: Mock wallet fetch → Scratch JSON → Normalized Event → Brief → Persisted with provenance\n",
+        sep="\n"
+    )
     
     # Step 1: Mock wallet fetch (simulating Worker)
     print("📥 Step 1: Mock wallet fetch (Worker)")
@@ -50,37 +55,47 @@ async def demo_three_layer_flow():
         "snapshot_time": 1234567890
     }
     
-    response_id = await save_raw_response(raw_id, "wallet_activity", raw_data, provenance)
-    print(f"   ✅ Saved raw response: {response_id}")
-    print(f"   📊 Raw data size: {len(str(raw_data))} chars")
+    # Layer 2 only needs raw_id as source_id, so normalize while this write runs
+    raw_task = asyncio.create_task(
+        save_raw_response(raw_id, KIND_WALLET_ACTIVITY, raw_data, provenance)
+    )
+    print(
+        f"   ⏳ Saving raw response: {raw_id}",
+        f"   📊 Raw data size: {len(dumps(raw_data))} chars",
+        sep="\n"
+    )
     
     # Step 3: Normalize events to Layer 2 (Normalized Events)
     print("\n🔄 Step 3: Normalize events to Layer 2 (Normalized Events)")
-    normalized_events = []
-    
-    for i, event in enumerate(wallet_events):
-        # Create normalized event
-        normalized_event = NormalizedEvent(
-            event_id=event.get("txHash", f"event_{i}"),
+    normalized_events = [
+        NormalizedEvent(
+            event_id=event.tx_hash or f"event_{i}",
             wallet=wallet,
-            event_type=event.get("kind", "unknown"),
-            pool=event.get("pool"),
+            event_type=event.kind,
+            pool=event.pool,
             value={
-                "amounts": event.get("amounts", {}),
-                "chain": event.get("chain", "base"),
-                "provenance": event.get("provenance", {})
+                "amounts": event.amounts,
+                "chain": event.chain,
+                "provenance": event.provenance
             },
-            timestamp=event.get("timestamp", 1234567890),
-            source_id=response_id,
-            chain=event.get("chain", "base")
+            timestamp=event.timestamp or 1234567890,
+            source_id=raw_id,
+            chain=event.chain
         )
-        
-        # Save to Layer 2
-        event_id = await normalize_event(normalized_event)
-        normalized_events.append(normalized_event)
+        for i, event in enumerate(parse_wallet_events(wallet_events))
+    ]
+    
+    # Save to Layer 2 in one transaction, keeping a JSONL copy of the batch
+    events_jsonl = io.BytesIO()
+    event_ids = await normalize_events_bulk(normalized_events, events_jsonl)
+    for event_id, normalized_event in zip(event_ids, normalized_events):
         print(f"   ✅ Normalized event: {event_id} ({normalized_event.event_type})")
     
-    print(f"   📊 Total normalized events: {len(normalized_events)}")
+    print(
+        f"   📊 Total normalized events: {len(normalized_events)}",
+        f"   📦 Events JSONL: {events_jsonl.getbuffer().nbytes} bytes",
+        sep="\n"
+    )
     
     # Step 4: Create brief artifact for Layer 3 (Artifacts/Briefs)
     print("\n📝 Step 4: Create brief artifact for Layer 3 (Artifacts/Briefs)")
@@ -90,17 +105,22 @@ async def demo_three_layer_flow():
         "volume_signal": 0.8,
         "activity_signal": 0.6,
         "concentration_signal": 0.4,
-        "total_events_24h": len(normalized_events)
+        "total_events_24h": len(normalized_events),
+        **compute_wallet_signals(wallet_events)
     }
     
     # Generate brief text
     brief_text = f"24h activity: {len(normalized_events)} events across multiple pools. "
     brief_text += f"Signals: volume={signals['volume_signal']:.2f}, activity={signals['activity_signal']:.2f}. "
     
-    # Generate next watchlist
-    pools = list(set(e.pool for e in normalized_events if e.pool))
-    next_watchlist = pools[:2] if pools else ["WETH/USDC"]
-    brief_text += f"Next watchlist: {', '.join(next_watchlist)}."
+    # Collect discovered pools (first-seen pool order, stable across runs)
+    pools = list(dict.fromkeys(e.pool for e in normalized_events if e.pool))
+    discovered_pools = pools[:2] if pools else [POOL_WETH_USDC]
+    brief_text += f"Discovered pools: {', '.join(discovered_pools)}."
+    
+    # Layer 1 write must be done before the artifact references it
+    response_id = await raw_task
+    print(f"   ✅ Saved raw response: {response_id}")
     
     # Create artifact
     artifact = Artifact(
@@ -108,48 +128,62 @@ async def demo_three_layer_flow():
         timestamp=1234567890,
         summary_text=brief_text,
         signals=signals,
-        next_watchlist=next_watchlist,
+        discovered_pools=discovered_pools,
         source_ids=[response_id],
         event_count=len(normalized_events)
     )
     
     # Persist to Layer 3
     artifact_id = await persist_brief(artifact)
-    print(f"   ✅ Persisted artifact: {artifact_id}")
-    print(f"   📊 Brief text: {len(brief_text)} chars")
-    print(f"   📋 Next watchlist: {', '.join(next_watchlist)}")
+    print(
+        f"   ✅ Persisted artifact: {artifact_id}",
+        f"   📊 Brief text: {len(brief_text)} chars",
+        f"   📋 Discovered pools: {', '.join(discovered_pools)}",
+        sep="\n"
+    )
     
     # Step 5: Demonstrate provenance chain
     print("\n🔗 Step 5: Demonstrate provenance chain")
     chain = await get_provenance_chain(artifact_id)
     
-    print(f"   📊 Provenance chain for {chain['artifact_id']}:")
-    print(f"   - Raw responses: {len(chain['raw_responses'])}")
-    print(f"   - Normalized events: {len(chain['events'])}")
+    print(
+        f"   📊 Provenance chain for {chain['artifact_id']}:",
+        f"   - Raw responses: {len(chain['raw_responses'])}",
+        f"   - Normalized events: {len(chain['events'])}",
+        sep="\n"
+    )
     
     if chain['raw_responses']:
         raw_response = chain['raw_responses'][0]
-        print(f"   - Raw response source: {raw_response.get('_provenance', {}).get('source', 'unknown')}")
-        print(f"   - Raw response wallet: {raw_response.get('wallet', 'unknown')}")
+        print(
+            f"   - Raw response source: {raw_response.get('_provenance', {}).get('source', 'unknown')}",
+            f"   - Raw response wallet: {raw_response.get('wallet', 'unknown')}",
+            sep="\n"
+        )
     
     if chain['events']:
         event = chain['events'][0]
-        print(f"   - Event type: {event.get('event_type', 'unknown')}")
-        print(f"   - Event pool: {event.get('pool', 'unknown')}")
-    
-    print("\n" + "=" * 50)
-    print("✅ Three-layer data model demo completed!")
-    print("\n📋 Summary:")
-    print("- Layer 1: Raw API responses stored with provenance")
-    print("- Layer 2: Normalized events with structured schema")
-    print("- Layer 3: Human-readable briefs with full provenance chain")
-    print("- End-to-end traceability from brief back to raw data")
+        print(
+            f"   - Event type: {event.get('event_type', 'unknown')}",
+            f"   - Event pool: {event.get('pool', 'unknown')}",
+            sep="\n"
+        )
+    
+    print(
+        "\n" + "=" * 50,
+        "✅ Three-layer data model demo completed!",
+        "\n📋 Summary:",
+        "- Layer 1: Raw API responses stored with provenance",
+        "- Layer 2: Normalized events with structured schema",
+        "- Layer 3: Human-readable briefs with full provenance chain",
+        "- End-to-end traceability from brief back to raw data",
+        sep="\n"
+    )
 
 
 async def demo_retention_and_cleanup():
     """Demonstrate retention rules and cleanup."""
-    print("\n🗑️ Retention and Cleanup Demo")
-    print("=" * 30)
+    print("\n🗑️ Retention and Cleanup Demo", "=" * 30, sep="\n")
     
     from data_model import get_data_model
     
@@ -163,12 +197,12 @@ async def demo_retention_and_cleanup():
     old_event = NormalizedEvent(
         event_id="old_event",
         wallet="0x123",
-        event_type="swap",
-        pool="WETH/USDC",
+        event_type=EVENT_SWAP,
+        pool=POOL_WETH_USDC,
         value={"amount": 100},
         timestamp=1234567890,
         source_id="old_scratch",
-        chain="base"
+        chain=CHAIN_BASE
     )
     await model.normalize_event(old_event)
     
@@ -178,16 +212,19 @@ async def demo_retention_and_cleanup():
         timestamp=1234567890,
         summary_text="Old brief",
         signals={"volume_signal": 0.8},
-        next_watchlist=["WETH/USDC"],
+        discovered_pools=[POOL_WETH_USDC],
         source_ids=["old_scratch"],
         event_count=1
     )
     await model.persist_brief(old_artifact)
     
-    print("   📊 Retention rules:")
-    print("   - Scratch JSON: 7 days (purgeable)")
-    print("   - Normalized Events: 30 days (mid-term)")
-    print("   - Artifacts/Briefs: 90 days (long-term)")
+    print(
+        "   📊 Retention rules:",
+        "   - Scratch JSON: 7 days (purgeable)",
+        "   - Normalized Events: 30 days (mid-term)",
+        "   - Artifacts/Briefs: 90 days (long-term)",
+        sep="\n"
+    )
     
     # Note: Actual cleanup would depend on timestamps
     print("   ✅ Cleanup functions available for each layer")
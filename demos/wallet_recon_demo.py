@@ -6,6 +6,7 @@ Demonstrates the complete wallet activity fetching and processing flow.
 
 import asyncio
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -15,20 +16,23 @@ sys.path.append(str(Path(__file__).parent.parent))
 from agent import LangGraphAgent
 from mock_tools import demo_wallet_recon_flow, fetch_wallet_activity_bitquery
 from json_storage import set_cursor
-from datetime import datetime
 from nodes import planner_node, worker_node, analyze_node, brief_node
+from _shared import DEMO_CONCURRENCY
 
 
 async def demo_wallet_recon():
     """Demonstrate wallet recon with Bitquery adapter."""
-    print("🔍 Wallet Recon Demo - Bitquery Adapter v1")
-    print("=" * 60)
-    print("This demo shows:")
-    print("• Fetching wallet activity via Bitquery adapter")
-    print("• Persisting raw JSON to Layer 1")
-    print("• Computing wallet-specific signals")
-    print("• Generating brief with wallet recon note")
-    print()
+    current_ts = int(time.time())
+    print(
+        "🔍 Wallet Recon Demo - Bitquery Adapter v1",
+        "=" * 60,
+        "This demo shows:",
+        "• Fetching wallet activity via Bitquery adapter",
+        "• Persisting raw JSON to Layer 1",
+        "• Computing wallet-specific signals",
+        "• Generating brief with wallet recon note\n",
+        sep="\n"
+    )
 
     # Test wallet addresses
     test_wallets = [
@@ -39,8 +43,7 @@ async def demo_wallet_recon():
 
     # Choose a test wallet
     wallet = test_wallets[0]
-    print(f"🎯 Target wallet: {wallet}")
-    print()
+    print(f"🎯 Target wallet: {wallet}\n")
 
     # Create agent instance
     agent = None
@@ -50,39 +53,50 @@ async def demo_wallet_recon():
         # Set up initial state to force wallet recon
         initial_goal = f"Monitor wallet activity for {wallet}"
 
-        print(f"📋 Goal: {initial_goal}")
-        print(f"💰 Budget: $0.00/$5.00")
-        print(f"📅 Current time: {datetime.now()}")
-        print()
+        print(
+            f"📋 Goal: {initial_goal}",
+            f"💰 Budget: $0.00/$5.00",
+            f"📅 Current time: {datetime.fromtimestamp(current_ts)}\n",
+            sep="\n"
+        )
 
         # Set up cursors to force wallet recon
-        current_ts = int(datetime.now().timestamp())
         print("🔧 Setting up demo cursors...")
-        await set_cursor(f"wallet:{wallet}", 0, f"Demo: Force wallet cursor stale")
-        await set_cursor("lp", current_ts, "Demo: Make LP cursor fresh")
-        await set_cursor("explore_metrics", current_ts, "Demo: Make explore cursor fresh")
-        print("   ✅ Cursors configured for wallet recon demo")
-        print()
+        cursor_setups = [
+            (f"wallet:{wallet}", 0, f"Demo: Force wallet cursor stale"),
+            ("lp", current_ts, "Demo: Make LP cursor fresh"),
+            ("explore_metrics", current_ts, "Demo: Make explore cursor fresh"),
+        ]
+
+        async def configure(name, last_ts, notes):
+            async with DEMO_CONCURRENCY:
+                await set_cursor(name, last_ts, notes)
+
+        # The cursors are independent rows, so set them concurrently
+        await asyncio.gather(*(configure(*setup) for setup in cursor_setups))
+        print("   ✅ Cursors configured for wallet recon demo\n")
 
         # Run the agent with wallet recon
-        print("🔄 Running agent with wallet recon...")
-        print()
+        print("🔄 Running agent with wallet recon...\n")
 
-        result = await agent.run(initial_goal, thread_id="demo_wallet_recon")
+        # Fresh thread per run so checkpoints from earlier or concurrent runs never collide
+        result = await agent.run(initial_goal, thread_id=f"demo_wallet_recon_{current_ts}")
 
-        print("✅ Agent run completed!")
-        print()
+        print("✅ Agent run completed!\n")
 
         # Show results
-        print("📊 Results Summary:")
-        print(f"   Status: {result.get('status', 'unknown')}")
-        print(f"   Selected action: {result.get('selected_action', 'none')}")
-        print(f"   Target wallet: {result.get('target_wallet', 'none')}")
-        print(f"   Events retrieved: {len(result.get('events', []))}")
+        print(
+            "📊 Results Summary:",
+            f"   Status: {result.get('status', 'unknown')}",
+            f"   Selected action: {result.get('selected_action', 'none')}",
+            f"   Target wallet: {result.get('target_wallet', 'none')}",
+            f"   Events retrieved: {len(result.get('events', []))}",
+            sep="\n"
+        )
         if 'brief_text' in result and result.get('brief_text'):
             print(f"   Brief emitted: {len(result.get('brief_text', ''))} chars")
-        if 'next_watchlist' in result:
-            print(f"   Next watchlist: {result.get('next_watchlist', [])}")
+        if 'discovered_pools' in result:
+            print(f"   Discovered pools: {result.get('discovered_pools', [])}")
 
         print()
 
@@ -93,8 +107,11 @@ async def demo_wallet_recon():
             print("👛 Wallet Signals:")
             net_lp_usd = wallet_signals.get('net_lp_usd_24h', 0)
             new_pools = wallet_signals.get('new_pools_touched_24h', [])
-            print(f"   Net LP USD (24h): ${net_lp_usd:.2f}")
-            print(f"   New pools touched (24h): {len(new_pools)} pools")
+            print(
+                f"   Net LP USD (24h): ${net_lp_usd:.2f}",
+                f"   New pools touched (24h): {len(new_pools)} pools",
+                sep="\n"
+            )
             if new_pools:
                 print(f"   Pool addresses: {', '.join(new_pools[:3])}")
                 if len(new_pools) > 3:
@@ -103,9 +120,7 @@ async def demo_wallet_recon():
 
         # Show brief text
         if 'brief_text' in result and result.get('brief_text'):
-            print("📝 Brief Text:")
-            print(f"   {result.get('brief_text')}")
-            print()
+            print("📝 Brief Text:", f"   {result.get('brief_text')}\n", sep="\n")
 
         print("🎉 Wallet recon demo completed successfully!")
 
@@ -121,11 +136,10 @@ async def demo_wallet_recon():
 
 async def demo_wallet_recon_flow_only():
     """Demo the complete wallet recon flow by calling nodes directly."""
-    print("🔄 Wallet Recon Flow Demo (Direct Node Calls)")
-    print("=" * 60)
+    print("🔄 Wallet Recon Flow Demo (Direct Node Calls)", "=" * 60, sep="\n")
 
     wallet = "0x1234567890abcdef1234567890abcdef12345678"
-    current_ts = int(datetime.now().timestamp())
+    current_ts = int(time.time())
 
     # Initial state with wallet cursor stale
     old_ts = current_ts - (3 * 3600)  # 3 hours ago (stale for wallet cursor)
@@ -146,21 +160,21 @@ async def demo_wallet_recon_flow_only():
         "top_pools": [],
         "signals": {},
         "brief_text": None,
-        "next_watchlist": [],
+        "discovered_pools": [],
         "last_brief_at": 0
     }
 
-    print(f"🎯 Target wallet: {wallet}")
-    print("📊 Initial cursors configured for wallet recon")
-    print()
+    print(f"🎯 Target wallet: {wallet}", "📊 Initial cursors configured for wallet recon\n", sep="\n")
 
     try:
         # Step 1: Planner
         print("📋 Step 1: Planner selecting action...")
         state = await planner_node(state)
-        print(f"   ✅ Selected action: {state.get('selected_action')}")
-        print(f"   🎯 Target wallet: {state.get('target_wallet')}")
-        print()
+        print(
+            f"   ✅ Selected action: {state.get('selected_action')}",
+            f"   🎯 Target wallet: {state.get('target_wallet')}\n",
+            sep="\n"
+        )
 
         # Step 2: Worker
         print("🔧 Step 2: Worker executing wallet_recon...")
@@ -168,8 +182,11 @@ async def demo_wallet_recon_flow_only():
         print(f"   ✅ Retrieved {len(state.get('events', []))} events")
         raw_data = state.get('raw_data', {})
         if raw_data:
-            print(f"   📊 Provider: {raw_data.get('provider')}")
-            print(f"   📦 Event count: {raw_data.get('event_count')}")
+            print(
+                f"   📊 Provider: {raw_data.get('provider')}",
+                f"   📦 Event count: {raw_data.get('event_count')}",
+                sep="\n"
+            )
         print()
 
         # Step 3: Analyze
@@ -180,8 +197,11 @@ async def demo_wallet_recon_flow_only():
         if wallet_signals:
             net_lp_usd = wallet_signals.get('net_lp_usd_24h', 0)
             new_pools = wallet_signals.get('new_pools_touched_24h', [])
-            print(f"   👛 Net LP USD (24h): ${net_lp_usd:.2f}")
-            print(f"   🏊 New pools touched: {len(new_pools)} pools")
+            print(
+                f"   👛 Net LP USD (24h): ${net_lp_usd:.2f}",
+                f"   🏊 New pools touched: {len(new_pools)} pools",
+                sep="\n"
+            )
         print()
 
         # Step 4: Brief
@@ -189,9 +209,12 @@ async def demo_wallet_recon_flow_only():
         state = await brief_node(state)
         brief_text = state.get('brief_text')
         if brief_text:
-            print(f"   ✅ Brief emitted: {len(brief_text)} chars")
-            print("   📋 Brief content:")
-            print(f"      {brief_text}")
+            print(
+                f"   ✅ Brief emitted: {len(brief_text)} chars",
+                "   📋 Brief content:",
+                f"      {brief_text}",
+                sep="\n"
+            )
         else:
             print("   ⏰ Brief skipped (cooldown or low activity)")
         print()
@@ -206,40 +229,45 @@ async def demo_wallet_recon_flow_only():
 
 async def demo_bitquery_adapter_only():
     """Demo just the Bitquery adapter without full agent flow."""
-    print("🔌 Bitquery Adapter Demo (Standalone)")
-    print("=" * 50)
+    print("🔌 Bitquery Adapter Demo (Standalone)", "=" * 50, sep="\n")
 
     wallet = "0x1234567890abcdef1234567890abcdef12345678"
     response = demo_wallet_recon_flow(wallet)
 
-    print()
-    print("📋 Response Structure:")
-    print(f"   Provider: {response.get('provider')}")
-    print(f"   Next cursor: {response.get('next_cursor')}")
-    print(f"   Events count: {len(response.get('events', []))}")
-    print(f"   Metadata: {response.get('metadata', {})}")
+    print(
+        "\n📋 Response Structure:",
+        f"   Provider: {response.get('provider')}",
+        f"   Next cursor: {response.get('next_cursor')}",
+        f"   Events count: {len(response.get('events', []))}",
+        f"   Metadata: {response.get('metadata', {})}",
+        sep="\n"
+    )
 
-    print()
-    print("📊 Sample Event Structure:")
+    print("\n📊 Sample Event Structure:")
     if response.get('events'):
         event = response['events'][0]
-        print(f"   ts: {event.get('ts')}")
-        print(f"   chain: {event.get('chain')}")
-        print(f"   type: {event.get('type')}")
-        print(f"   wallet: {event.get('wallet')}")
-        print(f"   pool: {event.get('pool')}")
-        print(f"   usd: {event.get('usd')}")
-        print(f"   tx: {event.get('tx')}")
-        print(f"   raw keys: {list(event.get('raw', {}).keys())}")
+        print(
+            f"   ts: {event.get('ts')}",
+            f"   chain: {event.get('chain')}",
+            f"   type: {event.get('type')}",
+            f"   wallet: {event.get('wallet')}",
+            f"   pool: {event.get('pool')}",
+            f"   usd: {event.get('usd')}",
+            f"   tx: {event.get('tx')}",
+            f"   raw keys: {list(event.get('raw', {}).keys())}",
+            sep="\n"
+        )
 
     print("\n✅ Bitquery adapter demo completed!")
 
 
 async def main():
     """Main demo function."""
-    print("🎯 Wallet Recon Demo Suite")
-    print("This demonstrates wallet activity monitoring with Bitquery adapter.")
-    print()
+    print(
+        "🎯 Wallet Recon Demo Suite",
+        "This demonstrates wallet activity monitoring with Bitquery adapter.\n",
+        sep="\n"
+    )
 
     try:
         # Demo 1: Direct node flow (shows wallet recon working)
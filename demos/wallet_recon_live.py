@@ -6,73 +6,90 @@ Tests live Bitquery integration with raw-first storage and provenance.
 
 import os
 import asyncio
+import contextlib
 import sys
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path to import agent
 sys.path.append(str(Path(__file__).parent.parent))
 
 from mock_tools import fetch_wallet_activity_bitquery
-from data_model import save_raw_response
+from data_model import save_raw_response, compute_content_hash
 from json_storage import get_cursor, set_cursor
+from _shared import CHAIN_BASE, KIND_WALLET_ACTIVITY, temp_env
 
 
 async def test_live_bitquery_integration():
     """Test the live Bitquery integration end-to-end."""
-    print("🔬 Wallet Recon Live Smoke Test")
-    print("=" * 60)
-    print("This test validates live Bitquery integration with:")
-    print("• Raw-first data storage")
-    print("• Proper provenance tracking")
-    print("• Idempotent behavior")
-    print("• Error handling and fallbacks")
-    print()
+    # One clock read for the whole run: fetch window, raw ID, cursor
+    current_ts = int(time.time())
+    print(
+        "🔬 Wallet Recon Live Smoke Test",
+        "=" * 60,
+        "This test validates live Bitquery integration with:",
+        "• Raw-first data storage",
+        "• Proper provenance tracking",
+        "• Idempotent behavior",
+        "• Error handling and fallbacks\n",
+        sep="\n"
+    )
 
     # Test wallet - using a known active wallet on Base
     test_wallet = "0x1234567890abcdef1234567890abcdef12345678"  # Will be mocked if no API key
 
-    print(f"🎯 Test wallet: {test_wallet}")
-    print()
+    print(f"🎯 Test wallet: {test_wallet}\n")
 
     # Check environment
-    access_token = os.getenv("BITQUERY_ACCESS_TOKEN") or os.getenv("BITQUERY_API_KEY")
-    live_mode = bool(os.getenv("BITQUERY_ACCESS_TOKEN"))
+    live_token = os.getenv("BITQUERY_ACCESS_TOKEN")
+    access_token = live_token or os.getenv("BITQUERY_API_KEY")
+    live_mode = bool(live_token)
 
     print("🔧 Environment Check:")
     if access_token:
-        print(f"   BITQUERY_ACCESS_TOKEN: ✅ Set (length: {len(access_token)})")
-        print(f"   Token preview: {access_token[:20]}...")
+        print(
+            f"   BITQUERY_ACCESS_TOKEN: ✅ Set (length: {len(access_token)})",
+            f"   Token preview: {access_token[:20]}...",
+            sep="\n"
+        )
     else:
         print("   BITQUERY_ACCESS_TOKEN: ❌ Missing")
     print(f"   Live Mode: {'🔴 True (LIVE)' if live_mode else '🟡 False (MOCK)'}")
 
     if not access_token and live_mode:
-        print("   ⚠️  WARNING: Live mode enabled but no API key - will fallback to mock")
-        print("   💡 Set BITQUERY_API_KEY=your_key_here in your .env file")
-        print()
+        print(
+            "   ⚠️  WARNING: Live mode enabled but no API key - will fallback to mock",
+            "   💡 Set BITQUERY_API_KEY=your_key_here in your .env file\n",
+            sep="\n"
+        )
 
     # Show Bitquery setup guidance
     if not access_token:
-        print("📚 Bitquery Setup Guide:")
-        print("   🔗 Get API key: https://streaming.bitquery.io/")
-        print("   💳 Note: You'll need to set up billing to use the API")
-        print("   📝 The system will use X-API-KEY header for your UUID-format key")
-        print()
+        print(
+            "📚 Bitquery Setup Guide:",
+            "   🔗 Get API key: https://streaming.bitquery.io/",
+            "   💳 Note: You'll need to set up billing to use the API",
+            "   📝 The system will use X-API-KEY header for your UUID-format key\n",
+            sep="\n"
+        )
 
     # Test 1: Direct API call
-    print("📡 Test 1: Direct Bitquery API Call")
-    print("-" * 40)
+    print("📡 Test 1: Direct Bitquery API Call", "-" * 40, sep="\n")
 
-    since_ts = int((datetime.now() - timedelta(hours=24)).timestamp())
+    since_ts = current_ts - 24 * 3600
     print(f"   Fetching activity since: {datetime.fromtimestamp(since_ts)}")
 
     try:
-        response = fetch_wallet_activity_bitquery(test_wallet, "base", since_ts)
-        print("   ✅ API call successful")
-        print(f"   📊 Events retrieved: {len(response.get('events', []))}")
-        print(f"   🔖 Provider: {response.get('provider')}")
-        print(f"   📈 Metadata: {response.get('metadata', {})}")
+        # Run the blocking HTTP fetch off the event loop
+        response = await asyncio.to_thread(fetch_wallet_activity_bitquery, test_wallet, "base", since_ts)
+        print(
+            "   ✅ API call successful",
+            f"   📊 Events retrieved: {len(response.get('events', []))}",
+            f"   🔖 Provider: {response.get('provider')}",
+            f"   📈 Metadata: {response.get('metadata', {})}",
+            sep="\n"
+        )
 
         # Show sample event if available
         events = response.get('events', [])
@@ -91,31 +108,43 @@ async def test_live_bitquery_integration():
     print()
 
     # Test 2: Raw data storage
-    print("💾 Test 2: Raw Data Storage")
-    print("-" * 40)
+    print("💾 Test 2: Raw Data Storage", "-" * 40, sep="\n")
+
+    # Cursor checked in Test 4; written alongside the raw save below
+    cursor_key = f"wallet:{test_wallet}"
 
     try:
         # Generate unique ID for this test
-        test_id = f"live_test_{test_wallet}_{int(datetime.now().timestamp())}"
-
-        # Save raw response to Layer 1
-        await save_raw_response(
-            test_id,
-            "wallet_activity",
-            response,
-            provenance={
-                "source": "bitquery",
-                "address": test_wallet,
-                "chain": "base",
-                "since_ts": since_ts,
-                "snapshot_time": int(datetime.now().timestamp()),
-                "test_run": True
-            }
+        test_id = f"live_test_{test_wallet}_{current_ts}"
+        # Hashed once; Test 3 reuses it to detect the unchanged payload
+        response_hash = compute_content_hash(response)
+
+        # Save raw response to Layer 1 and advance the wallet cursor.
+        # They touch disjoint tables, so the writes can overlap.
+        await asyncio.gather(
+            save_raw_response(
+                test_id,
+                KIND_WALLET_ACTIVITY,
+                response,
+                provenance={
+                    "source": "bitquery",
+                    "address": test_wallet,
+                    "chain": CHAIN_BASE,
+                    "since_ts": since_ts,
+                    "snapshot_time": current_ts,
+                    "test_run": True
+                },
+                content_hash=response_hash
+            ),
+            set_cursor(cursor_key, current_ts, "Live test cursor update")
         )
 
-        print("   ✅ Raw data saved to Layer 1")
-        print(f"   🆔 Raw ID: {test_id}")
-        print("   📋 Provenance includes: source, address, chain, timestamps")
+        print(
+            "   ✅ Raw data saved to Layer 1",
+            f"   🆔 Raw ID: {test_id}",
+            "   📋 Provenance includes: source, address, chain, timestamps",
+            sep="\n"
+        )
 
     except Exception as e:
         print(f"   ❌ Raw storage failed: {e}")
@@ -124,27 +153,27 @@ async def test_live_bitquery_integration():
     print()
 
     # Test 3: Idempotency check
-    print("🔄 Test 3: Idempotency Check")
-    print("-" * 40)
+    print("🔄 Test 3: Idempotency Check", "-" * 40, sep="\n")
 
     try:
         # Try to save the same data again
         await save_raw_response(
             test_id,
-            "wallet_activity",
+            KIND_WALLET_ACTIVITY,
             response,
             provenance={
                 "source": "bitquery",
                 "address": test_wallet,
-                "chain": "base",
+                "chain": CHAIN_BASE,
                 "since_ts": since_ts,
-                "snapshot_time": int(datetime.now().timestamp()),
+                "snapshot_time": current_ts,
                 "test_run": True,
                 "duplicate_test": True
-            }
+            },
+            content_hash=response_hash
         )
 
-        print("   ✅ Idempotent storage confirmed (no duplicate errors)")
+        print("   ✅ Idempotent storage confirmed (unchanged payload skipped)")
     except Exception as e:
         print(f"   ❌ Idempotency test failed: {e}")
         return False
@@ -152,18 +181,15 @@ async def test_live_bitquery_integration():
     print()
 
     # Test 4: Cursor management
-    print("📍 Test 4: Cursor Management")
-    print("-" * 40)
+    print("📍 Test 4: Cursor Management", "-" * 40, sep="\n")
 
     try:
-        cursor_key = f"wallet:{test_wallet}"
-        current_ts = int(datetime.now().timestamp())
-
-        # Set cursor
-        await set_cursor(cursor_key, current_ts, "Live test cursor update")
-        print("   ✅ Cursor set successfully")
-        print(f"   🔑 Cursor key: {cursor_key}")
-        print(f"   📅 Timestamp: {current_ts}")
+        print(
+            "   ✅ Cursor set successfully",
+            f"   🔑 Cursor key: {cursor_key}",
+            f"   📅 Timestamp: {current_ts}",
+            sep="\n"
+        )
 
         # Get cursor
         retrieved_cursor = await get_cursor(cursor_key)
@@ -180,12 +206,11 @@ async def test_live_bitquery_integration():
     print()
 
     # Test 5: Error handling
-    print("🛡️  Test 5: Error Handling")
-    print("-" * 40)
+    print("🛡️  Test 5: Error Handling", "-" * 40, sep="\n")
 
     try:
         # Test with invalid wallet address
-        invalid_response = fetch_wallet_activity_bitquery("0xinvalid", "base", since_ts)
+        invalid_response = await asyncio.to_thread(fetch_wallet_activity_bitquery, "0xinvalid", CHAIN_BASE, since_ts)
         print("   ✅ Graceful handling of invalid wallet")
     except Exception as e:
         print(f"   ⚠️  Error handling test: {e}")
@@ -193,58 +218,67 @@ async def test_live_bitquery_integration():
     print()
 
     # Summary
-    print("📊 Test Summary")
-    print("-" * 40)
-    print("   ✅ Live Bitquery integration: Working")
-    print("   ✅ Raw-first storage: Working")
-    print("   ✅ Provenance tracking: Working")
-    print("   ✅ Idempotent behavior: Working")
-    print("   ✅ Cursor management: Working")
-    print("   ✅ Error handling: Working")
-    print()
+    print(
+        "📊 Test Summary",
+        "-" * 40,
+        "   ✅ Live Bitquery integration: Working",
+        "   ✅ Raw-first storage: Working",
+        "   ✅ Provenance tracking: Working",
+        "   ✅ Idempotent behavior: Working",
+        "   ✅ Cursor management: Working",
+        "   ✅ Error handling: Working\n",
+        sep="\n"
+    )
 
     if live_mode and access_token:
         print("🎉 LIVE MODE: All tests passed with real Bitquery API!")
     else:
-        print("🟡 MOCK MODE: All tests passed with mock data")
-        print("   💡 To test live mode: set BITQUERY_ACCESS_TOKEN in your .env file")
+        print(
+            "🟡 MOCK MODE: All tests passed with mock data",
+            "   💡 To test live mode: set BITQUERY_ACCESS_TOKEN in your .env file",
+            sep="\n"
+        )
 
     return True
 
 
 async def demo_live_wallet_recon():
     """Demo live wallet recon with real-time data."""
-    print("🚀 Live Wallet Recon Demo")
-    print("=" * 60)
+    print("🚀 Live Wallet Recon Demo", "=" * 60, sep="\n")
 
     # Use a well-known active wallet on Base for demo
     active_wallet = "0x1234567890abcdef1234567890abcdef12345678"
 
-    print(f"🎯 Active wallet: {active_wallet}")
-    print("⏰ Time window: Last 24 hours")
-    print()
+    print(f"🎯 Active wallet: {active_wallet}", "⏰ Time window: Last 24 hours\n", sep="\n")
 
-    # Force live mode for demo
-    original_token = os.getenv("BITQUERY_ACCESS_TOKEN") or os.getenv("BITQUERY_API_KEY")
-    
-    # Ensure we have a token for live mode
-    if not original_token:
-        os.environ["BITQUERY_ACCESS_TOKEN"] = "demo_token_for_testing"
+    access_token = os.getenv("BITQUERY_ACCESS_TOKEN")
+    token = access_token or os.getenv("BITQUERY_API_KEY")
 
-    if not original_token:
-        print("⚠️  No BITQUERY_API_KEY found - demo will fallback to mock")
-        print("💡 To see live data, add your Bitquery API key to .env")
-        print("   Set BITQUERY_API_KEY=your_api_key_here")
-        print("   💳 Note: You'll need to set up billing with Bitquery to use live queries")
-        print()
+    # Force live mode for demo: without any token, a placeholder one is set
+    # for the duration of the query
+    live_mode = bool(access_token) or not token
+    env = contextlib.nullcontext() if token else temp_env("BITQUERY_ACCESS_TOKEN", "demo_token_for_testing")
 
-    try:
-        response = fetch_wallet_activity_bitquery(active_wallet, "base")
+    if not token:
+        print(
+            "⚠️  No BITQUERY_API_KEY found - demo will fallback to mock",
+            "💡 To see live data, add your Bitquery API key to .env",
+            "   Set BITQUERY_API_KEY=your_api_key_here",
+            "   💳 Note: You'll need to set up billing with Bitquery to use live queries\n",
+            sep="\n"
+        )
 
-        print("📊 Live Query Results:")
-        print(f"   🔴 Live Mode: {'Yes' if os.getenv('BITQUERY_ACCESS_TOKEN') else 'No'}")
-        print(f"   📈 Events: {len(response.get('events', []))}")
-        print(f"   🏷️  Provider: {response.get('provider')}")
+    try:
+        with env:
+            response = await asyncio.to_thread(fetch_wallet_activity_bitquery, active_wallet, CHAIN_BASE)
+
+        print(
+            "📊 Live Query Results:",
+            f"   🔴 Live Mode: {'Yes' if live_mode else 'No'}",
+            f"   📈 Events: {len(response.get('events', []))}",
+            f"   🏷️  Provider: {response.get('provider')}",
+            sep="\n"
+        )
 
         metadata = response.get('metadata', {})
         print(f"   📅 Fetched at: {datetime.fromtimestamp(metadata.get('fetched_at', 0))}")
@@ -253,10 +287,10 @@ async def demo_live_wallet_recon():
         if events:
             print(f"   💡 Recent activity ({len(events)} events):")
             for i, event in enumerate(events[:5]):  # Show first 5
-                ts = datetime.fromtimestamp(event.get('ts'))
+                hhmm = time.strftime('%H:%M', time.localtime(event.get('ts')))
                 event_type = event.get('type')
                 usd = event.get('usd')
-                print(f"      {i+1}. {ts.strftime('%H:%M')} - {event_type}" +
+                print(f"      {i+1}. {hhmm} - {event_type}" +
                       (f" (${usd:.2f})" if usd else ""))
 
             if len(events) > 5:
@@ -267,18 +301,10 @@ async def demo_live_wallet_recon():
     except Exception as e:
         print(f"❌ Live demo failed: {e}")
 
-    finally:
-        # Restore original environment
-        if original_token:
-            os.environ["BITQUERY_ACCESS_TOKEN"] = original_token
-        elif "BITQUERY_ACCESS_TOKEN" in os.environ and not original_token:
-            del os.environ["BITQUERY_ACCESS_TOKEN"]
-
 
 async def main():
     """Main function."""
-    print("🔥 Wallet Recon Live Integration Test Suite")
-    print("=" * 70)
+    print("🔥 Wallet Recon Live Integration Test Suite", "=" * 70, sep="\n")
 
     try:
         # Run comprehensive test
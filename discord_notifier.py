@@ -5,18 +5,60 @@ Discord notification service for AI Mayhem briefs.
 Uses discord.py library for proper Discord API integration.
 """
 
-from typing import Dict, Any, Optional
+import asyncio
+import contextlib
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import discord
 
 from nodes.config import DISCORD_WEBHOOK_URL
 
+# Notifications arriving within this window go out as one webhook message
+FLUSH_MS = 250
+# Discord accepts at most 10 embeds per webhook message, and at most 6000
+# characters across all of their titles, descriptions, fields and footers
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# Embed field names by metadata key; the same few keys recur on every brief
+_PRETTY_KEYS: Dict[str, str] = {}
+
+
+def _pretty_key(key: str) -> str:
+    """Format a metadata key as an embed field name, e.g. 'budget_used' -> 'Budget Used'."""
+    name = _PRETTY_KEYS.get(key)
+    if name is None:
+        name = _PRETTY_KEYS[key] = key.replace('_', ' ').title()
+    return name
+
+
+def _split_by_length(batch: List[Tuple[str, discord.Embed, asyncio.Future]]) -> List[list]:
+    """Split queued notifications into messages within Discord's summed embed length."""
+    messages = []
+    current, length = [], 0
+    for item in batch:
+        embed_length = len(item[1])
+        if current and length + embed_length > MAX_EMBED_CHARS_PER_MESSAGE:
+            messages.append(current)
+            current, length = [], 0
+        current.append(item)
+        length += embed_length
+    if current:
+        messages.append(current)
+    return messages
+
 class DiscordNotifier:
     """Discord notification service."""
     
     def __init__(self) -> None:
         """Initialize Discord notifier."""
-        self._webhook: Optional[discord.Webhook] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+    
+    # Shared by every notifier so repeated notifications reuse pooled
+    # connections instead of paying a TCP+TLS handshake each time
+    _shared_session = None
+    _shared_webhook: Optional[discord.Webhook] = None
     
     def is_enabled(self) -> bool:
         """Check if Discord notifications are enabled."""
@@ -26,7 +68,8 @@ class DiscordNotifier:
         self,
         title: str,
         brief_text: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        embed: Optional[discord.Embed] = None
     ) -> bool:
         """
         Send a Discord notification with brief content.
@@ -35,6 +78,8 @@ class DiscordNotifier:
             title: Notification title
             brief_text: The generated brief content  
             metadata: Additional metadata to include
+            embed: Prebuilt embed to send as-is instead of building one
+                from brief_text and metadata
             
         Returns:
             True if successful, False otherwise
@@ -46,13 +91,58 @@ class DiscordNotifier:
         if not self.is_enabled():
             return False
         
+        try:
+            if embed is None:
+                embed = self._create_embed(title, brief_text, metadata)
+            
+            # Queue for the background sender and wait for its batch to go out
+            self._ensure_flusher()
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((title, embed, future))
+            return await future
+            
+        except Exception as e:
+            print(f"❌ Discord notification failed: {str(e)}")
+            return False
+    
+    def _ensure_flusher(self) -> None:
+        """Start the background sender if it is not running on this loop."""
+        if self._flusher is None or self._flusher.done():
+            self._queue = asyncio.Queue()
+            self._flusher = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self) -> None:
+        """Collect queued notifications for FLUSH_MS and send them together."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + FLUSH_MS / 1000
+                while len(batch) < MAX_EMBEDS_PER_MESSAGE:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                
+                for message in _split_by_length(batch):
+                    self._resolve(message, await self._send_batch(message))
+            except asyncio.CancelledError:
+                self._resolve(batch, False)
+                raise
+    
+    async def _send_batch(self, batch: List[Tuple[str, discord.Embed, asyncio.Future]]) -> bool:
+        """Send queued embeds in one webhook message, headed by each brief's title."""
         try:
             webhook = await self._get_webhook()
-            embed = self._create_embed(title, brief_text, metadata)
             
+            # discord.py's webhook adapter already sleeps for retry_after
+            # and retries when Discord answers 429
             await webhook.send(
-                content=f"🤖 **{title}**",
-                embed=embed
+                content="\n".join(f"🤖 **{title}**" for title, _, _ in batch),
+                embeds=[embed for _, embed, _ in batch]
             )
             
             return True
@@ -61,29 +151,63 @@ class DiscordNotifier:
             print(f"❌ Discord notification failed: {str(e)}")
             return False
     
+    @staticmethod
+    def _resolve(batch: List[Tuple[str, discord.Embed, asyncio.Future]], success: bool) -> None:
+        """Report a batch's outcome to every waiting caller."""
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(success)
+    
+    async def stop(self) -> None:
+        """Stop the background sender; anything still queued reports failure."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        
+        while self._queue is not None and not self._queue.empty():
+            self._resolve([self._queue.get_nowait()], False)
+    
     async def _get_webhook(self) -> discord.Webhook:
         """Get Discord webhook instance."""
         if not DISCORD_WEBHOOK_URL:
             raise ValueError("Discord webhook URL not configured")
         
-        if self._webhook is None:
+        cls = DiscordNotifier
+        if cls._shared_webhook is None or cls._shared_session.closed:
             import aiohttp
-            self._session = aiohttp.ClientSession()
-            self._webhook = discord.Webhook.from_url(
-                DISCORD_WEBHOOK_URL,
-                session=self._session
+            # Idle connections stay pooled for 2 minutes (aiohttp's default is
+            # 15s), so notifications minutes apart skip the TLS handshake
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=10,
+                    limit_per_host=4,
+                    keepalive_timeout=120,
+                    enable_cleanup_closed=True,
+                    ttl_dns_cache=300
+                ),
+                headers={"Connection": "keep-alive"},
+                timeout=aiohttp.ClientTimeout(total=30, sock_read=None)
             )
+            try:
+                cls._shared_webhook = discord.Webhook.from_url(
+                    DISCORD_WEBHOOK_URL,
+                    session=session
+                )
+            except ValueError:
+                await session.close()
+                raise
+            cls._shared_session = session
         
-        return self._webhook
+        return cls._shared_webhook
         
     async def __aenter__(self):
         """Async context manager entry."""
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit."""
-        if hasattr(self, '_session'):
-            await self._session.close()
+        """Async context manager exit. The shared session stays open; see close_notifier()."""
     
     def _create_embed(
         self,
@@ -105,7 +229,7 @@ class DiscordNotifier:
         if metadata:
             for key, value in metadata.items():
                 embed.add_field(
-                    name=key.replace('_', ' ').title(),
+                    name=_pretty_key(key),
                     value=str(value),
                     inline=True
                 )
@@ -113,6 +237,20 @@ class DiscordNotifier:
         return embed
 
 
+# Module-level notifier used by send_discord_notification
+_notifier = DiscordNotifier()
+
+
+async def close_notifier() -> None:
+    """Stop the module notifier and close the shared Discord HTTP session. Call once at shutdown."""
+    await _notifier.stop()
+    session = DiscordNotifier._shared_session
+    DiscordNotifier._shared_session = None
+    DiscordNotifier._shared_webhook = None
+    if session is not None and not session.closed:
+        await session.close()
+
+
 async def send_discord_notification(title: str, brief_text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
     """
     Simple function to send Discord notification.
@@ -125,8 +263,7 @@ async def send_discord_notification(title: str, brief_text: str, metadata: Optio
     Returns:
         True if successful, False otherwise
     """
-    async with DiscordNotifier() as notifier:
-        return await notifier.send_brief_notification(title, brief_text, metadata)
+    return await _notifier.send_brief_notification(title, brief_text, metadata)
 
 
 async def test_discord_notification() -> bool:
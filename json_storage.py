@@ -5,15 +5,30 @@ Stores arbitrary JSON responses from external APIs/MCPs without schema commitmen
 Production-ready with proper namespacing, concurrency controls, and observability.
 """
 
+import hashlib
 import json
 import sqlite3
 import asyncio
+import threading
 import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Use the same database as the agent
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "agent_state.db"
@@ -22,120 +37,489 @@ DB_PATH = BASE_DIR / "agent_state.db"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Payloads at least this large are stored compressed in raw_blob
+COMPRESS_MIN_BYTES = 512
+PAYLOAD_CODEC = "zstd" if zstandard is not None else "zlib"
+
+# DatabaseManager keeps the JSON text of recently read or written ids.
+# A hit is only served while PRAGMA data_version is unchanged, i.e. no other
+# connection or process (SyncDatabaseManager, data_model, another agent)
+# has committed since; entries also expire after the TTL.
+READ_CACHE_SIZE = 1024
+READ_CACHE_TTL = 60.0
+
+# Production pragmas, applied to every connection
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA cache_size=10000",
+    "PRAGMA temp_store=MEMORY",
+    # Read pages through a 256 MB memory map instead of read() syscalls
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+# Idempotent schema statements, run in order
+_SCHEMA = (
+    # Namespaced JSON cache
+    """
+    CREATE TABLE IF NOT EXISTS json_cache_scratch (
+        id TEXT PRIMARY KEY,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        source TEXT NOT NULL,
+        raw_json TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Audit log
+    """
+    CREATE TABLE IF NOT EXISTS writes_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        table_name TEXT NOT NULL,
+        operation TEXT NOT NULL,
+        n_rows INTEGER NOT NULL,
+        note TEXT
+    )
+    """,
+    # Cursors for delta fetches
+    """
+    CREATE TABLE IF NOT EXISTS cursors (
+        name TEXT PRIMARY KEY,
+        last_ts INTEGER NOT NULL,
+        notes TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # LLM usage tracking
+    """
+    CREATE TABLE IF NOT EXISTS llm_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        estimated_cost REAL NOT NULL,
+        request_id TEXT
+    )
+    """,
+    # Agent messages moved out of checkpointed state, oldest first per thread
+    """
+    CREATE TABLE IF NOT EXISTS messages_archive (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL,
+        message TEXT NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Indexes for performance
+    "CREATE INDEX IF NOT EXISTS idx_messages_archive_thread ON messages_archive(thread_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_json_cache_source_ts ON json_cache_scratch(source, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_json_cache_created ON json_cache_scratch(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_writes_log_ts ON writes_log(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_llm_usage_ts ON llm_usage(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_llm_usage_model ON llm_usage(model)",
+)
+
+# Additive column migrations; each fails harmlessly once applied. They run
+# once per database, recorded in PRAGMA user_version: bump SCHEMA_VERSION
+# when adding one, so the backfills below are not repeated on every open.
+# raw_blob/codec hold compressed payloads (raw_blob is NULL for small ones).
+# content_hash is shared with data_model, which adds the same column.
+# ts_unix is an integer copy of llm_usage.timestamp for range scans; rows
+# written before it existed are backfilled.
+# llm_usage_hourly is a per-hour, per-model rollup kept current by a
+# trigger, so daily totals read at most 24 buckets per model (plus the raw
+# rows of the hour the 24h window starts in). The backfill
+# only creates buckets that are missing, so rerunning it never double counts.
+SCHEMA_VERSION = 1
+_MIGRATIONS = (
+    "ALTER TABLE json_cache_scratch ADD COLUMN raw_blob BLOB",
+    "ALTER TABLE json_cache_scratch ADD COLUMN codec TEXT",
+    "ALTER TABLE json_cache_scratch ADD COLUMN content_hash TEXT",
+    "ALTER TABLE llm_usage ADD COLUMN ts_unix INTEGER",
+    "CREATE INDEX IF NOT EXISTS idx_llm_usage_ts_unix ON llm_usage(ts_unix)",
+    "UPDATE llm_usage SET ts_unix = CAST(strftime('%s', timestamp) AS INTEGER) WHERE ts_unix IS NULL",
+    """
+    CREATE TABLE IF NOT EXISTS llm_usage_hourly (
+        bucket_hour INTEGER NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        estimated_cost REAL NOT NULL,
+        request_count INTEGER NOT NULL,
+        PRIMARY KEY (bucket_hour, model)
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_llm_usage_hourly AFTER INSERT ON llm_usage
+    BEGIN
+        INSERT INTO llm_usage_hourly
+            (bucket_hour, model, prompt_tokens, completion_tokens, estimated_cost, request_count)
+        VALUES (
+            COALESCE(NEW.ts_unix, CAST(strftime('%s', NEW.timestamp) AS INTEGER)) / 3600,
+            NEW.model, NEW.prompt_tokens, NEW.completion_tokens, NEW.estimated_cost, 1
+        )
+        ON CONFLICT (bucket_hour, model) DO UPDATE SET
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens,
+            estimated_cost = estimated_cost + excluded.estimated_cost,
+            request_count = request_count + 1;
+    END
+    """,
+    """
+    INSERT OR IGNORE INTO llm_usage_hourly
+        (bucket_hour, model, prompt_tokens, completion_tokens, estimated_cost, request_count)
+    SELECT ts_unix / 3600, model, SUM(prompt_tokens), SUM(completion_tokens),
+           SUM(estimated_cost), COUNT(*)
+    FROM llm_usage
+    WHERE ts_unix IS NOT NULL
+    GROUP BY ts_unix / 3600, model
+    """,
+)
+
+# Shared by every write path so sqlite3's statement cache, which is
+# keyed on the SQL text, prepares each statement once per connection
+SQL_STATEMENT_CACHE_SIZE = 256
+_SQL_UPSERT_JSON = """
+    INSERT OR REPLACE INTO json_cache_scratch (id, source, raw_json, raw_blob, codec, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_SQL_SAME_CONTENT = """
+    SELECT 1 FROM json_cache_scratch WHERE id = ? AND source = ? AND content_hash = ?
+"""
+_SQL_DAILY_USAGE = """
+    SELECT SUM(p), SUM(c), SUM(cost), SUM(n) FROM (
+        SELECT prompt_tokens AS p, completion_tokens AS c, estimated_cost AS cost, request_count AS n
+        FROM llm_usage_hourly WHERE bucket_hour >= ?
+        UNION ALL
+        SELECT prompt_tokens, completion_tokens, estimated_cost, 1
+        FROM llm_usage WHERE ts_unix >= ? AND ts_unix < ?
+    )
+"""
+_SQL_DAILY_USAGE_MODEL = """
+    SELECT SUM(p), SUM(c), SUM(cost), SUM(n) FROM (
+        SELECT prompt_tokens AS p, completion_tokens AS c, estimated_cost AS cost, request_count AS n
+        FROM llm_usage_hourly WHERE bucket_hour >= ? AND model = ?
+        UNION ALL
+        SELECT prompt_tokens, completion_tokens, estimated_cost, 1
+        FROM llm_usage WHERE ts_unix >= ? AND ts_unix < ? AND model = ?
+    )
+"""
+_SQL_LOG_WRITE = """
+    INSERT INTO writes_log (table_name, operation, n_rows, note)
+    VALUES (?, ?, ?, ?)
+"""
+
+# writes_log rows for single upserts are buffered and written together
+# once this many accumulate or this many seconds pass since the last flush
+AUDIT_FLUSH_ROWS = 100
+AUDIT_FLUSH_SECONDS = 5.0
+
+# cleanup_old_data deletes at most this many rows per transaction
+CLEANUP_BATCH_ROWS = 1000
+
+# Raised by _decode_payload for rows that cannot be read back
+DECODE_ERRORS = (ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def json_bytes(payload: Any) -> bytes:
+    """
+    Serialize payload to UTF-8 JSON, using orjson when it is installed.
+    
+    Keys are sorted, so equal payloads serialize (and _content_hash) the
+    same whatever order their keys were built in.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; stdlib json handles them
+            # and raises TypeError for anything truly unserializable
+            pass
+    try:
+        return json.dumps(payload, sort_keys=True).encode()
+    except TypeError:
+        # Mixed int and str keys cannot be sorted
+        return json.dumps(payload).encode()
+
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _encode_payload(data: bytes) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """Split serialized JSON into (raw_json, raw_blob, codec) column values."""
+    if len(data) < COMPRESS_MIN_BYTES:
+        return data.decode(), None, None
+    if PAYLOAD_CODEC == "zstd":
+        return "", zstandard.ZstdCompressor(level=3).compress(data), PAYLOAD_CODEC
+    return "", zlib.compress(data), PAYLOAD_CODEC
+
+
+def _content_hash(data: bytes) -> str:
+    """Digest of json_bytes output, stored so unchanged re-uploads can be skipped."""
+    return hashlib.blake2b(data).hexdigest()
+
+
+def compute_content_hash(payload: Any) -> str:
+    """
+    Stable digest of a payload, independent of key order.
+    
+    The digest upsert_json stores, so data_model can skip a row this module
+    wrote with the same payload and vice versa.
+    """
+    return _content_hash(json_bytes(payload))
+
+
+def payload_json(raw_json: str, raw_blob: Optional[bytes], codec: Optional[str]):
+    """Recover the stored JSON text (or bytes) from its column values."""
+    if raw_blob is None:
+        return raw_json
+    if codec == "zlib":
+        return zlib.decompress(raw_blob)
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(raw_blob)
+    raise ValueError(f"cannot decode payload with codec {codec!r}")
+
+
+def _decode_payload(raw_json: str, raw_blob: Optional[bytes], codec: Optional[str]) -> Any:
+    """Inverse of _encode_payload."""
+    return _json_loads(payload_json(raw_json, raw_blob, codec))
+
+
+def _is_open(conn) -> bool:
+    """Whether an aiosqlite connection can still run statements."""
+    try:
+        conn.in_transaction
+    except (ValueError, sqlite3.ProgrammingError):
+        # aiosqlite raises ValueError once closed, sqlite3 if closed under it
+        return False
+    return True
+
+
+async def _connect_daemon(db_path: Path):
+    """
+    Open an aiosqlite connection whose worker thread is a daemon.
+    
+    aiosqlite's worker is non-daemon, and a shared connection that is never
+    closed must not block interpreter exit. Threads inherit daemon status
+    from the thread that creates them, so the connection object is built
+    on a short-lived daemon thread and started (awaited) here.
+    """
+    import aiosqlite
+    built = []
+    builder = threading.Thread(
+        target=lambda: built.append(
+            aiosqlite.connect(db_path, cached_statements=SQL_STATEMENT_CACHE_SIZE)
+        ),
+        daemon=True
+    )
+    builder.start()
+    builder.join()
+    return await built[0]
+
 
 class DatabaseManager:
     """Manages database connections and operations."""
     
     def __init__(self, db_path: Path):
         self.db_path = db_path
+        # One connection shared by every call, opened lazily
+        self._conn = None
+        self._conn_lock = asyncio.Lock()
+        # Serializes write transactions on the shared connection
+        self._write_lock = asyncio.Lock()
+        self._initialized = False
+        # id -> (expires_at, JSON str/bytes), least recently used first.
+        # Serialized rather than dicts, so callers never share a mutable payload.
+        self._read_cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # PRAGMA data_version the cache entries were read against, and the
+        # check shared by every cache hit in the current event-loop tick
+        self._cache_version = None
+        self._version_check = None
+        # Pending writes_log rows; flushed with a later write or on close()
+        self._audit_buffer: List[Tuple[str, str, int, str]] = []
+        self._audit_last_flush = time.monotonic()
+    
+    def _cache_put(self, id: str, raw_json: Any) -> None:
+        """Remember the JSON text stored for id."""
+        self._read_cache[id] = (time.monotonic() + READ_CACHE_TTL, raw_json)
+        self._read_cache.move_to_end(id)
+        if len(self._read_cache) > READ_CACHE_SIZE:
+            self._read_cache.popitem(last=False)
     
     async def initialize(self):
-        """Initialize database with proper pragmas and tables."""
-        conn = await self._get_connection()
-        
-        # Set production pragmas
-        await conn.execute("PRAGMA journal_mode=WAL")
-        await conn.execute("PRAGMA synchronous=NORMAL")
-        await conn.execute("PRAGMA foreign_keys=ON")
-        await conn.execute("PRAGMA cache_size=10000")
-        await conn.execute("PRAGMA temp_store=MEMORY")
-        
-        # Create namespaced tables
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS json_cache_scratch (
-                id TEXT PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source TEXT NOT NULL,
-                raw_json TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create audit log table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS writes_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                table_name TEXT NOT NULL,
-                operation TEXT NOT NULL,
-                n_rows INTEGER NOT NULL,
-                note TEXT
-            )
-        """)
-        
-        # Create cursors table for delta fetches
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS cursors (
-                name TEXT PRIMARY KEY,
-                last_ts INTEGER NOT NULL,
-                notes TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create LLM usage tracking
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS llm_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                model TEXT NOT NULL,
-                prompt_tokens INTEGER NOT NULL,
-                completion_tokens INTEGER NOT NULL,
-                estimated_cost REAL NOT NULL,
-                request_id TEXT
-            )
-        """)
+        """Initialize database tables; pragmas are applied per connection."""
+        if self._initialized:
+            return
         
-        # Create indexes for performance
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_json_cache_source_ts ON json_cache_scratch(source, timestamp)")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_json_cache_created ON json_cache_scratch(created_at)")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_writes_log_ts ON writes_log(timestamp)")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ts ON llm_usage(timestamp)")
-        await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_model ON llm_usage(model)")
+        async with self._transaction() as conn:
+            # Create namespaced tables, audit log, cursors, LLM usage and indexes
+            for statement in _SCHEMA:
+                await conn.execute(statement)
+            
+            async with conn.execute("PRAGMA user_version") as cursor:
+                version = (await cursor.fetchone())[0]
+            if version < SCHEMA_VERSION:
+                for statement in _MIGRATIONS:
+                    try:
+                        await conn.execute(statement)
+                    except sqlite3.OperationalError:
+                        # Column already exists, ignore
+                        pass
+                await conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         
-        await conn.commit()
-        await conn.close()
+        self._initialized = True
         
         logger.info("Database initialized with production settings")
     
     async def _get_connection(self):
-        """Get async database connection."""
-        import aiosqlite
-        return await aiosqlite.connect(self.db_path)
+        """Get the shared async database connection, opening it on first use."""
+        async with self._conn_lock:
+            # Reopen if a caller closed the connection it was handed
+            if self._conn is None or not _is_open(self._conn):
+                conn = await _connect_daemon(self.db_path)
+                
+                # Set production pragmas once per connection
+                for pragma in _PRAGMAS:
+                    await conn.execute(pragma)
+                self._conn = conn
+                
+                # data_version is per connection, and anything may have
+                # changed while none was open
+                self._read_cache.clear()
+                self._cache_version = await self._data_version(conn)
+                self._version_check = None
+            return self._conn
+    
+    @staticmethod
+    async def _data_version(conn) -> int:
+        """Counter SQLite bumps whenever another connection commits."""
+        async with conn.execute("PRAGMA data_version") as cursor:
+            return (await cursor.fetchone())[0]
+    
+    async def _cache_current(self, conn) -> bool:
+        """
+        Whether the read cache still matches the database.
+        
+        Asks for data_version at most once per event-loop tick, so a burst
+        of cache hits costs one round trip; a commit from another connection
+        clears the cache.
+        """
+        if self._version_check is None:
+            self._version_check = asyncio.ensure_future(self._check_version(conn))
+        return await asyncio.shield(self._version_check)
+    
+    async def _check_version(self, conn) -> bool:
+        """Compare data_version with the cache's; see _cache_current."""
+        try:
+            version = await self._data_version(conn)
+        finally:
+            # Hits from the next tick on ask again
+            asyncio.get_running_loop().call_soon(setattr, self, "_version_check", None)
+        if version == self._cache_version:
+            return True
+        # Someone else committed; any entry may be stale
+        self._read_cache.clear()
+        self._cache_version = version
+        return False
+    
+    @asynccontextmanager
+    async def _transaction(self):
+        """
+        The shared connection for one write transaction.
+        
+        Writers take turns, so a commit or rollback only ever covers the
+        statements of the caller that issued them. Commits on success and
+        rolls back if the block raises.
+        """
+        conn = await self._get_connection()
+        async with self._write_lock:
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
     
     async def upsert_json(self, id: str, source: str, payload: dict) -> None:
         """
         Save JSON data with upsert behavior.
         
+        Nothing is written when the stored row already has the same source
+        and payload.
+        
         Args:
             id: Unique identifier
             source: Source of the data
             payload: Dictionary to store as JSON
         """
-        # Validate JSON serializability
+        # Serializing once doubles as the JSON-serializability check
         try:
-            json.dumps(payload)
+            raw_json = json_bytes(payload)
         except (TypeError, ValueError) as e:
             raise ValueError(f"payload is not JSON-serializable: {e}")
         
-        conn = await self._get_connection()
+        content_hash = _content_hash(raw_json)
         
-        try:
-            await conn.execute("""
-                INSERT OR REPLACE INTO json_cache_scratch (id, source, raw_json)
-                VALUES (?, ?, ?)
-            """, (id, source, json.dumps(payload)))
+        async with self._transaction() as conn:
+            # Re-uploading an unchanged payload (e.g. polling) writes nothing
+            async with conn.execute(_SQL_SAME_CONTENT, (id, source, content_hash)) as cursor:
+                unchanged = await cursor.fetchone() is not None
             
-            # Log the operation
-            await conn.execute("""
-                INSERT INTO writes_log (table_name, operation, n_rows, note)
-                VALUES (?, ?, ?, ?)
-            """, ("json_cache_scratch", "upsert", 1, f"Upserted {id} from {source}"))
-            
-            await conn.commit()
+            if not unchanged:
+                await conn.execute(_SQL_UPSERT_JSON, (id, source, *_encode_payload(raw_json), content_hash))
+                
+                # Log the operation, riding along with this commit when due
+                self._audit_buffer.append(("json_cache_scratch", "upsert", 1, f"Upserted {id} from {source}"))
+                if (len(self._audit_buffer) >= AUDIT_FLUSH_ROWS
+                        or time.monotonic() - self._audit_last_flush >= AUDIT_FLUSH_SECONDS):
+                    await self._write_audit(conn)
+        
+        self._cache_put(id, raw_json)
+    
+    async def _write_audit(self, conn) -> None:
+        """Insert buffered writes_log rows; the caller commits."""
+        rows, self._audit_buffer = self._audit_buffer, []
+        self._audit_last_flush = time.monotonic()
+        if rows:
+            await conn.executemany(_SQL_LOG_WRITE, rows)
+    
+    async def flush_audit(self) -> None:
+        """Write any buffered writes_log rows now."""
+        if self._audit_buffer:
+            async with self._transaction() as conn:
+                await self._write_audit(conn)
+    
+    async def upsert_json_many(self, items: List[Tuple[str, str, dict]]) -> None:
+        """
+        Save many JSON payloads in a single transaction.
+        
+        Args:
+            items: (id, source, payload) tuples, upserted like upsert_json
+        """
+        rows = []
+        texts = []
+        for id, source, payload in items:
+            try:
+                raw_json = json_bytes(payload)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"payload for {id} is not JSON-serializable: {e}")
+            rows.append((id, source, *_encode_payload(raw_json), _content_hash(raw_json)))
+            texts.append((id, raw_json))
+        
+        if not rows:
+            return
+        
+        async with self._transaction() as conn:
+            await conn.executemany(_SQL_UPSERT_JSON, rows)
             
-        finally:
-            await conn.close()
+            # One log row for the whole batch
+            await conn.execute(_SQL_LOG_WRITE, ("json_cache_scratch", "upsert", len(rows), f"Upserted {len(rows)} rows in batch"))
+        
+        for id, raw_json in texts:
+            self._cache_put(id, raw_json)
     
     async def load_json(self, id: str) -> Optional[dict]:
         """
@@ -149,19 +533,26 @@ class DatabaseManager:
         """
         conn = await self._get_connection()
         
+        cached = self._read_cache.get(id)
+        if cached is not None and cached[0] > time.monotonic() and await self._cache_current(conn):
+            self._read_cache.move_to_end(id)
+            return _json_loads(cached[1])
+        
         try:
-            async with conn.execute("SELECT raw_json FROM json_cache_scratch WHERE id = ?", (id,)) as cursor:
+            async with conn.execute("SELECT raw_json, raw_blob, codec FROM json_cache_scratch WHERE id = ?", (id,)) as cursor:
                 row = await cursor.fetchone()
                 
                 if row is None:
                     return None
                 
-                return json.loads(row[0])
-        except json.JSONDecodeError:
+                raw_json = payload_json(*row)
+                payload = _json_loads(raw_json)
+        except DECODE_ERRORS:
             logger.warning(f"Corrupted JSON data for id: {id}")
             return None
-        finally:
-            await conn.close()
+        
+        self._cache_put(id, raw_json)
+        return payload
     
     async def query_recent(self, source: str, limit: int = 10) -> List[dict]:
         """
@@ -176,218 +567,338 @@ class DatabaseManager:
         """
         conn = await self._get_connection()
         
-        try:
-            results = []
-            async with conn.execute("""
-                SELECT raw_json FROM json_cache_scratch 
-                WHERE source = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (source, limit)) as cursor:
-                async for row in cursor:
-                    try:
-                        results.append(json.loads(row[0]))
-                    except json.JSONDecodeError:
-                        logger.warning(f"Skipping corrupted JSON in query_recent for source: {source}")
-                        continue
-            
-            return results
-        finally:
-            await conn.close()
+        # One round trip for the whole page; idx_json_cache_source_ts is
+        # walked backwards for the DESC order, so there is no sort step
+        async with conn.execute("""
+            SELECT raw_json, raw_blob, codec FROM json_cache_scratch 
+            WHERE source = ? 
+            ORDER BY timestamp DESC 
+            LIMIT ?
+        """, (source, limit)) as cursor:
+            rows = await cursor.fetchall()
+        
+        results = []
+        for row in rows:
+            try:
+                results.append(_decode_payload(*row))
+            except DECODE_ERRORS:
+                logger.warning(f"Skipping corrupted JSON in query_recent for source: {source}")
+                continue
+        
+        return results
     
     async def set_cursor(self, name: str, last_ts: int, notes: str = None) -> None:
         """Set cursor for delta fetches."""
-        conn = await self._get_connection()
-        
-        try:
+        async with self._transaction() as conn:
             await conn.execute("""
                 INSERT OR REPLACE INTO cursors (name, last_ts, notes)
                 VALUES (?, ?, ?)
             """, (name, last_ts, notes))
-            
-            await conn.commit()
-        finally:
-            await conn.close()
     
     async def get_cursor(self, name: str) -> Optional[int]:
         """Get cursor timestamp."""
         conn = await self._get_connection()
         
-        try:
-            async with conn.execute("SELECT last_ts FROM cursors WHERE name = ?", (name,)) as cursor:
-                row = await cursor.fetchone()
-                return row[0] if row else None
-        finally:
-            await conn.close()
+        async with conn.execute("SELECT last_ts FROM cursors WHERE name = ?", (name,)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+    
+    async def archive_messages(self, thread_id: str, messages: List[str]) -> None:
+        """Append messages to a thread's archive in one transaction."""
+        if not messages:
+            return
+        async with self._transaction() as conn:
+            await conn.executemany(
+                "INSERT INTO messages_archive (thread_id, message) VALUES (?, ?)",
+                [(thread_id, message) for message in messages]
+            )
+    
+    async def get_archived_messages(self, thread_id: str) -> List[str]:
+        """Archived messages for a thread, oldest first."""
+        conn = await self._get_connection()
+        
+        async with conn.execute(
+            "SELECT message FROM messages_archive WHERE thread_id = ? ORDER BY id", (thread_id,)
+        ) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
     
     async def record_llm_usage(self, model: str, prompt_tokens: int, 
                               completion_tokens: int, estimated_cost: float, 
                               request_id: str = None) -> None:
         """Record LLM usage for budget tracking."""
-        conn = await self._get_connection()
-        
-        try:
+        async with self._transaction() as conn:
             await conn.execute("""
-                INSERT INTO llm_usage (model, prompt_tokens, completion_tokens, estimated_cost, request_id)
-                VALUES (?, ?, ?, ?, ?)
-            """, (model, prompt_tokens, completion_tokens, estimated_cost, request_id))
-            
-            await conn.commit()
-        finally:
-            await conn.close()
+                INSERT INTO llm_usage (model, prompt_tokens, completion_tokens, estimated_cost, request_id, ts_unix)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (model, prompt_tokens, completion_tokens, estimated_cost, request_id, int(time.time())))
     
     async def get_daily_usage(self, model: str = None) -> Dict[str, Any]:
-        """Get 24h usage statistics."""
+        """Get usage statistics for the last 24 hours."""
         conn = await self._get_connection()
         
-        try:
-            if model:
-                async with conn.execute("""
-                    SELECT SUM(prompt_tokens), SUM(completion_tokens), SUM(estimated_cost), COUNT(*)
-                    FROM llm_usage 
-                    WHERE model = ? AND timestamp >= datetime('now', '-1 day')
-                """, (model,)) as cursor:
-                    row = await cursor.fetchone()
-            else:
-                async with conn.execute("""
-                    SELECT SUM(prompt_tokens), SUM(completion_tokens), SUM(estimated_cost), COUNT(*)
-                    FROM llm_usage 
-                    WHERE timestamp >= datetime('now', '-1 day')
-                """) as cursor:
-                    row = await cursor.fetchone()
-            
-            if row and row[0]:
-                return {
-                    'prompt_tokens': row[0],
-                    'completion_tokens': row[1],
-                    'estimated_cost': row[2],
-                    'request_count': row[3]
-                }
-            return {'prompt_tokens': 0, 'completion_tokens': 0, 'estimated_cost': 0.0, 'request_count': 0}
-        finally:
-            await conn.close()
+        # Whole hours inside the window are read from the hourly rollup;
+        # the part of the oldest hour that falls inside it from llm_usage
+        since = int(time.time()) - 86400
+        first_bucket = since // 3600 + 1
+        if model:
+            async with conn.execute(_SQL_DAILY_USAGE_MODEL, (
+                first_bucket, model, since, first_bucket * 3600, model
+            )) as cursor:
+                row = await cursor.fetchone()
+        else:
+            async with conn.execute(_SQL_DAILY_USAGE, (
+                first_bucket, since, first_bucket * 3600
+            )) as cursor:
+                row = await cursor.fetchone()
+        
+        if row and row[0]:
+            return {
+                'prompt_tokens': row[0],
+                'completion_tokens': row[1],
+                'estimated_cost': row[2],
+                'request_count': row[3]
+            }
+        return {'prompt_tokens': 0, 'completion_tokens': 0, 'estimated_cost': 0.0, 'request_count': 0}
     
     async def health_check(self) -> bool:
         """Run database health check."""
         conn = await self._get_connection()
         
-        try:
-            # Check required tables exist
-            tables = []
-            async with conn.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name IN ('json_cache_scratch', 'cursors', 'llm_usage', 'writes_log')
-            """) as cursor:
-                async for row in cursor:
-                    tables.append(row[0])
-            
-            if len(tables) < 4:
-                logger.error(f"Missing required tables. Found: {tables}")
-                return False
-            
-            # Run integrity check
-            async with conn.execute("PRAGMA integrity_check") as cursor:
-                result = await cursor.fetchone()
-            
-            if result[0] != "ok":
-                logger.error(f"Database integrity check failed: {result[0]}")
-                return False
-            
-            logger.info("Database health check passed")
-            return True
-            
-        finally:
-            await conn.close()
+        # Check required tables exist
+        tables = []
+        async with conn.execute("""
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name IN ('json_cache_scratch', 'cursors', 'llm_usage', 'writes_log')
+        """) as cursor:
+            for row in await cursor.fetchall():
+                tables.append(row[0])
+        
+        if len(tables) < 4:
+            logger.error(f"Missing required tables. Found: {tables}")
+            return False
+        
+        # Run integrity check
+        async with conn.execute("PRAGMA integrity_check") as cursor:
+            result = await cursor.fetchone()
+        
+        if result[0] != "ok":
+            logger.error(f"Database integrity check failed: {result[0]}")
+            return False
+        
+        logger.info("Database health check passed")
+        return True
+        
     
     async def cleanup_old_data(self, days: int = 30) -> int:
         """Clean up old JSON cache data."""
-        conn = await self._get_connection()
-        
-        try:
-            result = await conn.execute("""
-                DELETE FROM json_cache_scratch 
-                WHERE created_at < datetime('now', '-{} days')
-            """.format(days))
-            
-            deleted_count = result.rowcount
-            await conn.commit()
+        # Delete in chunks, committing between them, so writers sharing the
+        # database never wait behind one long delete transaction. The bound
+        # modifier keeps the SQL text constant for the statement cache.
+        deleted_count = 0
+        while True:
+            async with self._transaction() as conn:
+                result = await conn.execute("""
+                    DELETE FROM json_cache_scratch 
+                    WHERE rowid IN (
+                        SELECT rowid FROM json_cache_scratch 
+                        WHERE created_at < datetime('now', ?) 
+                        LIMIT ?
+                    )
+                """, (f"-{days} days", CLEANUP_BATCH_ROWS))
             
-            logger.info(f"Cleaned up {deleted_count} old JSON cache records")
-            return deleted_count
-        finally:
-            await conn.close()
+            deleted_count += result.rowcount
+            if result.rowcount < CLEANUP_BATCH_ROWS:
+                break
+        self._read_cache.clear()
+        
+        logger.info(f"Cleaned up {deleted_count} old JSON cache records")
+        return deleted_count
     
     async def close(self):
         """Close database manager."""
-        pass
+        await self.flush_audit()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class SyncDatabaseManager:
+    """
+    Blocking counterpart of DatabaseManager for synchronous callers.
+    
+    Talks to the stdlib sqlite3 module directly with one connection per
+    thread, so no event loop is started per call.
+    """
+    
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._local = threading.local()
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening and preparing it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=SQL_STATEMENT_CACHE_SIZE)
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                for statement in _MIGRATIONS:
+                    try:
+                        conn.execute(statement)
+                    except sqlite3.OperationalError:
+                        # Column already exists, ignore
+                        pass
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+    
+    def upsert_json(self, id: str, source: str, payload: dict) -> None:
+        """Save JSON data with upsert behavior; see DatabaseManager.upsert_json."""
+        try:
+            raw_json = json_bytes(payload)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"payload is not JSON-serializable: {e}")
+        
+        conn = self._get_connection()
+        with conn:
+            conn.execute(_SQL_UPSERT_JSON, (id, source, *_encode_payload(raw_json), _content_hash(raw_json)))
+            conn.execute(_SQL_LOG_WRITE, ("json_cache_scratch", "upsert", 1, f"Upserted {id} from {source}"))
+    
+    def load_json(self, id: str) -> Optional[dict]:
+        """Load JSON data by ID; None if missing or unreadable."""
+        row = self._get_connection().execute(
+            "SELECT raw_json, raw_blob, codec FROM json_cache_scratch WHERE id = ?", (id,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        try:
+            return _decode_payload(*row)
+        except DECODE_ERRORS:
+            logger.warning(f"Corrupted JSON data for id: {id}")
+            return None
+    
+    def query_recent(self, source: str, limit: int = 10) -> List[dict]:
+        """Query recent JSON data by source, newest first."""
+        rows = self._get_connection().execute("""
+            SELECT raw_json, raw_blob, codec FROM json_cache_scratch 
+            WHERE source = ? 
+            ORDER BY timestamp DESC 
+            LIMIT ?
+        """, (source, limit)).fetchall()
+        
+        results = []
+        for row in rows:
+            try:
+                results.append(_decode_payload(*row))
+            except DECODE_ERRORS:
+                logger.warning(f"Skipping corrupted JSON in query_recent for source: {source}")
+                continue
+        
+        return results
 
 
 # Global database manager instance
 _db_manager = None
+# Serializes lazy initialization from the async wrappers
+_init_lock = asyncio.Lock()
 
 
 async def init_db():
     """Initialize the database manager."""
     global _db_manager
-    _db_manager = DatabaseManager(DB_PATH)
-    await _db_manager.initialize()
+    # Publish only once the schema exists, so callers never see a half-ready manager
+    manager = DatabaseManager(DB_PATH)
+    await manager.initialize()
+    _db_manager = manager
+
+
+async def _init_db_once():
+    """Initialize the database manager unless a concurrent caller already did."""
+    async with _init_lock:
+        if _db_manager is None:
+            await init_db()
 
 
 async def save_json(id: str, source: str, json_blob: dict) -> None:
     """Save JSON data (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     await _db_manager.upsert_json(id, source, json_blob)
 
 
+async def save_json_many(items: List[Tuple[str, str, dict]]) -> None:
+    """Save many JSON payloads in one transaction (async wrapper)."""
+    if _db_manager is None:
+        await _init_db_once()
+    await _db_manager.upsert_json_many(items)
+
+
 async def load_json(id: str) -> Optional[dict]:
     """Load JSON data (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     return await _db_manager.load_json(id)
 
 
 async def query_recent(source: str, limit: int = 10) -> List[dict]:
     """Query recent JSON data (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     return await _db_manager.query_recent(source, limit)
 
 
+async def archive_messages(thread_id: str, messages: List[str]) -> None:
+    """Append messages to a thread's archive (async wrapper)."""
+    if _db_manager is None:
+        await _init_db_once()
+    await _db_manager.archive_messages(thread_id, messages)
+
+
+async def get_archived_messages(thread_id: str) -> List[str]:
+    """Get a thread's archived messages (async wrapper)."""
+    if _db_manager is None:
+        await _init_db_once()
+    return await _db_manager.get_archived_messages(thread_id)
+
+
 async def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, 
                           estimated_cost: float, request_id: str = None) -> None:
     """Record LLM usage (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     await _db_manager.record_llm_usage(model, prompt_tokens, completion_tokens, 
                                       estimated_cost, request_id)
 
 
 async def get_daily_usage(model: str = None) -> Dict[str, Any]:
     """Get daily usage statistics (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     return await _db_manager.get_daily_usage(model)
 
 
 async def get_cursor(name: str) -> Optional[int]:
     """Get cursor timestamp (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     return await _db_manager.get_cursor(name)
 
 
 async def set_cursor(name: str, last_ts: int, notes: str = None) -> None:
     """Set cursor for delta fetches (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     await _db_manager.set_cursor(name, last_ts, notes)
 
 
 async def health_check() -> bool:
     """Run health check (async wrapper)."""
-    if not _db_manager:
-        await init_db()
+    if _db_manager is None:
+        await _init_db_once()
     return await _db_manager.health_check()
 
 
@@ -399,17 +910,29 @@ async def close_db():
         _db_manager = None
 
 
+# Global synchronous manager, rebuilt if DB_PATH changes
+_sync_db_manager = None
+
+
+def _get_sync_db() -> SyncDatabaseManager:
+    """Get the synchronous database manager for the current DB_PATH."""
+    global _sync_db_manager
+    if _sync_db_manager is None or _sync_db_manager.db_path != DB_PATH:
+        _sync_db_manager = SyncDatabaseManager(DB_PATH)
+    return _sync_db_manager
+
+
 # Synchronous wrappers for backward compatibility
 def save_json_sync(id: str, source: str, json_blob: dict) -> None:
     """Synchronous wrapper for save_json."""
-    asyncio.run(save_json(id, source, json_blob))
+    _get_sync_db().upsert_json(id, source, json_blob)
 
 
 def load_json_sync(id: str) -> Optional[dict]:
     """Synchronous wrapper for load_json."""
-    return asyncio.run(load_json(id))
+    return _get_sync_db().load_json(id)
 
 
 def query_recent_sync(source: str, limit: int = 10) -> List[dict]:
     """Synchronous wrapper for query_recent."""
-    return asyncio.run(query_recent(source, limit))
+    return _get_sync_db().query_recent(source, limit)
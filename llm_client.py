@@ -10,13 +10,38 @@ Features:
 """
 
 import os
+import re
 import json
+import time
+import random
+import atexit
+import asyncio
+import threading
+import hashlib
 import datetime
-from typing import Dict, Any, List, Tuple, Optional
+import functools
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional, Callable, Awaitable, AsyncIterator, Union, TYPE_CHECKING
 from pathlib import Path
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+import httpx
+
+# LangChain takes most of a second to import, so it is loaded on first use
+# by the client factory and message helpers below
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langchain_core.messages import BaseMessage, SystemMessage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import h2  # noqa: F401 - lets httpx speak HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 # Configuration
@@ -28,32 +53,142 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "dummy")  # LiteLLM ignores this
 HAIKU_MODEL = "anthropic/claude-3-haiku-20240307"
 SONNET_MODEL = "anthropic/claude-3-5-sonnet-20240620"
 
-# Cost tracking (per 1M tokens)
+# Cost tracking (per 1M tokens); prompt-cache reads bill at 0.1x input
+# and cache writes at 1.25x
 PRICING = {
-    "haiku":  {"in": 0.25/1e6, "out": 1.25/1e6},
-    "sonnet": {"in": 3.00/1e6, "out": 15.0/1e6},
+    "haiku":  {"in": 0.25/1e6, "out": 1.25/1e6, "cache_read": 0.025/1e6, "cache_write": 0.3125/1e6},
+    "sonnet": {"in": 3.00/1e6, "out": 15.0/1e6, "cache_read": 0.30/1e6, "cache_write": 3.75/1e6},
 }
 
+# System prompts at least this long are marked for Anthropic prompt caching.
+# Anthropic will not cache a prefix under 1024 tokens (~4 chars each), so
+# shorter prompts are sent as plain strings.
+PROMPT_CACHE_MIN_CHARS = 4096
+
+# Response cache: identical requests (model, messages, max_tokens, extra
+# params) within the TTL are answered from memory or json_storage instead
+# of calling the model again. Messages that differ only in whitespace count
+# as identical; calls sampled at temperature > 0 want fresh samples and
+# bypass the cache. That includes the clients' own default temperature, so
+# pass temperature=0 for a cacheable call. Set LLM_CACHE_TTL=0 to disable.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))  # seconds
+LLM_CACHE_SIZE = 256  # in-memory entries
+LLM_CACHE_SOURCE = "llm_cache"
+
+# llm_call_batch fan-out: calls in flight, per-attempt timeout and retries
+LLM_BATCH_CONCURRENCY = 8
+LLM_BATCH_TIMEOUT = 90.0  # seconds
+LLM_BATCH_RETRIES = 3
+LLM_BATCH_BASE_DELAY = 1.0  # seconds, doubled per retry
+LLM_BATCH_MAX_DELAY = 30.0  # seconds
+
+# Batch API (llm_batch_submit/llm_batch_collect): half-price, asynchronous
+# completions for bulk jobs that can wait up to the completion window
+BATCH_DISCOUNT = 0.5
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = 30.0  # first poll delay, doubled up to the max
+BATCH_POLL_MAX_SECONDS = 600.0
+BATCH_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
 # Logging setup
 BASE_DIR = Path(__file__).resolve().parent
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
 
+# JSONL log lines are buffered and appended in batches, off the event loop;
+# a timer flushes lines still buffered LOG_FLUSH_SECONDS after the first
+LOG_FLUSH_ENTRIES = 32
+LOG_FLUSH_SECONDS = 1.0
+
+
+def _json_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize obj to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+            return orjson.dumps(obj, option=option, default=str)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; stdlib json handles them
+            pass
+    return json.dumps(obj, sort_keys=sort_keys, default=str).encode()
 
-# Initialize LangChain clients (OpenAI-style, but routed to LiteLLM)
-HAIKU_CLIENT = ChatOpenAI(
-    model=HAIKU_MODEL,
-    temperature=0.2,
-    base_url=OPENAI_BASE_URL,
-    api_key=OPENAI_API_KEY
-)
 
-SONNET_CLIENT = ChatOpenAI(
-    model=SONNET_MODEL,
-    temperature=0.1,
-    base_url=OPENAI_BASE_URL,
-    api_key=OPENAI_API_KEY
-)
+# Parses model output and log lines; orjson's JSONDecodeError subclasses
+# json.JSONDecodeError, so callers catch the same exception either way
+parse_json = orjson.loads if orjson is not None else json.loads
+
+
+# One connection pool to LiteLLM shared by both model clients, so concurrent
+# calls reuse warm keep-alive connections (multiplexed when h2 is installed)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=90)
+HTTP_CLIENT = httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+
+# Blocking counterpart for sync invoke(); nothing here calls it, so the pool
+# is only built alongside the first model client
+_sync_http: Optional[httpx.Client] = None
+
+
+def _sync_http_client() -> httpx.Client:
+    global _sync_http
+    if _sync_http is None:
+        _sync_http = httpx.Client(http2=HTTP2_AVAILABLE, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+    return _sync_http
+
+# LangChain clients (OpenAI-style, but routed to LiteLLM), built on first use;
+# also reachable as the module attributes HAIKU_CLIENT and SONNET_CLIENT
+_MODEL_TEMPERATURES = {HAIKU_MODEL: 0.2, SONNET_MODEL: 0.1}
+_CLIENT_NAMES = {HAIKU_MODEL: "HAIKU_CLIENT", SONNET_MODEL: "SONNET_CLIENT"}
+
+
+def _is_sampled(client_model: str, kwargs: Dict[str, Any]) -> bool:
+    """Whether a call runs at temperature > 0, counting the client's default."""
+    return bool(kwargs.get("temperature", _MODEL_TEMPERATURES[client_model]))
+
+
+def _model_client(model: str) -> "ChatOpenAI":
+    """Shared client for HAIKU_MODEL or SONNET_MODEL, created on first call."""
+    name = _CLIENT_NAMES[model]
+    client = globals().get(name)
+    if client is None:
+        from langchain_openai import ChatOpenAI
+        client = globals()[name] = ChatOpenAI(
+            model=model,
+            temperature=_MODEL_TEMPERATURES[model],
+            base_url=OPENAI_BASE_URL,
+            api_key=OPENAI_API_KEY,
+            http_client=_sync_http_client(),
+            http_async_client=HTTP_CLIENT
+        )
+    return client
+
+
+def __getattr__(name: str) -> Any:
+    for model, client_name in _CLIENT_NAMES.items():
+        if name == client_name:
+            return _model_client(model)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def warm_llm_connection() -> None:
+    """
+    Open a pooled connection to LiteLLM ahead of the first model call.
+    
+    Uses the liveliness probe, which unlike /health does not call every
+    configured model. Failures are ignored; the real call will report them.
+    """
+    try:
+        await HTTP_CLIENT.get(f"{LITELLM_URL}/health/liveliness", timeout=2.0)
+    except httpx.HTTPError:
+        pass
+
+
+async def close_llm_client() -> None:
+    """Close the shared LiteLLM connection pools; call once at shutdown."""
+    _close_log_files()
+    await HTTP_CLIENT.aclose()
+    if _sync_http is not None:
+        _sync_http.close()
 
 
 def _needs_sonnet(text: str, task_type: Optional[str] = None) -> bool:
@@ -75,8 +210,9 @@ def _needs_sonnet(text: str, task_type: Optional[str] = None) -> bool:
     return is_complex
 
 
-def _convert_messages(messages: List[Tuple[str, str]]) -> List[SystemMessage | HumanMessage]:
+def _convert_messages(messages: List[Tuple[str, str]]) -> List["BaseMessage"]:
     """Convert tuple format to LangChain message objects."""
+    from langchain_core.messages import HumanMessage, SystemMessage
     lc_messages = []
     for role, content in messages:
         if role == "system":
@@ -86,6 +222,131 @@ def _convert_messages(messages: List[Tuple[str, str]]) -> List[SystemMessage | H
     return lc_messages
 
 
+# (epoch of the next local midnight, today's local date)
+_today_cache: Tuple[float, datetime.date] = (0.0, datetime.date.min)
+
+
+def _today() -> datetime.date:
+    """Local date, looked up again only once the clock passes midnight."""
+    global _today_cache
+    if time.time() >= _today_cache[0]:
+        today = datetime.date.today()
+        tomorrow = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time())
+        _today_cache = (tomorrow.timestamp(), today)
+    return _today_cache[1]
+
+
+# kind -> (date, path) for the current day's log file
+_log_paths: Dict[str, Tuple[datetime.date, Path]] = {}
+
+
+def _daily_log_path(kind: str) -> Path:
+    """Path of today's llm-<kind> log, rebuilt only when the date changes."""
+    today = _today()
+    cached = _log_paths.get(kind)
+    if cached is None or cached[0] != today:
+        cached = _log_paths[kind] = (today, LOGS_DIR / f"llm-{kind}-{today.isoformat()}.jsonl")
+    return cached[1]
+
+
+# (whole epoch second, "YYYY-MM-DDTHH:MM:SS" for it)
+_timestamp_prefix: Tuple[int, str] = (-1, "")
+
+
+def utc_timestamp() -> str:
+    """Current UTC time as ISO 8601 with microseconds and a Z suffix."""
+    global _timestamp_prefix
+    now = time.time()
+    second = int(now)
+    if second != _timestamp_prefix[0]:
+        _timestamp_prefix = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second)))
+    return f"{_timestamp_prefix[1]}.{int((now - second) * 1e6):06d}Z"
+
+
+# path -> pending encoded lines; _log_write_lock keeps batches in order per file
+_log_buffer: Dict[Path, List[bytes]] = {}
+_log_buffer_lock = threading.Lock()
+_log_write_lock = threading.Lock()
+_log_last_flush = time.monotonic()
+# Flushes lines that no later call comes along to flush; None when idle
+_log_timer: Optional[threading.Timer] = None
+# path -> O_APPEND descriptor kept open across flushes; only used under
+# _log_write_lock
+_log_fds: Dict[Path, int] = {}
+
+
+def _queue_log_line(path: Path, entry: Dict[str, Any]) -> None:
+    """Buffer one JSONL record for path."""
+    global _log_timer
+    line = _json_bytes(entry) + b"\n"
+    with _log_buffer_lock:
+        _log_buffer.setdefault(path, []).append(line)
+        if _log_timer is None:
+            _log_timer = threading.Timer(LOG_FLUSH_SECONDS, flush_llm_logs)
+            _log_timer.daemon = True
+            _log_timer.start()
+
+
+def _log_flush_due() -> bool:
+    """True when enough lines are buffered, or they have waited long enough."""
+    with _log_buffer_lock:
+        if not _log_buffer:
+            return False
+        pending = sum(len(lines) for lines in _log_buffer.values())
+    return pending >= LOG_FLUSH_ENTRIES or time.monotonic() - _log_last_flush >= LOG_FLUSH_SECONDS
+
+
+def _log_fd(path: Path) -> int:
+    """Open append descriptor for path; descriptors for earlier days are closed."""
+    fd = _log_fds.get(path)
+    if fd is None:
+        current = {cached[1] for cached in _log_paths.values()}
+        for old_path in [p for p in _log_fds if p not in current]:
+            os.close(_log_fds.pop(old_path))
+        fd = _log_fds[path] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    return fd
+
+
+def flush_llm_logs() -> None:
+    """
+    Append buffered log lines to their files, one os.write per file.
+    
+    Writing straight to an O_APPEND descriptor skips the file object's own
+    buffer and lock, and each batch lands at the end of the file even with
+    several processes logging to it.
+    """
+    global _log_buffer, _log_last_flush, _log_timer
+    with _log_write_lock:
+        with _log_buffer_lock:
+            pending, _log_buffer = _log_buffer, {}
+            _log_last_flush = time.monotonic()
+            if _log_timer is not None:
+                _log_timer.cancel()
+                _log_timer = None
+        for path, lines in pending.items():
+            fd = _log_fd(path)
+            data = memoryview(b"".join(lines))
+            while data:
+                data = data[os.write(fd, data):]
+
+
+def _close_log_files() -> None:
+    """Flush pending lines and close the open log files."""
+    flush_llm_logs()
+    with _log_write_lock:
+        for fd in _log_fds.values():
+            os.close(fd)
+        _log_fds.clear()
+
+
+atexit.register(_close_log_files)
+
+
+def _preview(text: str, limit: int = 200) -> str:
+    """Return text cut to limit chars with "..." appended, or text itself if short."""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+
 def _log_interaction(model: str, messages: List[Tuple[str, str]], response: str, usage: Dict[str, Any]):
     """Log the LLM interaction for debugging and cost tracking."""
     # Format messages for better readability
@@ -101,15 +362,12 @@ def _log_interaction(model: str, messages: List[Tuple[str, str]], response: str,
     estimated_cost = estimate_cost(model, usage)
     total_tokens = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
     
-    # Truncate response for readability but keep full response in logs
-    truncated_response = response[:200] + "..." if len(response) > 200 else response
-    
     log_entry = {
-        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "timestamp": utc_timestamp(),
         "model": model,
         "messages": formatted_messages,  # Already in dict format with role/content
         "response": {
-            "text": truncated_response,
+            "text": _preview(response),  # Short form for readability
             "full_text": response  # Keep full response for debugging
         },
         "usage": usage,
@@ -117,16 +375,180 @@ def _log_interaction(model: str, messages: List[Tuple[str, str]], response: str,
         "total_tokens": total_tokens
     }
     
-    # Log to file
-    log_path = LOGS_DIR / f"llm-calls-{datetime.date.today().isoformat()}.jsonl"
-    with open(log_path, "a") as f:
-        # Use pretty printing with 2-space indentation
-        f.write(json.dumps(log_entry, indent=2) + "\n\n")
+    # Queue for the log file; one JSON record per line (JSONL)
+    _count_call(model, estimated_cost)
+    log_path = _daily_log_path("calls")
+    _queue_log_line(log_path, log_entry)
     
     # Print summary
     print(f"    📊 LLM call stats: {log_entry['total_tokens']} tokens, ${estimated_cost:.6f}")
 
 
+# key -> cached response, least recently used first
+_response_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# request key -> future of the first identical call still in flight
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+
+def _cache_key(model: str, messages: List[Dict[str, str]], max_tokens: int,
+               kwargs: Dict[str, Any]) -> str:
+    """
+    Digest identifying an LLM request.
+    
+    Message content is whitespace-normalized, so prompts that only differ in
+    indentation or line breaks (e.g. from f-string templates) share an entry.
+    """
+    normalized = [
+        [msg["role"], _WHITESPACE_RE.sub(" ", msg["content"]).strip()] for msg in messages
+    ]
+    request = _json_bytes([model, max_tokens, normalized, kwargs], sort_keys=True)
+    return hashlib.sha256(request).hexdigest()
+
+
+def _remember(key: str, entry: Dict[str, Any]) -> None:
+    """Add a response to the in-memory cache."""
+    _response_cache[key] = entry
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > LLM_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+async def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Look a request up in memory, then in json_storage; None on a miss."""
+    entry = _response_cache.get(key)
+    if entry is None:
+        try:
+            from json_storage import load_json
+            entry = await load_json(f"{LLM_CACHE_SOURCE}:{key}")
+        except Exception:
+            # The cache is best effort; storage problems just mean a miss
+            entry = None
+        if entry is None:
+            return None
+    
+    if time.time() - entry["cached_at"] > LLM_CACHE_TTL:
+        _response_cache.pop(key, None)
+        return None
+    
+    _remember(key, entry)
+    return entry
+
+
+async def _cache_put(key: str, text: str, usage: Dict[str, Any], model_short: str) -> None:
+    """Store a response in memory and in json_storage."""
+    entry = {"text": text, "usage": usage, "model": model_short, "cached_at": time.time()}
+    _remember(key, entry)
+    try:
+        from json_storage import save_json
+        await save_json(f"{LLM_CACHE_SOURCE}:{key}", LLM_CACHE_SOURCE, entry)
+    except Exception:
+        pass
+
+
+def _system_message(content: str) -> "SystemMessage":
+    """
+    System message, marked as a prompt-cache breakpoint when long enough.
+    
+    LiteLLM forwards the block's cache_control to Anthropic, which then
+    bills and processes a repeated system prompt as a cheap cache read.
+    The few fixed prompts are built once and the same object is reused;
+    callers must not modify it.
+    """
+    return _build_system_message(content, PROMPT_CACHE_MIN_CHARS)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_system_message(content: str, min_cache_chars: int) -> "SystemMessage":
+    from langchain_core.messages import SystemMessage
+    if len(content) < min_cache_chars:
+        return SystemMessage(content=content)
+    return SystemMessage(content=[
+        {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+    ])
+
+
+def json_array_complete(text: str) -> bool:
+    """
+    Stream stop predicate: True once text holds a complete JSON array.
+    
+    Only tries to parse when the text ends in "]", so streaming a long reply
+    costs one cheap check per chunk rather than one parse per chunk.
+    """
+    text = text.rstrip()
+    if not text.endswith("]"):
+        return False
+    start = text.find("[")
+    if start < 0:
+        return False
+    try:
+        parse_json(text[start:])
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+async def _stream_text(
+    client: "ChatOpenAI",
+    lc_messages: List["BaseMessage"],
+    stop_when: Callable[[str], bool],
+    max_tokens: int,
+    **kwargs
+) -> Tuple[str, Dict[str, Any], bool]:
+    """
+    Stream a completion and stop reading once stop_when(text) is satisfied.
+    
+    Closing the stream early drops the connection, so LiteLLM stops
+    generating the unused tail.
+    
+    Returns:
+        (text, usage, stopped_early)
+    """
+    # A running string rather than re-joining every chunk for stop_when;
+    # appending to an unshared str is amortized linear in CPython
+    text = ""
+    usage_metadata = None
+    stopped_early = False
+    stream = client.astream(lc_messages, max_tokens=max_tokens, stream_usage=True, **kwargs)
+    try:
+        async for chunk in stream:
+            if chunk.usage_metadata:
+                usage_metadata = chunk.usage_metadata
+            if chunk.content:
+                text += chunk.content
+                if stop_when(text):
+                    stopped_early = True
+                    break
+    finally:
+        await stream.aclose()
+    
+    return text, _stream_usage(usage_metadata, lc_messages, text), stopped_early
+
+
+def _stream_usage(usage_metadata: Optional[Dict[str, Any]], lc_messages: List["BaseMessage"],
+                  text: str) -> Dict[str, Any]:
+    """Token usage of a streamed completion in token_usage form."""
+    if usage_metadata:
+        return {
+            "prompt_tokens": usage_metadata.get("input_tokens", 0),
+            "completion_tokens": usage_metadata.get("output_tokens", 0),
+            "total_tokens": usage_metadata.get("total_tokens", 0)
+        }
+    # Usage arrives with the final chunk, which an early stop never
+    # reads; estimate at ~4 chars/token so budget tracking still counts it
+    prompt_tokens = sum(len(str(m.content)) for m in lc_messages) // 4
+    completion_tokens = len(text) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "estimated": True
+    }
+
+
 def estimate_cost(model: str, usage: Dict[str, Any]) -> float:
     """Estimate the cost of an LLM call."""
     if model not in PRICING:
@@ -135,20 +557,87 @@ def estimate_cost(model: str, usage: Dict[str, Any]) -> float:
     pricing = PRICING[model]
     prompt_tokens = usage.get("prompt_tokens", 0)
     completion_tokens = usage.get("completion_tokens", 0)
+    # LiteLLM includes prompt-cache reads and writes in prompt_tokens
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    uncached = max(prompt_tokens - cache_read - cache_write, 0)
     
     cost = (
-        pricing["in"] * prompt_tokens + 
+        pricing["in"] * uncached + 
+        pricing["cache_read"] * cache_read +
+        pricing["cache_write"] * cache_write +
         pricing["out"] * completion_tokens
     )
     
     return cost
 
 
+def _select_model(messages: List[Dict[str, str]], model: Optional[str],
+                  task_type: Optional[str]) -> Tuple[str, str, str]:
+    """
+    Resolve the model for a call.
+    
+    Returns:
+        (model, client_model, model_short); model is what the caller asked
+        for (or the auto-selected one) and keys the cache and the logs
+    """
+    # Auto-select model if not specified
+    if model is None:
+        # Use the first human message to determine complexity
+        human_content = next((msg["content"] for msg in messages if msg["role"] == "user"), "")
+        model = SONNET_MODEL if _needs_sonnet(human_content, task_type) else HAIKU_MODEL
+    
+    # Select appropriate client based on model name
+    client_model = SONNET_MODEL if model == SONNET_MODEL else HAIKU_MODEL
+    model_short = "sonnet" if client_model == SONNET_MODEL else "haiku"
+    return model, client_model, model_short
+
+
+def _to_langchain(messages: List[Dict[str, str]]) -> List["BaseMessage"]:
+    """Convert role/content dicts to LangChain messages."""
+    from langchain_core.messages import HumanMessage, AIMessage
+    lc_messages = []
+    for msg in messages:
+        if msg["role"] == "system":
+            lc_messages.append(_system_message(msg["content"]))
+        elif msg["role"] == "user":
+            lc_messages.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            lc_messages.append(AIMessage(content=msg["content"]))
+    return lc_messages
+
+
+async def _log_error(model: str, messages: List[Dict[str, str]], error: Exception) -> None:
+    """Write a failed call to the error log straight away."""
+    # Format messages for better readability
+    formatted_messages = []
+    for msg in messages:
+        formatted_msg = {
+            "role": msg["role"],
+            "content": msg["content"].replace("\\n", "\n")  # Unescape newlines
+        }
+        formatted_messages.append(formatted_msg)
+
+    error_log = {
+        "timestamp": utc_timestamp(),
+        "error": str(error),
+        "model": model,
+        "messages": formatted_messages
+    }
+
+    # Errors are flushed straight away so the record is on disk when
+    # the exception surfaces
+    log_path = _daily_log_path("errors")
+    _queue_log_line(log_path, error_log)
+    await asyncio.to_thread(flush_llm_logs)
+
+
 async def llm_call(
     messages: List[Dict[str, str]], 
     model: str = None,
     max_tokens: int = 400,
     task_type: str = None,  # e.g. "brief", "chat", etc.
+    stop_when: Optional[Callable[[str], bool]] = None,
     **kwargs
 ) -> Dict[str, Any]:
     """
@@ -158,113 +647,478 @@ async def llm_call(
         messages: List of message dicts with "role" and "content" keys
         model: HAIKU_MODEL, SONNET_MODEL, or None for auto-selection
         max_tokens: Maximum tokens for response
+        stop_when: Optional predicate on the text so far; when given, the
+            response is streamed and reading stops as soon as it returns True
+            (e.g. json_array_complete)
         **kwargs: Additional parameters for the LLM call
     
     Returns:
-        Dict with "text", "usage", and "model_used" keys
+        Dict with "text", "usage", "model" and "estimated_cost" keys; a
+        response served from the cache also has "cached": True and costs 0,
+        and one shared with an identical call already in flight has
+        "coalesced": True and costs 0
     """
-    # Auto-select model if not specified
-    if model is None:
-        # Use the first human message to determine complexity
-        human_content = next((msg["content"] for msg in messages if msg["role"] == "user"), "")
-        model = SONNET_MODEL if _needs_sonnet(human_content, task_type) else HAIKU_MODEL
+    model, client_model, model_short = _select_model(messages, model, task_type)
     
-    # Select appropriate client based on model name
-    if model == SONNET_MODEL:
-        client = SONNET_CLIENT
-        model_short = "sonnet"
-    else:
-        client = HAIKU_CLIENT
-        model_short = "haiku"
+    # Sampled replies are meant to differ, so they are neither cached nor shared
+    request_key = None
+    if not _is_sampled(client_model, kwargs):
+        request_key = _cache_key(model, messages, max_tokens, kwargs)
     
-    print(f"    📡 LLM call using {model_short} model")
-    
-    # Convert messages to LangChain format
-    lc_messages = []
-    for msg in messages:
-        if msg["role"] == "system":
-            lc_messages.append(SystemMessage(content=msg["content"]))
-        elif msg["role"] == "user":
-            lc_messages.append(HumanMessage(content=msg["content"]))
-        elif msg["role"] == "assistant":
-            lc_messages.append(AIMessage(content=msg["content"]))
+    # An identical plain call already in flight answers this one too; the
+    # check comes before any await so simultaneous callers see each other
+    inflight = None
+    if request_key is not None and stop_when is None:
+        pending = _inflight.get(request_key)
+        if pending is not None:
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only our own cancellation propagates; if the first caller
+                # was cancelled, make the call ourselves
+                if not pending.cancelled():
+                    raise
+            else:
+                print(f"    🔗 LLM call joined in-flight request ({model_short} model)")
+                return {**result, "estimated_cost": 0.0, "coalesced": True}
+        inflight = asyncio.get_running_loop().create_future()
+        # Mark a failure as retrieved even when nobody else was waiting
+        inflight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _inflight[request_key] = inflight
     
     try:
-        # Make the call
-        response = await client.ainvoke(
-            lc_messages,
-            max_tokens=max_tokens,
-            **kwargs
-        )
+        cache_key = request_key if LLM_CACHE_TTL > 0 else None
+        if cache_key is not None:
+            cached = await _cache_get(cache_key)
+            if cached is not None:
+                print(f"    ♻️  LLM cache hit ({model_short} model)")
+                result = {
+                    "text": cached["text"],
+                    "usage": cached["usage"],
+                    "model": cached["model"],
+                    "estimated_cost": 0.0,
+                    "cached": True
+                }
+                if inflight is not None:
+                    inflight.set_result(result)
+                return result
+        
+        print(f"    📡 LLM call using {model_short} model")
         
-        # Extract response and usage
-        text = response.content
-        usage = response.response_metadata.get("token_usage", {}) or {}
+        client = _model_client(client_model)
+        lc_messages = _to_langchain(messages)
+        
+        stopped_early = False
+        if stop_when is not None:
+            text, usage, stopped_early = await _stream_text(
+                client, lc_messages, stop_when, max_tokens, **kwargs
+            )
+        else:
+            # Make the call
+            response = await client.ainvoke(
+                lc_messages,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+            
+            # Extract response and usage
+            text = response.content
+            usage = response.response_metadata.get("token_usage", {}) or {}
         
         # Log the interaction
         _log_interaction(model, [(msg["role"], msg["content"]) for msg in messages], text, usage)
+        if _log_flush_due():
+            await asyncio.to_thread(flush_llm_logs)
         
-        return {
+        # A reply cut short by stop_when is not what a plain call would return
+        if cache_key is not None and not stopped_early:
+            await _cache_put(cache_key, text, usage, model_short)
+        
+        result = {
             "text": text,
             "usage": usage,
             "model": model_short,
             "estimated_cost": estimate_cost(model_short, usage)
         }
+        if inflight is not None:
+            inflight.set_result(result)
+        return result
         
     except Exception as e:
-        # Format messages for better readability
-        formatted_messages = []
-        for msg in messages:
-            formatted_msg = {
-                "role": msg["role"],
-                "content": msg["content"].replace("\\n", "\n")  # Unescape newlines
-            }
-            formatted_messages.append(formatted_msg)
-
         # Log error and re-raise
-        error_log = {
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "error": str(e),
-            "model": model,
-            "messages": formatted_messages
-        }
+        await _log_error(model, messages, e)
+        if inflight is not None:
+            inflight.set_exception(e)
+        raise
+    finally:
+        if inflight is not None:
+            _inflight.pop(request_key, None)
+            if not inflight.done():
+                inflight.cancel()
 
-        log_path = LOGS_DIR / f"llm-errors-{datetime.date.today().isoformat()}.jsonl"
-        with open(log_path, "a") as f:
-            # Use pretty printing with 2-space indentation
-            f.write(json.dumps(error_log, indent=2) + "\n\n")
-        
+
+def make_llm_caller(
+    system_prompt: str,
+    model: str = None,
+    max_tokens: int = 400,
+    task_type: str = None,
+    **defaults
+) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """
+    Bind llm_call to a fixed system prompt.
+    
+    The system turn is built and converted once, here, so each call only
+    adds the user turn. Calls still go through llm_call and are cached,
+    coalesced, logged and costed as usual. With model=None the model is
+    still picked per call from the user text.
+    
+    Usage:
+        worker = make_llm_caller("You are a precise worker.", model=HAIKU_MODEL, max_tokens=600)
+        result = await worker(step_prompt)
+    
+    Returns:
+        async call(user_text, **kwargs) returning the llm_call result;
+        kwargs override the defaults given here
+    """
+    system = {"role": "system", "content": system_prompt}
+    # Convert now so the first call finds the SystemMessage cached
+    _system_message(system_prompt)
+    bound = {"model": model, "max_tokens": max_tokens, "task_type": task_type, **defaults}
+    
+    async def call(user_text: str, **kwargs) -> Dict[str, Any]:
+        return await llm_call([system, {"role": "user", "content": user_text}], **{**bound, **kwargs})
+    
+    return call
+
+
+async def llm_call_stream(
+    messages: List[Dict[str, str]],
+    model: str = None,
+    max_tokens: int = 400,
+    task_type: str = None,
+    **kwargs
+) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+    """
+    Stream an LLM reply as it is generated.
+    
+    Yields text chunks as they arrive, then one final dict shaped like the
+    llm_call result ("text" holds the whole reply). The call is logged and
+    cached only once the stream has been read to the end; a caller that
+    stops early gets neither. A cache hit yields the cached text as a
+    single chunk.
+    
+    Usage:
+        async for piece in llm_call_stream(messages):
+            if isinstance(piece, dict):
+                result = piece
+            else:
+                print(piece, end="")
+    """
+    model, client_model, model_short = _select_model(messages, model, task_type)
+    
+    cache_key = None
+    if LLM_CACHE_TTL > 0 and not _is_sampled(client_model, kwargs):
+        cache_key = _cache_key(model, messages, max_tokens, kwargs)
+        cached = await _cache_get(cache_key)
+        if cached is not None:
+            print(f"    ♻️  LLM cache hit ({model_short} model)")
+            yield cached["text"]
+            yield {
+                "text": cached["text"],
+                "usage": cached["usage"],
+                "model": cached["model"],
+                "estimated_cost": 0.0,
+                "cached": True
+            }
+            return
+    
+    print(f"    📡 LLM stream using {model_short} model")
+    
+    client = _model_client(client_model)
+    lc_messages = _to_langchain(messages)
+    
+    parts = []
+    usage_metadata = None
+    try:
+        stream = client.astream(lc_messages, max_tokens=max_tokens, stream_usage=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.usage_metadata:
+                    usage_metadata = chunk.usage_metadata
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        finally:
+            await stream.aclose()
+    except Exception as e:
+        await _log_error(model, messages, e)
         raise
+    
+    text = "".join(parts)
+    usage = _stream_usage(usage_metadata, lc_messages, text)
+    _log_interaction(model, [(msg["role"], msg["content"]) for msg in messages], text, usage)
+    if _log_flush_due():
+        await asyncio.to_thread(flush_llm_logs)
+    if cache_key is not None:
+        await _cache_put(cache_key, text, usage, model_short)
+    
+    yield {
+        "text": text,
+        "usage": usage,
+        "model": model_short,
+        "estimated_cost": estimate_cost(model_short, usage)
+    }
 
 
-def get_model_stats() -> Dict[str, Any]:
-    """Get statistics about model usage and costs."""
+async def llm_call_batch(
+    messages_list: List[List[Dict[str, str]]],
+    max_concurrency: int = LLM_BATCH_CONCURRENCY,
+    return_exceptions: bool = False,
+    **kwargs
+) -> List[Any]:
+    """
+    Run independent llm_calls concurrently.
+    
+    At most max_concurrency calls are in flight, to stay inside the LiteLLM
+    rate limit. Each attempt is bounded by LLM_BATCH_TIMEOUT and retried up
+    to LLM_BATCH_RETRIES times with jittered exponential backoff.
+    
+    Args:
+        messages_list: One messages list per call
+        max_concurrency: Maximum calls in flight at once
+        return_exceptions: Put the final error of a failed call in its slot
+            instead of raising it
+        **kwargs: Passed to every llm_call (model, max_tokens, task_type, ...)
+    
+    Returns:
+        llm_call results in the same order as messages_list
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def call(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        async with semaphore:
+            last_error = None
+            for attempt in range(LLM_BATCH_RETRIES):
+                if attempt > 0:
+                    delay = min(LLM_BATCH_BASE_DELAY * (2 ** attempt) + random.uniform(0, 1),
+                                LLM_BATCH_MAX_DELAY)
+                    await asyncio.sleep(delay)
+                try:
+                    return await asyncio.wait_for(llm_call(messages, **kwargs), LLM_BATCH_TIMEOUT)
+                except Exception as e:
+                    last_error = e
+                    print(f"    ⚠️  LLM batch attempt {attempt + 1} failed: {e}")
+            raise last_error
+    
+    return await asyncio.gather(*(call(messages) for messages in messages_list),
+                                return_exceptions=return_exceptions)
+
+
+def _pending_batches_path() -> Path:
+    return LOGS_DIR / "pending_batches.json"
+
+
+def pending_batches() -> Dict[str, Dict[str, Any]]:
+    """Batches submitted but not yet collected, by batch id (survives restarts)."""
+    path = _pending_batches_path()
+    if not path.exists():
+        return {}
     try:
-        # Read today's log file
-        log_path = LOGS_DIR / f"llm-calls-{datetime.date.today().isoformat()}.jsonl"
-        if not log_path.exists():
-            return {"total_calls": 0, "total_cost": 0.0, "model_breakdown": {}}
-        
-        stats = {
-            "total_calls": 0,
-            "total_cost": 0.0,
-            "model_breakdown": {"haiku": 0, "sonnet": 0}
+        return parse_json(path.read_bytes())
+    except json.JSONDecodeError:
+        return {}
+
+
+def _save_pending_batches(batches: Dict[str, Dict[str, Any]]) -> None:
+    path = _pending_batches_path()
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(_json_bytes(batches))
+    tmp_path.replace(path)
+
+
+def _model_short(model: str) -> str:
+    # Providers may echo the model without LiteLLM's "anthropic/" prefix
+    return "sonnet" if "sonnet" in model else "haiku"
+
+
+async def llm_batch_submit(
+    jobs: List[Tuple[str, List[Dict[str, str]]]],
+    model: str = HAIKU_MODEL,
+    max_tokens: int = 400
+) -> str:
+    """
+    Submit chat completions to the provider's Batch API through LiteLLM.
+    
+    For bulk work that need not answer interactively: batch requests cost
+    half as much and do not count against the realtime rate limit.
+    
+    Args:
+        jobs: (custom_id, messages) pairs; custom_id identifies each result
+        model: Model for every job
+        max_tokens: Maximum tokens per response
+    
+    Returns:
+        Batch id, also recorded in pending_batches() until collected
+    """
+    lines = b"\n".join(
+        _json_bytes({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": messages, "max_tokens": max_tokens}
+        })
+        for custom_id, messages in jobs
+    )
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    
+    response = await HTTP_CLIENT.post(
+        f"{OPENAI_BASE_URL}/files",
+        headers=headers,
+        data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", lines, "application/jsonl")}
+    )
+    response.raise_for_status()
+    input_file_id = response.json()["id"]
+    
+    response = await HTTP_CLIENT.post(
+        f"{OPENAI_BASE_URL}/batches",
+        headers=headers,
+        json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": BATCH_COMPLETION_WINDOW
         }
+    )
+    response.raise_for_status()
+    batch_id = response.json()["id"]
+    
+    batches = pending_batches()
+    batches[batch_id] = {"model": model, "jobs": len(jobs), "submitted_at": utc_timestamp()}
+    _save_pending_batches(batches)
+    print(f"    📦 Submitted LLM batch {batch_id} ({len(jobs)} jobs)")
+    return batch_id
+
+
+async def llm_batch_collect(batch_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Wait for a submitted batch and return its results.
+    
+    Polls with exponential backoff until the batch reaches a final state.
+    
+    Returns:
+        custom_id -> dict with "text", "usage", "model" and "estimated_cost"
+        (at the batch discount), or "error" for jobs that failed
+    
+    Raises:
+        RuntimeError: The batch failed, expired or was cancelled
+    """
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    delay = BATCH_POLL_SECONDS
+    while True:
+        response = await HTTP_CLIENT.get(f"{OPENAI_BASE_URL}/batches/{batch_id}", headers=headers)
+        response.raise_for_status()
+        batch = response.json()
+        if batch["status"] in BATCH_FINAL_STATES:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BATCH_POLL_MAX_SECONDS)
+    
+    batches = pending_batches()
+    batches.pop(batch_id, None)
+    _save_pending_batches(batches)
+    
+    if batch["status"] != "completed":
+        raise RuntimeError(f"LLM batch {batch_id} ended as {batch['status']}")
+    
+    response = await HTTP_CLIENT.get(
+        f"{OPENAI_BASE_URL}/files/{batch['output_file_id']}/content", headers=headers
+    )
+    response.raise_for_status()
+    
+    results = {}
+    for line in response.content.splitlines():
+        if not line.strip():
+            continue
+        entry = parse_json(line)
+        body = (entry.get("response") or {}).get("body")
+        if entry.get("error") or not body:
+            results[entry["custom_id"]] = {"error": entry.get("error") or "empty response"}
+            continue
         
-        with open(log_path, "r") as f:
-            for line in f:
-                try:
-                    entry = json.loads(line.strip())
-                    stats["total_calls"] += 1
-                    stats["total_cost"] += entry.get("estimated_cost", 0.0)
-                    model = entry.get("model", "unknown")
-                    if model in stats["model_breakdown"]:
-                        stats["model_breakdown"][model] += 1
-                except json.JSONDecodeError:
-                    continue
-        
+        usage = body.get("usage", {})
+        model_short = _model_short(body.get("model", ""))
+        results[entry["custom_id"]] = {
+            "text": body["choices"][0]["message"]["content"],
+            "usage": usage,
+            "model": model_short,
+            "estimated_cost": estimate_cost(model_short, usage) * BATCH_DISCOUNT
+        }
+    return results
+
+
+# Today's call stats: seeded from the day's log on first use, then kept
+# current by _log_interaction so get_model_stats never rereads the file
+_stats_lock = threading.Lock()
+_stats_date: Optional[datetime.date] = None
+_stats: Dict[str, Any] = {}
+
+
+def _scan_model_stats(log_path: Path) -> Dict[str, Any]:
+    """Aggregate a calls log file."""
+    stats = {
+        "total_calls": 0,
+        "total_cost": 0.0,
+        "model_breakdown": {"haiku": 0, "sonnet": 0}
+    }
+    if not log_path.exists():
         return stats
-        
+    
+    with open(log_path, "rb") as f:
+        for line in f:
+            try:
+                entry = parse_json(line)
+            except json.JSONDecodeError:
+                continue
+            _add_call(stats, entry.get("model", "unknown"), entry.get("estimated_cost", 0.0))
+    return stats
+
+
+def _add_call(stats: Dict[str, Any], model: str, cost: float) -> None:
+    stats["total_calls"] += 1
+    stats["total_cost"] += cost
+    if model in stats["model_breakdown"]:
+        stats["model_breakdown"][model] += 1
+
+
+def _today_stats() -> Dict[str, Any]:
+    """Today's running stats; call with _stats_lock held."""
+    global _stats_date, _stats
+    today = _today()
+    if _stats_date != today:
+        # One-time scan per day; flush first so buffered lines are counted
+        flush_llm_logs()
+        _stats = _scan_model_stats(_daily_log_path("calls"))
+        _stats_date = today
+    return _stats
+
+
+def _count_call(model: str, cost: float) -> None:
+    """
+    Add one call to today's stats.
+    
+    Must run before the call's log line is queued, so a first-of-day
+    seeding scan does not see the line and count it twice.
+    """
+    with _stats_lock:
+        _add_call(_today_stats(), model, cost)
+
+
+def get_model_stats() -> Dict[str, Any]:
+    """Get statistics about today's model usage and costs."""
+    try:
+        with _stats_lock:
+            stats = _today_stats()
+            return {**stats, "model_breakdown": dict(stats["model_breakdown"])}
     except Exception:
         return {"total_calls": 0, "total_cost": 0.0, "model_breakdown": {}}
 
@@ -6,20 +6,44 @@ Provides both simple and realistic fixtures for testing.
 
 import time
 import asyncio
+import bisect
+import functools
 import hashlib
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+# EVM address: 0x + 20 bytes hex
+_WALLET_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+
+# Simulated network delay in seconds for every mock fetcher (0 = none)
+MOCK_LATENCY = float(os.getenv("MOCK_LATENCY", "0"))
+
+
+@contextmanager
+def no_mock_latency():
+    """Run the enclosed block with simulated mock latency turned off."""
+    global MOCK_LATENCY
+    saved, MOCK_LATENCY = MOCK_LATENCY, 0.0
+    try:
+        yield
+    finally:
+        MOCK_LATENCY = saved
 
 # Import existing mock fixtures
 from tests.test_planner_worker import MOCK_EVENTS, MOCK_WALLET_ACTIVITY, MOCK_LP_ACTIVITY, MOCK_WEB_METRICS
 
+# Fixture timestamps are relative to import time
+_FIXTURE_NOW = int(time.time())
+
 # Simple LP fixtures (for testing)
 SIMPLE_LP_FIXTURES = [
     {
         "txHash": "0xsimple_lp_1",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=2)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 2 * 3600,
         "kind": "lp_add",
         "wallet": "0xwallet_1",
         "pool": "WETH/USDC",
@@ -37,7 +61,7 @@ SIMPLE_LP_FIXTURES = [
     {
         "txHash": "0xsimple_lp_2", 
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=4)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 4 * 3600,
         "kind": "lp_remove",
         "wallet": "0xwallet_2",
         "pool": "WETH/USDC",
@@ -55,7 +79,7 @@ SIMPLE_LP_FIXTURES = [
     {
         "txHash": "0xsimple_lp_3",
         "logIndex": 0, 
-        "timestamp": int((datetime.now() - timedelta(hours=6)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 6 * 3600,
         "kind": "lp_add",
         "wallet": "0xwallet_3",
         "pool": "DEGEN/WETH",
@@ -77,7 +101,7 @@ REALISTIC_LP_FIXTURES = [
     {
         "txHash": "0xrealistic_lp_1",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=1)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 1 * 3600,
         "kind": "lp_add",
         "wallet": "0xrealistic_wallet_1",
         "pool": "WETH/USDC",
@@ -97,7 +121,7 @@ REALISTIC_LP_FIXTURES = [
     {
         "txHash": "0xrealistic_lp_2",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=2)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 2 * 3600,
         "kind": "lp_remove", 
         "wallet": "0xrealistic_wallet_2",
         "pool": "WETH/USDC",
@@ -117,7 +141,7 @@ REALISTIC_LP_FIXTURES = [
     {
         "txHash": "0xrealistic_lp_3",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=3)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 3 * 3600,
         "kind": "lp_add",
         "wallet": "0xrealistic_wallet_3",
         "pool": "DEGEN/WETH", 
@@ -137,7 +161,7 @@ REALISTIC_LP_FIXTURES = [
     {
         "txHash": "0xrealistic_lp_4",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=4)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 4 * 3600,
         "kind": "lp_add",
         "wallet": "0xrealistic_wallet_4",
         "pool": "WETH/USDC",
@@ -157,7 +181,7 @@ REALISTIC_LP_FIXTURES = [
     {
         "txHash": "0xrealistic_lp_5",
         "logIndex": 0,
-        "timestamp": int((datetime.now() - timedelta(hours=5)).timestamp()),
+        "timestamp": _FIXTURE_NOW - 5 * 3600,
         "kind": "lp_remove",
         "wallet": "0xrealistic_wallet_5",
         "pool": "DEGEN/WETH",
@@ -177,6 +201,28 @@ REALISTIC_LP_FIXTURES = [
 ]
 
 
+def _index_by_time(events: List[Dict[str, Any]]) -> tuple:
+    """
+    Sort fixtures newest-first and pair them with negated timestamps.
+    
+    Events at or after a cutoff then form a prefix found with one bisect.
+    """
+    ordered = sorted(events, key=lambda e: -e["timestamp"])
+    return ordered, [-e["timestamp"] for e in ordered]
+
+
+def _since(index: tuple, since_ts: int) -> List[Dict[str, Any]]:
+    """Return indexed events with timestamp >= since_ts, newest first."""
+    events, neg_ts = index
+    return events[:bisect.bisect_right(neg_ts, -since_ts)]
+
+
+# Fixtures are static, so index them once at import
+_WALLET_INDEX = _index_by_time(MOCK_WALLET_ACTIVITY)
+_SIMPLE_LP_INDEX = _index_by_time(SIMPLE_LP_FIXTURES)
+_REALISTIC_LP_INDEX = _index_by_time(REALISTIC_LP_FIXTURES)
+
+
 def fetch_wallet_activity(wallet: str, since_ts: int) -> List[Dict[str, Any]]:
     """
     Mock wallet activity fetch.
@@ -189,24 +235,61 @@ def fetch_wallet_activity(wallet: str, since_ts: int) -> List[Dict[str, Any]]:
         List of normalized events for the wallet
     """
     # Simulate network delay
-    time.sleep(0.1)
-    
-    # Filter events for the specific wallet and time range
-    wallet_events = [
-        event for event in MOCK_WALLET_ACTIVITY
-        if event["timestamp"] >= since_ts
-    ]
+    if MOCK_LATENCY:
+        time.sleep(MOCK_LATENCY)
     
-    # Add provenance
-    for event in wallet_events:
-        event["provenance"] = {
-            "source": "mock",
-            "snapshot": int(datetime.now().timestamp()),
-            "wallet": wallet,
-            "since_ts": since_ts
-        }
+    return _wallet_events(wallet, since_ts)
+
+
+def _wallet_events(wallet: str, since_ts: int) -> List[Dict[str, Any]]:
+    """Filter wallet fixtures by time and stamp provenance."""
+    # One provenance dict per call, attached to fresh copies so the
+    # shared fixtures are never mutated
+    provenance = {
+        "source": "mock",
+        "snapshot": int(time.time()),
+        "wallet": wallet,
+        "since_ts": since_ts
+    }
+    return [{**event, "provenance": provenance} for event in _since(_WALLET_INDEX, since_ts)]
+
+
+async def fetch_wallet_activity_async(wallet: str, since_ts: int) -> List[Dict[str, Any]]:
+    """Async variant of fetch_wallet_activity that yields instead of blocking."""
+    await asyncio.sleep(MOCK_LATENCY)
+    return _wallet_events(wallet, since_ts)
+
+
+@dataclass(slots=True)
+class RawEvt:
+    """Wallet activity event parsed once for attribute access."""
+    tx_hash: Optional[str]
+    kind: str
+    pool: Optional[str]
+    amounts: Dict[str, Any]
+    chain: str
+    timestamp: Optional[int]
+    provenance: Dict[str, Any] = field(default_factory=dict)
+
+
+def parse_wallet_events(events: List[Dict[str, Any]]) -> List[RawEvt]:
+    """
+    Parse fetched wallet activity dicts into RawEvt records.
     
-    return wallet_events
+    Missing keys get the same defaults the normalizers use.
+    """
+    return [
+        RawEvt(
+            tx_hash=event.get("txHash"),
+            kind=event.get("kind", "unknown"),
+            pool=event.get("pool"),
+            amounts=event.get("amounts", {}),
+            chain=event.get("chain", "base"),
+            timestamp=event.get("timestamp"),
+            provenance=event.get("provenance", {})
+        )
+        for event in events
+    ]
 
 
 def fetch_lp_activity(since_ts: int, use_realistic: bool = False) -> List[Dict[str, Any]]:
@@ -221,27 +304,29 @@ def fetch_lp_activity(since_ts: int, use_realistic: bool = False) -> List[Dict[s
         List of normalized LP events
     """
     # Simulate network delay
-    time.sleep(0.2)
-    
-    # Choose fixture set
-    fixtures = REALISTIC_LP_FIXTURES if use_realistic else SIMPLE_LP_FIXTURES
+    if MOCK_LATENCY:
+        time.sleep(MOCK_LATENCY)
     
-    # Filter events for the time range
-    lp_events = [
-        event for event in fixtures
-        if event["timestamp"] >= since_ts
-    ]
-    
-    # Add provenance
-    for event in lp_events:
-        event["provenance"] = {
-            "source": "mock_lp",
-            "snapshot": int(datetime.now().timestamp()),
-            "since_ts": since_ts,
-            "fixture_type": "realistic" if use_realistic else "simple"
-        }
-    
-    return lp_events
+    return _lp_events(since_ts, use_realistic)
+
+
+async def fetch_lp_activity_async(since_ts: int, use_realistic: bool = False) -> List[Dict[str, Any]]:
+    """Async variant of fetch_lp_activity that yields instead of blocking."""
+    await asyncio.sleep(MOCK_LATENCY)
+    return _lp_events(since_ts, use_realistic)
+
+
+def _lp_events(since_ts: int, use_realistic: bool) -> List[Dict[str, Any]]:
+    """Copy LP fixtures in the time range with provenance attached."""
+    # Choose fixture set and take the events in the time range
+    index = _REALISTIC_LP_INDEX if use_realistic else _SIMPLE_LP_INDEX
+    provenance = {
+        "source": "mock_lp",
+        "snapshot": int(time.time()),
+        "since_ts": since_ts,
+        "fixture_type": "realistic" if use_realistic else "simple"
+    }
+    return [{**event, "provenance": provenance} for event in _since(index, since_ts)]
 
 
 def web_metrics_lookup(query: str) -> Dict[str, Any]:
@@ -255,14 +340,17 @@ def web_metrics_lookup(query: str) -> Dict[str, Any]:
         Dictionary with source, snapshot_time, key_values, raw_excerpt
     """
     # Simulate network delay
-    time.sleep(0.15)
-    
-    # Return mock metrics with current timestamp
-    metrics = MOCK_WEB_METRICS.copy()
-    metrics["snapshot_time"] = int(datetime.now().timestamp())
-    metrics["query"] = query
+    if MOCK_LATENCY:
+        time.sleep(MOCK_LATENCY)
     
-    return metrics
+    # Fresh copy with the current timestamp; key_values is copied too so
+    # callers never share a dict with the fixture
+    return dict(
+        MOCK_WEB_METRICS,
+        key_values=dict(MOCK_WEB_METRICS["key_values"]),
+        snapshot_time=int(time.time()),
+        query=query
+    )
 
 
 # Helper function to get deterministic event IDs
@@ -320,6 +408,27 @@ def fetch_wallet_activity_bitquery(address: str, chain: str = "base", since_ts:
         print("    🟡 Using MOCK wallet activity API (explicit request)")
         return _fetch_wallet_activity_bitquery_mock(address, chain, since_ts)
 
+    # Reject malformed addresses before any provider round-trip
+    if not _WALLET_RE.fullmatch(address):
+        print(f"    ❌ Invalid wallet address: {address!r}, skipping providers")
+        return {
+            "provider": {
+                "name": "none",
+                "chain": chain,
+                "endpoint": None,
+                "cursor": None
+            },
+            "events": [],
+            "metadata": {
+                "address": address,
+                "chain": chain,
+                "since_ts": since_ts,
+                "fetched_at": int(time.time()),
+                "event_count": 0,
+                "error": "invalid_address"
+            }
+        }
+
     # Try Covalent first (if selected and available)
     if source == "covalent":
         try:
@@ -393,38 +502,73 @@ def fetch_wallet_activity_bitquery(address: str, chain: str = "base", since_ts:
     return result
 
 
+@functools.lru_cache(maxsize=1024)
+def _bitquery_mock_fields(address: str) -> Tuple[int, str, Tuple[Tuple[str, str, Optional[str]], ...]]:
+    """
+    Hash-derived parts of a wallet's mock Bitquery events, cached per address.
+    
+    Returns:
+        (wallet_seed, event_type, ((tx_hash, log_data, pool), ...)) with one
+        entry per event; pool is None for types that have none
+    """
+    # Generate deterministic mock events based on wallet address; the first
+    # 4 digest bytes are the first 8 hex chars, without building the hex string
+    wallet_seed = int.from_bytes(hashlib.sha256(address.encode()).digest()[:4], "big") % 1000
+    event_type = ["lp_add", "lp_remove", "swap", "transfer"][wallet_seed % 4]
+    has_pool = event_type in ("lp_add", "lp_remove", "swap")
+
+    # Generate 1-3 events per wallet for demo purposes
+    num_events = (wallet_seed % 3) + 1
+
+    # Every per-event input shares a prefix; hash it once and copy the state
+    tx_prefix = hashlib.sha256(f"{address}_".encode())
+    log_prefix = hashlib.sha256(f"{address}_{event_type}_".encode())
+    pool_prefix = hashlib.sha256(f"pool_{wallet_seed}_".encode())
+
+    fields = []
+    for i in range(num_events):
+        suffix = str(i).encode()
+        tx = tx_prefix.copy()
+        tx.update(suffix)
+        log = log_prefix.copy()
+        log.update(suffix)
+        pool = None
+        if has_pool:
+            pool_hash = pool_prefix.copy()
+            pool_hash.update(suffix)
+            pool = f"0x{pool_hash.hexdigest()[:40]}"
+        # Full 32-byte tx hash (66 chars total)
+        fields.append((f"0x{tx.hexdigest()}", f"0x{log.hexdigest()}", pool))
+    return wallet_seed, event_type, tuple(fields)
+
+
 def _fetch_wallet_activity_bitquery_mock(address: str, chain: str = "base", since_ts: int = 0) -> Dict[str, Any]:
     """
     Mock implementation of Bitquery wallet activity fetch.
     Used when BITQUERY_ACCESS_TOKEN is not set or live API fails.
     """
     # Simulate network delay and API call
-    time.sleep(0.15)
+    if MOCK_LATENCY:
+        time.sleep(MOCK_LATENCY)
 
-    # Generate deterministic mock events based on wallet address
-    wallet_hash = hashlib.sha256(address.encode()).hexdigest()
-    wallet_seed = int(wallet_hash[:8], 16) % 1000
+    wallet_seed, event_type, fields = _bitquery_mock_fields(address)
 
     mock_events = []
-    current_ts = int(datetime.now().timestamp())
+    current_ts = int(time.time())
     base_ts = max(since_ts, current_ts - 86400)  # Last 24h if no since_ts
 
-    # Generate 1-3 events per wallet for demo purposes
-    num_events = (wallet_seed % 3) + 1
-
-    for i in range(num_events):
+    for i, (tx_hash, log_data, pool) in enumerate(fields):
         event_ts = base_ts + (i * 3600) + (wallet_seed % 3600)  # Spread over time
-        event_type = ["lp_add", "lp_remove", "swap", "transfer"][wallet_seed % 4]
 
         event = {
             "timestamp": event_ts,  # Using timestamp instead of ts for consistency with analyze node
             "chain": chain,
             "type": event_type,
             "wallet": address,
-            "tx": f"0x{hashlib.sha256(f'{address}_{i}'.encode()).hexdigest()}",  # Full 32-byte hash (66 chars total)
+            "tx": tx_hash,
             "raw": {
                 "transaction": {
-                    "hash": f"0x{hashlib.sha256(f'{address}_{i}'.encode()).hexdigest()}",  # Full hash in raw data too
+                    "hash": tx_hash,  # Full hash in raw data too
                     "block": {
                         "timestamp": {"unixtime": event_ts},
                         "number": 1234567 + i
@@ -433,20 +577,19 @@ def _fetch_wallet_activity_bitquery_mock(address: str, chain: str = "base", sinc
                 "log": {
                     "index": i,
                     "topics": ["0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"],
-                    "data": f"0x{hashlib.sha256(f'{address}_{event_type}_{i}'.encode()).hexdigest()}"
+                    "data": log_data
                 }
             }
         }
 
         # Add pool for LP events
         if event_type in ["lp_add", "lp_remove"]:
-            pool_address = f"0x{hashlib.sha256(f'pool_{wallet_seed}_{i}'.encode()).hexdigest()[:40]}"
-            event["pool"] = pool_address
-            event["raw"]["pool"] = pool_address
+            event["pool"] = pool
+            event["raw"]["pool"] = pool
             # Add USD value for LP events (nullable)
             event["usd"] = (wallet_seed + i * 100) * 1.5 if wallet_seed % 2 == 0 else None
         elif event_type == "swap":
-            event["pool"] = f"0x{hashlib.sha256(f'pool_{wallet_seed}_{i}'.encode()).hexdigest()[:40]}"
+            event["pool"] = pool
             event["usd"] = (wallet_seed + i * 50) * 2.0
 
         # Add provenance (matching test expectations)
@@ -493,7 +636,7 @@ def demo_wallet_recon_flow(wallet_address: str = "0x1234567890abcdef1234567890ab
     print(f"   ✅ Fetched {response['metadata']['event_count']} events")
     print(f"   📊 Events: {len(response['events'])}")
     for i, event in enumerate(response['events'][:3]):  # Show first 3
-        print(f"      {i+1}. {event['type']} at {event['ts']} (pool: {event.get('pool', 'N/A')})")
+        print(f"      {i+1}. {event['type']} at {event['timestamp']} (pool: {event.get('pool', 'N/A')})")
     if len(response['events']) > 3:
         print(f"      ... and {len(response['events']) - 3} more")
 
@@ -4,11 +4,67 @@ Analyze node that processes events and computes signals.
 
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from collections import Counter
 
-from data_model import normalize_event, NormalizedEvent
+import numpy as np
+
+from data_model import normalize_events_bulk, NormalizedEvent
 from .rich_output import formatter
+from .signals_numba import wallet_flows
+
+
+_NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _usd_sign(event: Dict[str, Any]) -> float:
+    """+1 for inflows, -1 for LP removals, 0 otherwise."""
+    # Handle both legacy format (kind: lp_add/lp_remove) and new format (type: swap/transfer)
+    event_type = event.get("kind") or event.get("type")
+    if event_type in ["lp_add", "swap"] and event.get("direction") != "out":
+        return 1.0
+    if event_type in ["lp_remove"] and event.get("direction") == "out":
+        return -1.0
+    return 0.0
+
+
+def _event_pool(event: Dict[str, Any]) -> Optional[str]:
+    """Pool address an event touched, or None."""
+    # Try multiple ways to find pool addresses
+    pool = (event.get("pool") or
+            event.get("token_address") or
+            event.get("raw", {}).get("covalent_tx", {}).get("to_address"))
+    if pool and pool != "unknown" and pool != _NULL_ADDRESS:
+        return pool
+    return None
+
+
+def compute_wallet_signals(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compute wallet recon signals over a window of events.
+    
+    Events are flattened into arrays once (pools interned to int ids) and
+    aggregated in a single pass by wallet_flows.
+    """
+    n = len(events)
+    usd = np.fromiter((e.get("usd") or 0.0 for e in events), dtype=np.float64, count=n)
+    signs = np.fromiter((_usd_sign(e) for e in events), dtype=np.float64, count=n)
+    
+    pool_index: Dict[str, int] = {}
+    pool_ids = np.fromiter(
+        (pool_index.setdefault(pool, len(pool_index)) if pool else -1
+         for pool in map(_event_pool, events)),
+        dtype=np.int32, count=n
+    )
+    
+    net_usd, counts = wallet_flows(usd, signs, pool_ids, len(pool_index))
+    
+    return {
+        # net_lp_usd_24h: Sum of LP adds minus LP removes in USD
+        "net_lp_usd_24h": net_usd,
+        # new_pools_touched_24h: Distinct pool addresses, most touched first
+        "new_pools_touched_24h": sorted(pool_index, key=lambda pool: (-counts[pool_index[pool]], pool))
+    }
 
 
 async def analyze_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,15 +90,15 @@ async def analyze_node(state: Dict[str, Any]) -> Dict[str, Any]:
     cutoff_time = int((datetime.now() - timedelta(hours=24)).timestamp())
     recent_events = [e for e in events if e.get("timestamp", 0) >= cutoff_time]
     
-    # Normalize events into Layer 2
-    normalized_events = []
+    # Normalize events into Layer 2 (one slot per recent event)
+    normalized_events = [None] * len(recent_events)
     source_ids = set()
     
     # Get source_ids from worker
     worker_source_ids = state.get("source_ids", [])
     source_ids.update(worker_source_ids)
     
-    for event in recent_events:
+    for i, event in enumerate(recent_events):
         # Use source_id from worker or generate one
         source_id = event.get("provenance", {}).get("source_id", worker_source_ids[0] if worker_source_ids else f"event_{int(time.time())}")
         source_ids.add(source_id)
@@ -59,7 +115,7 @@ async def analyze_node(state: Dict[str, Any]) -> Dict[str, Any]:
             value_dict["details"] = event["details"]
         
         # Create normalized event with proper field mapping
-        normalized_event = NormalizedEvent(
+        normalized_events[i] = NormalizedEvent(
             event_id=event.get("tx", f"event_{int(time.time())}"),  # Covalent uses "tx" not "txHash"
             wallet=event.get("wallet"),
             event_type=event.get("type", event.get("kind", "unknown")),  # Try "type" first, fallback to "kind"
@@ -69,10 +125,9 @@ async def analyze_node(state: Dict[str, Any]) -> Dict[str, Any]:
             source_id=source_id,
             chain=event.get("chain", "base")
         )
-        
-        # Save to Layer 2
-        await normalize_event(normalized_event)
-        normalized_events.append(normalized_event)
+    
+    # Save to Layer 2 in one transaction
+    await normalize_events_bulk(normalized_events)
     
     # Count events by type/kind (handle both field names for compatibility)
     event_counts = Counter(e.get("type", e.get("kind", "unknown")) for e in recent_events)
@@ -132,32 +187,7 @@ async def analyze_node(state: Dict[str, Any]) -> Dict[str, Any]:
     selected_action = state.get("selected_action")
 
     if selected_action == "wallet_recon":
-        # net_lp_usd_24h: Sum of LP adds minus LP removes in USD
-        # Handle both legacy format (kind: lp_add/lp_remove) and new format (type: swap/transfer)
-        net_lp_usd = 0.0
-        for event in recent_events:
-            usd_value = event.get("usd")
-            if usd_value is not None:
-                # Check legacy format first
-                event_type = event.get("kind") or event.get("type")
-                if event_type in ["lp_add", "swap"] and event.get("direction") != "out":
-                    net_lp_usd += usd_value
-                elif event_type in ["lp_remove"] and event.get("direction") == "out":
-                    net_lp_usd -= usd_value
-        wallet_signals["net_lp_usd_24h"] = net_lp_usd
-
-        # new_pools_touched_24h: Distinct pool addresses from recent events
-        # Handle both legacy pool field and new contract addresses
-        all_pools = set()
-        for event in recent_events:
-            # Try multiple ways to find pool addresses
-            pool = (event.get("pool") or
-                   event.get("token_address") or
-                   event.get("raw", {}).get("covalent_tx", {}).get("to_address"))
-
-            if pool and pool != "unknown" and pool != "0x0000000000000000000000000000000000000000":
-                all_pools.add(pool)
-        wallet_signals["new_pools_touched_24h"] = list(all_pools)
+        wallet_signals = compute_wallet_signals(recent_events)
 
     signals = {
         "volume_signal": volume_signal,
@@ -5,7 +5,7 @@ LLM integration for brief generation.
 import json
 from typing import Dict, Any, List, Optional, Tuple
 from data_model import NormalizedEvent
-from llm_client import llm_call
+from llm_client import llm_call, parse_json
 from .config import LLM_BRIEF_MODEL
 
 SYSTEM_PROMPT = """You are a crypto LP analyst. Produce a concise brief for a human trader. Respect schema. Validate your claims against provided rollups.
@@ -80,11 +80,12 @@ async def generate_llm_brief(events: List[NormalizedEvent], rollups: Dict[str, A
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ],
-        task_type="brief"  # Explicitly mark this as a brief generation task
+        task_type="brief",  # Explicitly mark this as a brief generation task
+        temperature=0  # Same events give the same brief, so it can be cached
     )
     
     try:
-        brief_data = json.loads(response["text"])
+        brief_data = parse_json(response["text"])
         usage_data = response["usage"]
         model_used = response["model"]
         
@@ -7,6 +7,21 @@ import numpy as np
 from typing import List, Dict, Any, Tuple
 from data_model import NormalizedEvent
 
+# Number of events, spread evenly through the list, sampled to estimate
+# the average per-event size
+TOKEN_SAMPLE_SIZE = 5
+
+def _event_payload(e: NormalizedEvent) -> Dict[str, Any]:
+    """Fields of an event that are sent to the LLM."""
+    return {
+        "event_id": e.event_id,
+        "wallet": e.wallet,
+        "event_type": e.event_type,
+        "pool": e.pool,
+        "value": e.value,
+        "timestamp": e.timestamp
+    }
+
 def estimate_tokens(events: List[NormalizedEvent], rollups: Dict[str, Any]) -> int:
     """
     Estimate token count for LLM input.
@@ -15,14 +30,7 @@ def estimate_tokens(events: List[NormalizedEvent], rollups: Dict[str, Any]) -> i
     - 1 token ≈ 4 chars for English text
     - 1 token ≈ 3 chars for JSON (denser due to syntax)
     """
-    events_json = json.dumps([{
-        "event_id": e.event_id,
-        "wallet": e.wallet,
-        "event_type": e.event_type,
-        "pool": e.pool,
-        "value": e.value,
-        "timestamp": e.timestamp
-    } for e in events])
+    events_json = json.dumps([_event_payload(e) for e in events])
     
     rollups_json = json.dumps(rollups)
     
@@ -32,6 +40,25 @@ def estimate_tokens(events: List[NormalizedEvent], rollups: Dict[str, Any]) -> i
     total_chars = len(events_json) + len(rollups_json)
     return total_chars // 3 + 100  # +100 for prompt
 
+def estimate_event_capacity(events: List[NormalizedEvent], rollups: Dict[str, Any], token_cap: int) -> int:
+    """
+    Cheaply estimate how many events fit under the token cap.
+    
+    Serializes only TOKEN_SAMPLE_SIZE events taken at an even stride and
+    extrapolates their average size, so callers can drop a tail that cannot
+    fit before running estimate_tokens on the full list. Pass the events in
+    the order they will be kept, so the sample spans the candidates.
+    """
+    stride = max(len(events) // TOKEN_SAMPLE_SIZE, 1)
+    sample = events[::stride][:TOKEN_SAMPLE_SIZE]
+    if not sample:
+        return 0
+    
+    # +2 per event for the ", " separator inside the JSON array
+    avg_chars = sum(len(json.dumps(_event_payload(e))) + 2 for e in sample) / len(sample)
+    budget_chars = (token_cap - estimate_tokens([], rollups)) * 3
+    return max(int(budget_chars // avg_chars), 0)
+
 def get_usd_value(event: NormalizedEvent) -> float:
     """Extract USD value from event."""
     if "usd_value" in event.value:
@@ -118,15 +145,17 @@ def reduce_events(events: List[NormalizedEvent], signals: Dict[str, float], toke
         if event.event_id in keep_events:
             result_events.append(event)
     
-    # Then add top events by USD value until we hit cap
+    # Then add top events by USD value, but only as many as the size
+    # estimate says can fit; the precise estimate below trims the rest
+    capacity = estimate_event_capacity(sorted_events, signals, token_cap)
     for event in sorted_events:
+        if len(result_events) >= capacity:
+            break
         if event.event_id not in keep_events:
             result_events.append(event)
-            if estimate_tokens(result_events, signals) > token_cap:
-                result_events.pop()  # Remove last event that put us over cap
-                break
     
-    # If we still have too many events, reduce further
+    # If we still have too many events, reduce further; the added events
+    # sit after the important ones, so those go last
     while estimate_tokens(result_events, signals) > token_cap and len(result_events) > 10:
         result_events.pop()  # Keep removing events until we're under cap
     
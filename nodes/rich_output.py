@@ -5,6 +5,7 @@ from datetime import datetime
 from pathlib import Path
 import textwrap
 import json
+import re
 from rich.console import Console
 from rich.table import Table
 from rich.text import Text
@@ -17,6 +18,12 @@ from .config import DEBUG
 # Set up rich console with forced color
 console = Console(force_terminal=True, color_system="truecolor")
 
+# Keyword classifiers for progress/status lines (substring match, case-insensitive)
+_SUCCESS_RE = re.compile(r"completed|ok|success", re.I)
+_NOTIFY_SUCCESS_RE = re.compile(r"success", re.I)
+_ERROR_RE = re.compile(r"error|failed", re.I)
+_DISABLED_RE = re.compile(r"disabled", re.I)
+
 # Configure logging with rich but suppress INFO
 logging.basicConfig(
     level=logging.WARNING,  # Only show WARNING and above
@@ -109,7 +116,7 @@ class RichOutputFormatter:
         text.append(f"[{node:7}]", style="bold blue")
         text.append(" ")
         
-        if any(x in message.lower() for x in ["completed", "ok", "success"]):
+        if _SUCCESS_RE.search(message):
             text.append(f"{message}{duration_str}", style="green")
         else:
             text.append(message)
@@ -231,23 +238,25 @@ class RichOutputFormatter:
         # System Status
         console.print("[bold blue]SYSTEM STATUS[/bold blue]")
         for notification in self.execution_data['notifications']:
-            if "success" in notification.lower():
+            if _NOTIFY_SUCCESS_RE.search(notification):
                 console.print(notification, style="green")
-            elif "error" in notification.lower() or "failed" in notification.lower():
+            elif _ERROR_RE.search(notification):
                 console.print(notification, style="red")
-            elif "disabled" in notification.lower():
+            elif _DISABLED_RE.search(notification):
                 console.print(notification, style="yellow")
             else:
                 console.print(notification, style="dim")
                 
         # LLM Interactions
+        from llm_client import flush_llm_logs, parse_json
+        flush_llm_logs()
         log_path = Path("logs") / f"llm-calls-{datetime.now().date().isoformat()}.jsonl"
         if log_path.exists():
             console.print("\n[bold blue]LLM INTERACTIONS[/bold blue]")
-            with open(log_path) as f:
+            with open(log_path, "rb") as f:
                 for line in f:
                     try:
-                        entry = json.loads(line.strip())
+                        entry = parse_json(line)
                         # Skip if not from this run
                         if not entry['timestamp'].startswith(self.execution_data['started_at'].isoformat()[:19]):
                             continue
@@ -0,0 +1,53 @@
+"""
+Aggregation kernels for wallet signals.
+
+Uses a numba-compiled loop when numba is installed and falls back to
+equivalent NumPy expressions otherwise.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _wallet_flows_jit(usd, signs, pool_ids, n_pools):
+        # Serial on purpose: a parallel loop would race on counts[pid]
+        net = 0.0
+        counts = np.zeros(n_pools, dtype=np.int64)
+        for i in range(usd.shape[0]):
+            net += usd[i] * signs[i]
+            pid = pool_ids[i]
+            if pid >= 0:
+                counts[pid] += 1
+        return net, counts
+else:
+    _wallet_flows_jit = None
+
+
+def wallet_flows(usd: np.ndarray, signs: np.ndarray, pool_ids: np.ndarray,
+                 n_pools: int) -> Tuple[float, np.ndarray]:
+    """
+    Net signed USD flow and per-pool event counts in one pass.
+
+    Args:
+        usd: float64 USD value per event (0 when unknown)
+        signs: float64 +1/-1/0 direction per event
+        pool_ids: int32 index into the caller's pool list, -1 for no pool
+        n_pools: Number of distinct pool ids
+
+    Returns:
+        (net_usd, counts) where counts[i] is the number of events on pool i
+    """
+    if _wallet_flows_jit is not None:
+        net, counts = _wallet_flows_jit(usd, signs, pool_ids, n_pools)
+        return float(net), counts
+
+    counts = np.bincount(pool_ids[pool_ids >= 0], minlength=n_pools)
+    return float(usd @ signs), counts
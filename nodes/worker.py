@@ -8,7 +8,7 @@ from typing import Dict, Any
 
 from json_storage import get_cursor, set_cursor
 from data_model import save_raw_response, NormalizedEvent
-from mock_tools import fetch_wallet_activity, fetch_lp_activity, web_metrics_lookup
+from mock_tools import fetch_wallet_activity, fetch_lp_activity_async, web_metrics_lookup
 from real_apis.provider_router import get_wallet_provider
 from .rich_output import formatter
 
@@ -96,7 +96,7 @@ async def worker_node(state: Dict[str, Any]) -> Dict[str, Any]:
             
             # Fetch LP activity (use realistic fixtures for demo, simple for tests)
             use_realistic = state.get("use_realistic_fixtures", False)
-            lp_events = fetch_lp_activity(since_ts, use_realistic=use_realistic)
+            lp_events = await fetch_lp_activity_async(since_ts, use_realistic=use_realistic)
             
             # Save raw data to Layer 1
             raw_id = f"lp_activity_{since_ts}"
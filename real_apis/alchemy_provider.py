@@ -203,6 +203,7 @@ def _classify_transaction(tx: Dict[str, Any]) -> str:
 def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, Any]:
     """Extract value and token information from transaction."""
     info = {}
+    wallet = wallet_address.lower()
 
     # Check for native token transfers
     if tx.get("value") and tx.get("value") != "0":
@@ -211,7 +212,7 @@ def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, An
         info["token_address"] = "0x0000000000000000000000000000000000000000"
 
         # Determine direction
-        if tx.get("from", "").lower() == wallet_address.lower():
+        if tx.get("from", "").lower() == wallet:
             info["direction"] = "out"
             info["counterparty"] = tx.get("to")
         else:
@@ -224,7 +225,7 @@ def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, An
         info["token_address"] = tx.get("asset")
         
         # Determine direction for token transfers
-        if tx.get("from", "").lower() == wallet_address.lower():
+        if tx.get("from", "").lower() == wallet:
             info["direction"] = "out"
             info["counterparty"] = tx.get("to")
         else:
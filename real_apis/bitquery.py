@@ -334,6 +334,8 @@ async def fetch_wallet_activity_bitquery_live(
     # Convert to standardized format
     events = []
     current_ts = int(datetime.now().timestamp())
+    # Lowered once for the per-transfer and per-trade comparisons
+    address_lower = address.lower()
 
     # Process transfers
     for transfer in all_transfers:
@@ -353,7 +355,7 @@ async def fetch_wallet_activity_bitquery_live(
             }
 
             # Add sender/receiver info
-            if transfer["sender"]["address"].lower() == address.lower():
+            if transfer["sender"]["address"].lower() == address_lower:
                 event["direction"] = "out"
                 event["counterparty"] = transfer["receiver"]["address"]
             else:
@@ -379,7 +381,7 @@ async def fetch_wallet_activity_bitquery_live(
         try:
             # Determine if this wallet was involved
             trader_addr = trade["trader"]["address"]
-            if trader_addr.lower() != address.lower():
+            if trader_addr.lower() != address_lower:
                 continue
 
             event = {
@@ -303,6 +303,8 @@ def _classify_transaction(tx: Dict[str, Any]) -> str:
 def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, Any]:
     """Extract value and token information from transaction."""
     info = {}
+    # Lowered once; compared against every transfer param below
+    wallet = wallet_address.lower()
 
     # Check for native token transfers
     if tx.get("value") and tx.get("value") != "0":
@@ -311,7 +313,7 @@ def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, An
         info["token_address"] = "0x0000000000000000000000000000000000000000"
 
         # Determine direction
-        if tx.get("from_address", "").lower() == wallet_address.lower():
+        if tx.get("from_address", "").lower() == wallet:
             info["direction"] = "out"
             info["counterparty"] = tx.get("to_address")
         else:
@@ -329,9 +331,9 @@ def _extract_value_info(tx: Dict[str, Any], wallet_address: str) -> Dict[str, An
             for param in params:
                 if param.get("name") == "value":
                     info["value"] = param.get("value")
-                elif param.get("name") == "from" and param.get("value", "").lower() == wallet_address.lower():
+                elif param.get("name") == "from" and param.get("value", "").lower() == wallet:
                     info["direction"] = "out"
-                elif param.get("name") == "to" and param.get("value", "").lower() == wallet_address.lower():
+                elif param.get("name") == "to" and param.get("value", "").lower() == wallet:
                     info["direction"] = "in"
                 elif param.get("name") == "to" and info.get("direction") == "out":
                     info["counterparty"] = param.get("value")
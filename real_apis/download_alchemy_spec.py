@@ -7,6 +7,17 @@ Based on official Alchemy documentation: https://github.com/alchemyplatform/docs
 import requests
 import json
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Every spec lives on the same docs host, so one keep-alive session reuses
+# its TCP/TLS connection across downloads and retries transient errors
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
 
 def download_alchemy_openapi_specs():
     """Download Alchemy OpenAPI specifications from their official dev-docs domain."""
@@ -25,7 +36,7 @@ def download_alchemy_openapi_specs():
     print(f"📥 URL: {metadata_url}")
     
     try:
-        metadata_response = requests.get(metadata_url)
+        metadata_response = _SESSION.get(metadata_url)
         metadata_response.raise_for_status()
         metadata = metadata_response.json()
         
@@ -54,7 +65,7 @@ def download_alchemy_openapi_specs():
             print(f"📥 Downloading {spec_name}...")
             
             try:
-                spec_response = requests.get(spec_url)
+                spec_response = _SESSION.get(spec_url)
                 spec_response.raise_for_status()
                 
                 # Save the spec
@@ -11,8 +11,9 @@ import tempfile
 import sqlite3
 import sys
 import os
+import datetime
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from typing import Dict, Any
 
 # Add parent directory to path for imports
@@ -22,6 +23,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agent import (
     AgentState,
     LangGraphAgent,
+    batch_worker_node,
+    parallel_worker_node,
     should_continue
 )
 from nodes.planner import planner_node
@@ -220,6 +223,24 @@ class TestNodeFunctions(unittest.TestCase):
         failed_state = self.initial_state.copy()
         failed_state["status"] = "failed"
         self.assertEqual(should_continue(failed_state), "__end__")
+    
+    def test_graph_edges_follow_fixed_chain(self):
+        """Test each node branches only to its successor or END."""
+        from agent import _build_workflow
+        graph = _build_workflow().compile().get_graph()
+        targets = {}
+        for edge in graph.edges:
+            targets.setdefault(edge.source, set()).add(edge.target)
+        
+        self.assertEqual(targets["budget"], {"new_plan", "__end__"})
+        self.assertEqual(targets["new_plan"], {"new_work", "__end__"})
+        self.assertEqual(targets["brief"], {"memory"})
+        self.assertEqual(targets["memory"], {"__end__"})
+        
+        # A status meant for another node ends the run instead
+        from agent import _route_to
+        self.assertEqual(_route_to("new_work")({"status": "working"}), "new_work")
+        self.assertEqual(_route_to("new_work")({"status": "capped"}), "__end__")
 
 
 class TestLangGraphAgent(unittest.TestCase):
@@ -334,10 +355,380 @@ class TestLangGraphAgent(unittest.TestCase):
     
     def test_list_threads_enabled(self):
         """Test that thread listing works (returns empty list initially)."""
-        threads = self.agent.list_threads()
+        async def list_and_close():
+            try:
+                return await self.agent.list_threads()
+            finally:
+                await self.agent.close()
+        threads = asyncio.run(list_and_close())
         self.assertIsInstance(threads, list)  # Should return a list (empty initially)
 
 
+class TestPlanParsing(unittest.TestCase):
+    """Test parsing of planner replies."""
+    
+    def test_parse_plan_variants(self):
+        """Test clean, prose-wrapped and invalid planner replies."""
+        from agent import _parse_plan
+        self.assertEqual(_parse_plan('["Step 1: A", "Step 2: B"]'), ["Step 1: A", "Step 2: B"])
+        self.assertEqual(
+            _parse_plan('Here is the plan:\n```json\n["Research X", "Write Y"]\n```\nGood luck!'),
+            ["Research X", "Write Y"]
+        )
+        with self.assertRaises(json.JSONDecodeError):
+            _parse_plan("I cannot plan this.")
+        for bad in ('{"plan": ["A"]}', '[]', '["A", 3]', '["A", "  "]'):
+            with self.assertRaises(ValueError):
+                _parse_plan(bad)
+
+
+class TestRunMany(unittest.IsolatedAsyncioTestCase):
+    """Test concurrent multi-goal runs."""
+    
+    async def test_run_many_bounded_and_ordered(self):
+        """Test run_many caps concurrency and returns states in goal order."""
+        agent = LangGraphAgent()
+        in_flight = 0
+        peak = 0
+        thread_ids = []
+        
+        async def fake_run(goal, thread_id="default"):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            thread_ids.append(thread_id)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"goal": goal, "status": "completed"}
+        
+        with patch.object(agent, "_get_checkpointer", AsyncMock()), \
+             patch.object(agent, "run", side_effect=fake_run):
+            goals = [f"goal {i}" for i in range(7)]
+            results = await agent.run_many(goals, max_concurrency=3)
+        
+        self.assertEqual([r["goal"] for r in results], goals)
+        self.assertEqual(peak, 3)
+        self.assertEqual(len(set(thread_ids)), 7)
+
+
+class TestCheckpointer(unittest.IsolatedAsyncioTestCase):
+    """Test the checkpointer connection setup."""
+    
+    async def test_checkpointer_connection_pragmas(self):
+        """Test the checkpointer connection runs in WAL mode with relaxed syncs."""
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = LangGraphAgent()
+            agent.db_path = str(Path(tmp) / "checkpoints.db")
+            checkpointer = await agent._get_checkpointer()
+            try:
+                async with checkpointer.conn.execute("PRAGMA journal_mode") as cursor:
+                    self.assertEqual((await cursor.fetchone())[0], "wal")
+                async with checkpointer.conn.execute("PRAGMA synchronous") as cursor:
+                    self.assertEqual((await cursor.fetchone())[0], 1)  # NORMAL
+            finally:
+                await agent.close()
+
+
+    async def test_list_threads_uses_checkpointer(self):
+        """Test thread listing reads through the checkpointer connection."""
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = LangGraphAgent()
+            agent.db_path = str(Path(tmp) / "checkpoints.db")
+            try:
+                self.assertEqual(await agent.list_threads(), [])  # No checkpoints table yet
+                checkpointer = await agent._get_checkpointer()
+                await checkpointer.setup()
+                await checkpointer.conn.executemany(
+                    "INSERT INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id) VALUES (?, '', ?)",
+                    [("alpha", "c1"), ("alpha", "c2"), ("beta", "c1")]
+                )
+                self.assertEqual(sorted(await agent.list_threads()), ["alpha", "beta"])
+                self.assertIs(await agent._get_checkpointer(), checkpointer)
+            finally:
+                await agent.close()
+
+
+class TestConnectionWarmup(unittest.IsolatedAsyncioTestCase):
+    """Test the LiteLLM connection warm-up at construction."""
+    
+    async def test_warmup_scheduled_inside_loop(self):
+        """Test an agent built inside a running loop warms the connection."""
+        warm = AsyncMock()
+        with patch('agent.warm_llm_connection', warm):
+            agent = LangGraphAgent()
+            await agent._warmup
+        warm.assert_awaited_once()
+        await agent.close()
+    
+    def test_no_warmup_without_loop(self):
+        """Test constructing outside an event loop skips the warm-up."""
+        self.assertIsNone(LangGraphAgent()._warmup)
+
+
+class TestBatchWorker(unittest.IsolatedAsyncioTestCase):
+    """Test the single-call batch worker."""
+    
+    def setUp(self):
+        self.state: AgentState = {
+            "goal": "Ship a tool",
+            "plan": ["Design", "Build", "Test"],
+            "current_step": 1,
+            "completed_actions": [{"step": 0, "description": "Design"}],
+            "messages": [],
+            "status": "working",
+            "spent_today": 0.0,
+            "last_date": datetime.date.today().isoformat()
+        }
+    
+    async def test_batch_worker_completes_remaining_steps(self):
+        """Test one LLM call completes every remaining step."""
+        response = {
+            "text": json.dumps([{"step_idx": 1, "result": "built"}, {"step_idx": 2, "result": "tested"}]),
+            "usage": {"total_tokens": 300},
+            "model": "haiku",
+            "estimated_cost": 0.002
+        }
+        with patch('agent.llm_call', AsyncMock(return_value=response)) as mock_llm_call:
+            result = await batch_worker_node(self.state)
+        
+        mock_llm_call.assert_awaited_once()
+        self.assertEqual(mock_llm_call.call_args.kwargs["max_tokens"], 1200)
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual(result["current_step"], 3)
+        self.assertEqual([a["result"] for a in result["completed_actions"][1:]], ["built", "tested"])
+        self.assertAlmostEqual(result["spent_today"], 0.002)
+        self.assertIn("- Design\n", mock_llm_call.call_args.kwargs["messages"][1]["content"])
+        self.assertEqual(result["completed_context"], "- Design\n- Build\n- Test\n")
+    
+    def test_completed_context_bounded(self):
+        """Test the prebuilt worker context keeps only the most recent steps."""
+        from agent import CONTEXT_ACTIONS, _extend_completed_context
+        context = _extend_completed_context("", [f"step {i}" for i in range(CONTEXT_ACTIONS + 5)])
+        self.assertEqual(len(context.splitlines()), CONTEXT_ACTIONS)
+        self.assertTrue(context.startswith("- step 5\n"))
+    
+    async def test_batch_worker_rejects_mismatched_results(self):
+        """Test a result list of the wrong length fails the step batch."""
+        response = {"text": json.dumps([{"step_idx": 1, "result": "built"}]),
+                    "usage": {}, "model": "haiku", "estimated_cost": 0.0}
+        with patch('agent.llm_call', AsyncMock(return_value=response)):
+            result = await batch_worker_node(self.state)
+        
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["current_step"], 1)
+    
+    async def test_batch_worker_charges_unparseable_reply(self):
+        """Test a reply that fails to parse still charges the call to the budget."""
+        response = {"text": "not json", "usage": {}, "model": "haiku", "estimated_cost": 0.5}
+        with patch('agent.llm_call', AsyncMock(return_value=response)):
+            result = await batch_worker_node(self.state)
+        
+        self.assertEqual(result["status"], "failed")
+        self.assertAlmostEqual(result["spent_today"], 0.5)
+        self.assertEqual(self.state["spent_today"], 0.0)
+
+
+class TestParallelWorker(unittest.IsolatedAsyncioTestCase):
+    """Test concurrent execution of independent plan steps."""
+    
+    def setUp(self):
+        self.state: AgentState = {
+            "goal": "Compare two pools",
+            "plan": ["Research pool A", "Research pool B", "Synthesize a comparison"],
+            "current_step": 0,
+            "completed_actions": [],
+            "completed_context": "",
+            "messages": [],
+            "status": "working",
+            "spent_today": 0.0,
+            "last_date": datetime.date.today().isoformat()
+        }
+    
+    def test_ready_steps_stop_at_synthesis(self):
+        """Test steps before the first synthesis step form the ready set."""
+        from agent import _ready_steps
+        self.assertEqual(_ready_steps(self.state["plan"], 0), [0, 1])
+        self.assertEqual(_ready_steps(self.state["plan"], 2), [2])
+    
+    async def test_independent_steps_run_concurrently(self):
+        """Test the ready steps overlap and the synthesis step waits for them."""
+        in_flight = []
+        peak = []
+        
+        async def fake_llm_call(messages, **_):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return {"text": "done", "usage": {}, "model": "haiku", "estimated_cost": 0.001}
+        
+        with patch('agent.llm_call', fake_llm_call):
+            result = await parallel_worker_node(self.state)
+            self.assertEqual(max(peak), 2)
+            self.assertEqual(result["current_step"], 2)
+            self.assertEqual(result["status"], "working")
+            
+            result = await parallel_worker_node(result)
+        
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual([a["step"] for a in result["completed_actions"]], [0, 1, 2])
+        self.assertAlmostEqual(result["spent_today"], 0.003)
+    
+    async def test_message_history_capped(self):
+        """Test messages beyond the window move to the thread's archive."""
+        from agent import MESSAGE_WINDOW
+        self.state["thread_id"] = "t1"
+        self.state["messages"] = [f"m{i}" for i in range(MESSAGE_WINDOW)]
+        response = {"text": "done", "usage": {}, "model": "haiku", "estimated_cost": 0.0}
+        
+        with patch('agent.llm_call', AsyncMock(return_value=response)), \
+             patch('json_storage.archive_messages', AsyncMock()) as mock_archive:
+            result = await parallel_worker_node(self.state)
+        
+        self.assertEqual(len(result["messages"]), MESSAGE_WINDOW)
+        self.assertEqual(result["messages"][0], "m1")
+        self.assertTrue(result["messages"][-1].startswith("AI(work-parallel)"))
+        mock_archive.assert_awaited_once_with("t1", ["m0"])
+    
+    async def test_failed_step_keeps_earlier_results(self):
+        """Test a failure records the steps before it and charges every call."""
+        responses = [
+            {"text": "done", "usage": {}, "model": "haiku", "estimated_cost": 0.001},
+            RuntimeError("rate limited")
+        ]
+        with patch('agent.llm_call', AsyncMock(side_effect=responses)):
+            result = await parallel_worker_node(self.state)
+        
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["current_step"], 1)
+        self.assertEqual(len(result["completed_actions"]), 1)
+        self.assertAlmostEqual(result["spent_today"], 0.001)
+    
+    async def test_input_state_untouched(self):
+        """Test the pass returns its spend instead of writing into the input."""
+        response = {"text": "done", "usage": {}, "model": "haiku", "estimated_cost": 0.1}
+        with patch('agent.llm_call', AsyncMock(return_value=response)):
+            result = await parallel_worker_node(self.state)
+        
+        self.assertEqual(self.state["spent_today"], 0.0)
+        self.assertEqual(self.state["current_step"], 0)
+        self.assertAlmostEqual(result["spent_today"], 0.2)
+
+
+class TestStepGraph(unittest.IsolatedAsyncioTestCase):
+    """Test the goal-execution graph the step workers run in."""
+    
+    def _initial_state(self) -> AgentState:
+        return {
+            "goal": "Compare two pools",
+            "plan": [],
+            "current_step": 0,
+            "completed_actions": [],
+            "completed_context": "",
+            "messages": ["Human: Goal: Compare two pools"],
+            "thread_id": "steps",
+            "status": "planning",
+            "spent_today": 0.0,
+            "last_date": datetime.date.today().isoformat()
+        }
+    
+    async def _run(self, step_mode: str, responses, state: AgentState = None):
+        from agent import _build_workflow
+        app = _build_workflow(step_mode).compile()
+        with patch.dict(os.environ, {"BUDGET_DAILY": "2.00"}), \
+             patch('agent.llm_call', AsyncMock(side_effect=responses)) as mock_llm_call:
+            visited = []
+            final = None
+            async for update in app.astream(state or self._initial_state()):
+                for node, node_state in update.items():
+                    visited.append(node)
+                    final = node_state
+        return visited, final, mock_llm_call
+    
+    def test_agent_flag_selects_step_graph(self):
+        """Test batch_steps swaps the recon chain for the step graph."""
+        nodes = set(LangGraphAgent(batch_steps=True).app.get_graph().nodes)
+        self.assertIn("step_work", nodes)
+        self.assertNotIn("new_work", nodes)
+        self.assertNotIn("step_work", set(LangGraphAgent().app.get_graph().nodes))
+    
+    async def test_batch_graph_runs_batch_worker(self):
+        """Test the batch graph plans the goal and finishes every step in one call."""
+        plan = ["Research pool A", "Research pool B", "Synthesize a comparison"]
+        responses = [
+            {"text": json.dumps(plan), "usage": {}, "model": "sonnet", "estimated_cost": 0.01},
+            {"text": json.dumps([{"step_idx": i, "result": f"r{i}"} for i in range(3)]),
+             "usage": {}, "model": "haiku", "estimated_cost": 0.002},
+        ]
+        visited, final, mock_llm_call = await self._run("batch", responses)
+        
+        self.assertEqual(visited, ["budget", "step_plan", "step_work"])
+        self.assertEqual(mock_llm_call.await_count, 2)
+        self.assertEqual(final["status"], "completed")
+        self.assertEqual([a["result"] for a in final["completed_actions"]], ["r0", "r1", "r2"])
+        self.assertAlmostEqual(final["spent_today"], 0.012)
+    
+    async def test_parallel_graph_loops_parallel_worker(self):
+        """Test the parallel graph runs one worker pass per ready set until done."""
+        plan = ["Research pool A", "Research pool B", "Synthesize a comparison"]
+        step = {"text": "done", "usage": {}, "model": "haiku", "estimated_cost": 0.001}
+        responses = [
+            {"text": json.dumps(plan), "usage": {}, "model": "sonnet", "estimated_cost": 0.01},
+            step, step, step
+        ]
+        visited, final, mock_llm_call = await self._run("parallel", responses)
+        
+        self.assertEqual(visited, ["budget", "step_plan", "step_work", "step_work"])
+        self.assertEqual(mock_llm_call.await_count, 4)
+        self.assertEqual(final["status"], "completed")
+        self.assertEqual([a["step"] for a in final["completed_actions"]], [0, 1, 2])
+        self.assertAlmostEqual(final["spent_today"], 0.013)
+    
+    async def test_graph_archives_message_overflow(self):
+        """Test messages added by the graph's nodes stay within the window."""
+        from agent import MESSAGE_WINDOW
+        state = self._initial_state()
+        state["messages"] = [f"m{i}" for i in range(MESSAGE_WINDOW)]
+        plan = ["Research pool A", "Research pool B"]
+        responses = [
+            {"text": json.dumps(plan), "usage": {}, "model": "sonnet", "estimated_cost": 0.01},
+            {"text": json.dumps([{"step_idx": i, "result": f"r{i}"} for i in range(2)]),
+             "usage": {}, "model": "haiku", "estimated_cost": 0.002},
+        ]
+        with patch('json_storage.archive_messages', AsyncMock()) as mock_archive:
+            visited, final, _ = await self._run("batch", responses, state)
+        
+        self.assertEqual(final["status"], "completed")
+        self.assertEqual(len(final["messages"]), MESSAGE_WINDOW)
+        self.assertTrue(final["messages"][-1].startswith("AI(work-haiku)"))
+        archived = [m for call in mock_archive.await_args_list for m in call.args[1]]
+        self.assertEqual(archived, ["m0", "m1"])
+        self.assertTrue(all(call.args[0] == "steps" for call in mock_archive.await_args_list))
+    
+    async def test_budget_cap_message_windowed(self):
+        """Test the budget node archives overflow instead of growing messages."""
+        from agent import MESSAGE_WINDOW, budget_node
+        state = self._initial_state()
+        state["messages"] = [f"m{i}" for i in range(MESSAGE_WINDOW)]
+        state["spent_today"] = 5.0
+        
+        with patch.dict(os.environ, {"BUDGET_DAILY": "2.00"}), \
+             patch('json_storage.archive_messages', AsyncMock()) as mock_archive:
+            result = await budget_node(state)
+        
+        self.assertEqual(result["status"], "capped")
+        self.assertEqual(len(result["messages"]), MESSAGE_WINDOW)
+        self.assertTrue(result["messages"][-1].startswith("Budget cap hit"))
+        self.assertEqual(len(state["messages"]), MESSAGE_WINDOW)
+        mock_archive.assert_awaited_once_with("steps", ["m0"])
+    
+    def test_step_flags_exclusive(self):
+        """Test only one step worker can be selected."""
+        self.assertIn("step_work", set(LangGraphAgent(parallel_steps=True).app.get_graph().nodes))
+        with self.assertRaises(ValueError):
+            LangGraphAgent(batch_steps=True, parallel_steps=True)
+
+
 class TestLLMIntegration(unittest.TestCase):
     """Test LLM integration (requires running LiteLLM server)."""
     
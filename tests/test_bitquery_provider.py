@@ -94,5 +94,20 @@ class TestBitqueryProvider(unittest.IsolatedAsyncioTestCase):
             )
 
 
+    def test_invalid_wallet_skips_providers(self):
+        """Test that malformed addresses are rejected without a provider call."""
+        from mock_tools import fetch_wallet_activity_bitquery
+        
+        os.environ["BITQUERY_ACCESS_TOKEN"] = "test_token"
+        with patch.dict(os.environ, {"WALLET_RECON_SOURCE": "bitquery"}), \
+             patch("real_apis.bitquery.fetch_wallet_activity_bitquery_live") as mock_live, \
+             patch("builtins.print"):
+            response = fetch_wallet_activity_bitquery("0xinvalid", "base", 0)
+        
+        mock_live.assert_not_called()
+        self.assertEqual(response["events"], [])
+        self.assertEqual(response["metadata"]["error"], "invalid_address")
+
+
 if __name__ == '__main__':
     unittest.main()
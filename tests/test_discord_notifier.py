@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched Discord notifier.
+"""
+
+import unittest
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import discord_notifier
+from discord_notifier import DiscordNotifier, MAX_EMBED_CHARS_PER_MESSAGE
+
+
+class TestDiscordNotifierBatching(unittest.IsolatedAsyncioTestCase):
+    """Test queued notifications are flushed together through the webhook."""
+
+    async def asyncSetUp(self):
+        self.webhook = MagicMock()
+        self.webhook.send = AsyncMock()
+        self.notifier = DiscordNotifier()
+
+        self.patchers = [
+            patch.object(discord_notifier, 'DISCORD_WEBHOOK_URL', "https://discord.test/webhook"),
+            patch.object(DiscordNotifier, '_get_webhook', AsyncMock(return_value=self.webhook)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        await self.notifier.stop()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+
+    async def test_notifications_in_window_share_one_message(self):
+        """Test notifications queued within FLUSH_MS go out as one message."""
+        results = await asyncio.gather(
+            self.notifier.send_brief_notification("Brief A", "wallet A moved"),
+            self.notifier.send_brief_notification("Brief B", "wallet B moved")
+        )
+
+        self.assertEqual(results, [True, True])
+        self.webhook.send.assert_awaited_once()
+        sent = self.webhook.send.await_args.kwargs
+        self.assertEqual([embed.title for embed in sent["embeds"]], ["Brief A", "Brief B"])
+        self.assertIn("Brief A", sent["content"])
+        self.assertIn("Brief B", sent["content"])
+
+    async def test_batch_split_by_embed_length(self):
+        """Test a batch whose embeds exceed Discord's total length goes out in parts."""
+        text = "x" * (MAX_EMBED_CHARS_PER_MESSAGE // 2 - 100)
+        results = await asyncio.gather(*(
+            self.notifier.send_brief_notification(f"Brief {i}", text) for i in range(3)
+        ))
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(self.webhook.send.await_count, 2)
+        for call in self.webhook.send.await_args_list:
+            self.assertLessEqual(sum(len(embed) for embed in call.kwargs["embeds"]), MAX_EMBED_CHARS_PER_MESSAGE)
+        self.assertEqual([len(call.kwargs["embeds"]) for call in self.webhook.send.await_args_list], [2, 1])
+
+    async def test_failed_send_reported_to_every_caller(self):
+        """Test a webhook error fails each notification in its message."""
+        self.webhook.send.side_effect = RuntimeError("429 exhausted")
+        results = await asyncio.gather(
+            self.notifier.send_brief_notification("Brief A", "a"),
+            self.notifier.send_brief_notification("Brief B", "b")
+        )
+        self.assertEqual(results, [False, False])
+
+    async def test_stop_fails_pending_notifications(self):
+        """Test stop() cancels the sender and fails what it had not sent."""
+        with patch.object(discord_notifier, 'FLUSH_MS', 60_000):
+            pending = asyncio.create_task(self.notifier.send_brief_notification("Brief A", "a"))
+            await asyncio.sleep(0.01)
+            await self.notifier.stop()
+
+        self.assertFalse(await pending)
+        self.webhook.send.assert_not_awaited()
+
+        # A later notification starts a new sender
+        self.assertTrue(await self.notifier.send_brief_notification("Brief B", "b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
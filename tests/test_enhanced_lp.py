@@ -89,6 +89,72 @@ class TestEnhancedLP(unittest.IsolatedAsyncioTestCase):
             self.assertIn("lp_tokens_delta", details)
             self.assertIn("pool_address", details)
     
+    async def test_enhanced_lp_tool_async_matches_sync(self):
+        """Test async LP fetch returns the same events without blocking."""
+        from mock_tools import fetch_lp_activity, fetch_lp_activity_async
+        
+        since_ts = int((datetime.now() - timedelta(hours=10)).timestamp())
+        with patch("mock_tools.MOCK_LATENCY", 0.05), \
+             patch("mock_tools.time.sleep", side_effect=AssertionError("blocking sleep")):
+            ticker = asyncio.create_task(asyncio.sleep(0))
+            lp_events = await fetch_lp_activity_async(since_ts, use_realistic=True)
+            self.assertTrue(ticker.done())
+        
+        expected = fetch_lp_activity(since_ts, use_realistic=True)
+        self.assertEqual([e["txHash"] for e in lp_events], [e["txHash"] for e in expected])
+    
+    async def test_no_mock_latency_skips_every_sleep(self):
+        """Test no_mock_latency silences the simulated delay in all mock fetchers."""
+        import mock_tools
+        
+        with patch("mock_tools.MOCK_LATENCY", 0.05), \
+             patch("mock_tools.time.sleep") as sleep:
+            mock_tools.web_metrics_lookup("base dex volume")
+            self.assertEqual(sleep.call_count, 1)
+            
+            with mock_tools.no_mock_latency():
+                mock_tools.fetch_lp_activity(0)
+                mock_tools.fetch_wallet_activity("0xabc", 0)
+                mock_tools.web_metrics_lookup("base dex volume")
+                mock_tools._fetch_wallet_activity_bitquery_mock("0x" + "1" * 40)
+            self.assertEqual(sleep.call_count, 1)
+            self.assertEqual(mock_tools.MOCK_LATENCY, 0.05)
+    
+    async def test_web_metrics_lookup_returns_independent_copies(self):
+        """Test web metrics results can be modified without touching the fixture."""
+        from mock_tools import web_metrics_lookup
+        
+        first = web_metrics_lookup("base dex volume")
+        first["key_values"]["active_pools"] = -1
+        second = web_metrics_lookup("top pools")
+        
+        self.assertEqual(second["key_values"]["active_pools"], 45)
+        self.assertEqual(second["query"], "top pools")
+        self.assertEqual(first["query"], "base dex volume")
+    
+    async def test_enhanced_lp_tool_time_cutoffs(self):
+        """Test indexed LP fetch matches a linear timestamp filter at every cutoff."""
+        from mock_tools import fetch_lp_activity, REALISTIC_LP_FIXTURES
+        
+        stamps = sorted({e["timestamp"] for e in REALISTIC_LP_FIXTURES})
+        for since_ts in [0, *stamps, stamps[-1] + 1]:
+            with self.subTest(since_ts=since_ts):
+                expected = [e["txHash"] for e in REALISTIC_LP_FIXTURES if e["timestamp"] >= since_ts]
+                got = [e["txHash"] for e in fetch_lp_activity(since_ts, use_realistic=True)]
+                self.assertEqual(got, expected)
+    
+    async def test_enhanced_lp_tool_leaves_fixtures_untouched(self):
+        """Test LP fetch returns copies and never stamps the shared fixtures."""
+        from mock_tools import fetch_lp_activity, SIMPLE_LP_FIXTURES
+        
+        lp_events = fetch_lp_activity(0)
+        self.assertTrue(all("provenance" not in e for e in SIMPLE_LP_FIXTURES))
+        self.assertTrue(all(e is not f for e in lp_events for f in SIMPLE_LP_FIXTURES))
+        
+        later = fetch_lp_activity(lp_events[0]["timestamp"])
+        self.assertEqual(lp_events[0]["provenance"]["since_ts"], 0)
+        self.assertEqual(later[0]["provenance"]["since_ts"], lp_events[0]["timestamp"])
+    
     async def test_worker_lp_recon_with_scratch_save(self):
         """Test Worker node LP recon with scratch layer save."""
         from nodes.worker import worker_node
@@ -123,6 +189,27 @@ class TestEnhancedLP(unittest.IsolatedAsyncioTestCase):
         self.assertIn("events", raw_response)
         self.assertIn("since_ts", raw_response)
     
+    async def test_worker_repeat_runs_independent(self):
+        """Test two worker runs on one state return separate results and keep the input."""
+        from nodes.worker import worker_node
+        
+        state = {
+            "selected_action": "lp_recon",
+            "cursors": {"lp": int((datetime.now() - timedelta(hours=10)).timestamp())},
+            "use_realistic_fixtures": False
+        }
+        before = dict(state)
+        
+        result1 = await worker_node(state)
+        result2 = await worker_node(state)
+        
+        self.assertIsNot(result1, result2)
+        self.assertIsNot(result1, state)
+        self.assertEqual(state, before)
+        result1["status"] = "changed"
+        self.assertEqual(result2["status"], "analyzing")
+        self.assertEqual(len(result1["events"]), len(result2["events"]))
+    
     async def test_analyze_lp_events_normalization(self):
         """Test Analyze node LP events normalization."""
         from nodes.analyze import analyze_node
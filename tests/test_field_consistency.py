@@ -176,6 +176,21 @@ class TestFieldConsistency(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(tx_hash), 66,  # 0x + 64 hex chars
             "Transaction hash should be 32 bytes (66 chars including '0x')")
 
+    async def test_mock_events_cached_per_wallet(self):
+        """Test repeat mock fetches reuse the wallet's hashes but build fresh events."""
+        import mock_tools
+        address = "0xfeedfacefeedfacefeedfacefeedfacefeedface"
+
+        first = _fetch_wallet_activity_bitquery_mock(address, chain="base", since_ts=0)
+        with patch("mock_tools.hashlib.sha256", wraps=mock_tools.hashlib.sha256) as sha256:
+            second = _fetch_wallet_activity_bitquery_mock(address, chain="ethereum", since_ts=0)
+        sha256.assert_not_called()
+
+        self.assertEqual([e["tx"] for e in first["events"]], [e["tx"] for e in second["events"]])
+        self.assertEqual({e["chain"] for e in second["events"]}, {"ethereum"})
+        first["events"][0]["raw"]["log"]["index"] = -1
+        self.assertEqual(second["events"][0]["raw"]["log"]["index"], 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,6 +8,7 @@ import sqlite3
 import tempfile
 import unittest
 import asyncio
+import threading
 from pathlib import Path
 from unittest.mock import patch, AsyncMock
 
@@ -15,8 +16,8 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
 from json_storage import (
-    DatabaseManager, init_db, save_json, load_json, query_recent,
-    record_llm_usage, get_daily_usage, health_check, close_db
+    DatabaseManager, SyncDatabaseManager, init_db, save_json, load_json, query_recent,
+    record_llm_usage, get_daily_usage, health_check, close_db, SCHEMA_VERSION
 )
 
 
@@ -161,6 +162,287 @@ class TestJsonStorageAsync(unittest.IsolatedAsyncioTestCase):
         self.assertAlmostEqual(usage['estimated_cost'], 0.009, places=6)
         self.assertEqual(usage['request_count'], 2)
     
+    async def test_daily_usage_backfills_ts_unix(self):
+        """Test that rows written without ts_unix are backfilled and counted."""
+        conn = await self.db_manager._get_connection()
+        await conn.executemany("""
+            INSERT INTO llm_usage (model, prompt_tokens, completion_tokens, estimated_cost, timestamp)
+            VALUES ('legacy', 10, 5, 0.001, datetime('now', ?))
+        """, [("-1 hour",), ("-2 days",)])
+        await conn.execute("PRAGMA user_version = 0")
+        await conn.commit()
+
+        # A fresh manager on a pre-migration database runs the backfill
+        manager = DatabaseManager(Path(self.temp_db.name))
+        await manager.initialize()
+        usage = await manager.get_daily_usage("legacy")
+        await manager.close()
+        self.assertEqual(usage['request_count'], 1)
+        self.assertEqual(usage['prompt_tokens'], 10)
+
+    async def test_daily_usage_hourly_rollup(self):
+        """Test that usage rows roll up into per-model hourly buckets."""
+        for model, tokens in (("gpt-4", 100), ("gpt-4", 50), ("haiku", 10)):
+            await self.db_manager.record_llm_usage(model, tokens, 1, 0.001)
+
+        conn = await self.db_manager._get_connection()
+        async with conn.execute("""
+            SELECT model, prompt_tokens, request_count FROM llm_usage_hourly ORDER BY model
+        """) as cursor:
+            self.assertEqual(await cursor.fetchall(), [("gpt-4", 150, 2), ("haiku", 10, 1)])
+
+        usage = await self.db_manager.get_daily_usage()
+        self.assertEqual(usage['prompt_tokens'], 160)
+        self.assertEqual(usage['request_count'], 3)
+
+    async def test_daily_usage_rolling_window(self):
+        """Test daily usage covers exactly the last 24 hours, not whole buckets."""
+        now = 500_000 * 3600 + 1800  # half past the hour
+        since = now - 86400
+        conn = await self.db_manager._get_connection()
+        # The first two rows share the hour the window starts in
+        await conn.executemany("""
+            INSERT INTO llm_usage (model, prompt_tokens, completion_tokens, estimated_cost, ts_unix)
+            VALUES ('gpt-4', 10, 1, 0.001, ?)
+        """, [(since - 600,), (since + 600,), (since + 4000,), (now - 60,)])
+        await conn.commit()
+
+        with patch("json_storage.time.time", return_value=now):
+            self.assertEqual((await self.db_manager.get_daily_usage("gpt-4"))["request_count"], 3)
+            self.assertEqual((await self.db_manager.get_daily_usage())["prompt_tokens"], 30)
+
+    async def test_migrations_run_once(self):
+        """Test reopening a migrated database skips the full-table backfills."""
+        await self.db_manager.record_llm_usage("gpt-4", 10, 1, 0.001)
+        conn = await self.db_manager._get_connection()
+        await conn.execute("DELETE FROM llm_usage_hourly")
+        await conn.commit()
+
+        manager = DatabaseManager(Path(self.temp_db.name))
+        await manager.initialize()
+        await manager.close()
+        SyncDatabaseManager(Path(self.temp_db.name)).load_json("missing")
+
+        async with conn.execute("SELECT COUNT(*) FROM llm_usage_hourly") as cursor:
+            self.assertEqual((await cursor.fetchone())[0], 0)
+        async with conn.execute("PRAGMA user_version") as cursor:
+            self.assertEqual((await cursor.fetchone())[0], SCHEMA_VERSION)
+
+    async def test_upsert_json_many(self):
+        """Test bulk upsert writes every item and logs the batch once."""
+        items = [(f"bulk_{i}", "bulk", {"index": i}) for i in range(5)]
+        await self.db_manager.upsert_json_many(items)
+        await self.db_manager.upsert_json_many([("bulk_0", "bulk", {"index": 99})])
+
+        self.assertEqual(await self.db_manager.load_json("bulk_0"), {"index": 99})
+        self.assertEqual(len(await self.db_manager.query_recent("bulk", limit=10)), 5)
+
+        conn = await self.db_manager._get_connection()
+        async with conn.execute("SELECT n_rows FROM writes_log ORDER BY id") as cursor:
+            self.assertEqual([row[0] for row in await cursor.fetchall()], [5, 1])
+
+        with self.assertRaises(ValueError):
+            await self.db_manager.upsert_json_many([("bad", "bulk", {"f": lambda x: x})])
+
+    async def test_large_payload_compressed(self):
+        """Test that large payloads are stored compressed and read back intact."""
+        large = {"rows": [{"wallet": "0xabc", "usd": i} for i in range(200)]}
+        await self.db_manager.upsert_json("large", "big", large)
+        await self.db_manager.upsert_json("small", "big", {"n": 1})
+
+        self.assertEqual(await self.db_manager.load_json("large"), large)
+        self.assertCountEqual(await self.db_manager.query_recent("big", limit=5), [large, {"n": 1}])
+
+        conn = await self.db_manager._get_connection()
+        async with conn.execute(
+            "SELECT id, raw_blob IS NOT NULL, codec FROM json_cache_scratch WHERE source = 'big' ORDER BY id"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        self.assertEqual(rows[0][:2], ("large", 1))
+        self.assertIsNotNone(rows[0][2])
+        self.assertEqual(rows[1], ("small", 0, None))
+
+    async def test_load_json_read_cache(self):
+        """Test that cached reads return fresh copies of what was stored."""
+        payload = {"items": [1, 2]}
+        await self.db_manager.upsert_json("cached", "test", payload)
+        payload["items"].append(3)
+
+        first = await self.db_manager.load_json("cached")
+        self.assertEqual(first, {"items": [1, 2]})
+        first["items"].clear()
+        self.assertEqual(await self.db_manager.load_json("cached"), {"items": [1, 2]})
+
+        # Served from the cache even after the row is removed underneath it
+        conn = await self.db_manager._get_connection()
+        await conn.execute("DELETE FROM json_cache_scratch WHERE id = 'cached'")
+        await conn.commit()
+        self.assertEqual(await self.db_manager.load_json("cached"), {"items": [1, 2]})
+
+        with patch("json_storage.READ_CACHE_TTL", 0):
+            await self.db_manager.upsert_json("expired", "test", {"n": 1})
+        await conn.execute("DELETE FROM json_cache_scratch WHERE id = 'expired'")
+        await conn.commit()
+        self.assertIsNone(await self.db_manager.load_json("expired"))
+
+    async def test_read_cache_sees_other_connections(self):
+        """Test a cached id rewritten through another connection is read fresh."""
+        await self.db_manager.upsert_json("shared", "test", {"n": 1})
+        self.assertEqual(await self.db_manager.load_json("shared"), {"n": 1})
+
+        SyncDatabaseManager(Path(self.temp_db.name)).upsert_json("shared", "test", {"n": 2})
+        # data_version is checked once per event-loop tick
+        await asyncio.sleep(0)
+        self.assertEqual(await self.db_manager.load_json("shared"), {"n": 2})
+
+    async def test_read_cache_hits_share_version_check(self):
+        """Test cache hits in one loop tick cost a single data_version round trip."""
+        await self.db_manager.upsert_json_many([("a", "test", {"n": 1}), ("b", "test", {"n": 2})])
+        check = AsyncMock(side_effect=DatabaseManager._data_version)
+
+        with patch.object(self.db_manager, "_data_version", check):
+            results = await asyncio.gather(*(self.db_manager.load_json(id) for id in ["a", "b", "a"]))
+            self.assertEqual(check.await_count, 1)
+
+            # A hit in a later tick asks again
+            await self.db_manager.load_json("a")
+            self.assertEqual(check.await_count, 2)
+
+        self.assertEqual(results, [{"n": 1}, {"n": 2}, {"n": 1}])
+
+    async def test_audit_log_buffered(self):
+        """Test that single upserts buffer their writes_log rows until flushed."""
+        async def log_count():
+            conn = await self.db_manager._get_connection()
+            async with conn.execute("SELECT COUNT(*) FROM writes_log") as cursor:
+                return (await cursor.fetchone())[0]
+
+        with patch("json_storage.AUDIT_FLUSH_SECONDS", 3600):
+            for i in range(3):
+                await self.db_manager.upsert_json(f"audit_{i}", "test", {"i": i})
+            self.assertEqual(await log_count(), 0)
+
+            await self.db_manager.flush_audit()
+            self.assertEqual(await log_count(), 3)
+
+            with patch("json_storage.AUDIT_FLUSH_ROWS", 2):
+                await self.db_manager.upsert_json("audit_3", "test", {"i": 3})
+                self.assertEqual(await log_count(), 3)
+                await self.db_manager.upsert_json("audit_4", "test", {"i": 4})
+                self.assertEqual(await log_count(), 5)
+
+    async def test_unchanged_payload_skips_write(self):
+        """Test that re-uploading an identical payload writes nothing."""
+        async def row_state():
+            conn = await self.db_manager._get_connection()
+            async with conn.execute(
+                "SELECT rowid, content_hash FROM json_cache_scratch WHERE id = 'poll'"
+            ) as cursor:
+                return await cursor.fetchone()
+
+        await self.db_manager.upsert_json("poll", "coingecko", {"price": 1})
+        first = await row_state()
+        self.assertIsNotNone(first[1])
+
+        await self.db_manager.upsert_json("poll", "coingecko", {"price": 1})
+        self.assertEqual(await row_state(), first)
+        await self.db_manager.flush_audit()
+        conn = await self.db_manager._get_connection()
+        async with conn.execute("SELECT COUNT(*) FROM writes_log") as cursor:
+            self.assertEqual((await cursor.fetchone())[0], 1)
+
+        # A changed payload or a different source is written again
+        await self.db_manager.upsert_json("poll", "coingecko", {"price": 2})
+        self.assertNotEqual(await row_state(), first)
+        await self.db_manager.upsert_json("poll", "other", {"price": 2})
+        self.assertEqual(await self.db_manager.query_recent("other"), [{"price": 2}])
+
+    async def test_messages_archive(self):
+        """Test archived messages come back per thread in insertion order."""
+        await self.db_manager.archive_messages("t1", ["a", "b"])
+        await self.db_manager.archive_messages("t2", ["x"])
+        await self.db_manager.archive_messages("t1", ["c"])
+        await self.db_manager.archive_messages("t1", [])
+
+        self.assertEqual(await self.db_manager.get_archived_messages("t1"), ["a", "b", "c"])
+        self.assertEqual(await self.db_manager.get_archived_messages("t2"), ["x"])
+        self.assertEqual(await self.db_manager.get_archived_messages("missing"), [])
+
+    async def test_concurrent_lazy_init(self):
+        """Test that concurrent first calls initialize the global manager once."""
+        with patch('json_storage.DB_PATH', Path(self.temp_db.name)), \
+             patch('json_storage._db_manager', None), \
+             patch.object(DatabaseManager, 'initialize', autospec=True,
+                          side_effect=DatabaseManager.initialize) as init:
+            results = await asyncio.gather(*[load_json(f"missing_{i}") for i in range(10)])
+            self.assertEqual(results, [None] * 10)
+            self.assertEqual(init.call_count, 1)
+            await close_db()
+
+    async def test_initialize_once_and_pragmas_per_connection(self):
+        """Test that initialize is idempotent and reopened connections get pragmas."""
+        with patch.object(DatabaseManager, '_get_connection', autospec=True,
+                          side_effect=DatabaseManager._get_connection) as get_conn:
+            await self.db_manager.initialize()
+            get_conn.assert_not_called()
+
+        conn = await self.db_manager._get_connection()
+        await conn.close()
+        conn = await self.db_manager._get_connection()
+        async with conn.execute("PRAGMA temp_store") as cursor:
+            self.assertEqual((await cursor.fetchone())[0], 2)  # MEMORY
+
+    async def test_connection_reuse(self):
+        """Test that calls share one connection and reopen it after a close."""
+        first = await self.db_manager._get_connection()
+        await self.db_manager.upsert_json("reuse", "test", {"n": 1})
+        self.assertIs(await self.db_manager._get_connection(), first)
+
+        await first.close()
+        self.assertEqual(await self.db_manager.load_json("reuse"), {"n": 1})
+        self.assertIsNot(await self.db_manager._get_connection(), first)
+
+    async def test_connection_thread_is_daemon(self):
+        """Test a shared connection left open cannot block interpreter exit."""
+        await self.db_manager.close()
+        before = set(threading.enumerate())
+        await self.db_manager._get_connection()
+        started = set(threading.enumerate()) - before
+        self.assertTrue(started)
+        self.assertTrue(all(thread.daemon for thread in started))
+
+    async def test_failed_write_rolls_back(self):
+        """Test a failing write leaves nothing behind and the connection usable."""
+        with self.assertRaises(RuntimeError):
+            async with self.db_manager._transaction() as conn:
+                await conn.execute("INSERT INTO cursors (name, last_ts) VALUES ('half', 1)")
+                raise RuntimeError("boom")
+
+        self.assertIsNone(await self.db_manager.get_cursor("half"))
+        self.assertFalse((await self.db_manager._get_connection()).in_transaction)
+        await self.db_manager.set_cursor("after", 2)
+        self.assertEqual(await self.db_manager.get_cursor("after"), 2)
+
+    async def test_concurrent_writes_isolated(self):
+        """Test one writer's rollback never undoes another's write, nor commits its own."""
+        entered = asyncio.Event()
+
+        async def failing_write():
+            async with self.db_manager._transaction() as conn:
+                await conn.execute("INSERT INTO cursors (name, last_ts) VALUES ('doomed', 1)")
+                entered.set()
+                await asyncio.sleep(0.05)
+                raise RuntimeError("boom")
+
+        async def other_write():
+            await entered.wait()
+            await self.db_manager.set_cursor("kept", 2)
+
+        results = await asyncio.gather(failing_write(), other_write(), return_exceptions=True)
+        self.assertIsInstance(results[0], RuntimeError)
+        self.assertIsNone(await self.db_manager.get_cursor("doomed"))
+        self.assertEqual(await self.db_manager.get_cursor("kept"), 2)
+
     async def test_health_check(self):
         """Test database health check."""
         health = await self.db_manager.health_check()
@@ -180,7 +462,23 @@ class TestJsonStorageAsync(unittest.IsolatedAsyncioTestCase):
         # Clean up data older than 12 hours (should clean the old data)
         deleted = await self.db_manager.cleanup_old_data(days=0.5)
         self.assertGreaterEqual(deleted, 1)
-    
+
+    async def test_cleanup_old_data_in_batches(self):
+        """Test that cleanup deletes across several chunks and keeps fresh rows."""
+        conn = await self.db_manager._get_connection()
+        await conn.executemany("""
+            INSERT INTO json_cache_scratch (id, source, raw_json, created_at)
+            VALUES (?, 'test', '{}', datetime('now', '-2 days'))
+        """, [(f"old_{i}",) for i in range(5)])
+        await conn.commit()
+        await self.db_manager.upsert_json("fresh", "test", {"fresh": True})
+
+        with patch("json_storage.CLEANUP_BATCH_ROWS", 2):
+            deleted = await self.db_manager.cleanup_old_data(days=1)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(await self.db_manager.load_json("fresh"), {"fresh": True})
+
     async def test_json_validation(self):
         """Test that non-JSON-serializable data raises ValueError."""
         # Test with a function (not JSON-serializable)
@@ -254,6 +552,24 @@ class TestJsonStorageSync(unittest.TestCase):
         self.assertEqual(len(recent), 1)
         self.assertEqual(recent[0], test_data)
 
+    def test_sync_manager_per_thread_connections(self):
+        """Test that the sqlite3-backed manager works across threads and codecs."""
+        import threading
+        from json_storage import SyncDatabaseManager
+
+        manager = SyncDatabaseManager(Path(self.temp_db.name))
+        large = {"rows": list(range(500))}
+        manager.upsert_json("large", "sync", large)
+
+        loaded = []
+        worker = threading.Thread(target=lambda: loaded.append(manager.load_json("large")))
+        worker.start()
+        worker.join()
+
+        self.assertEqual(loaded, [large])
+        self.assertEqual(manager.query_recent("sync"), [large])
+        self.assertIsNone(manager.load_json("missing"))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -167,7 +167,57 @@ class TestLLMBrief(unittest.IsolatedAsyncioTestCase):
             events, signals = reduce_events(large_events, MOCK_SIGNALS, 1000)  # Small cap
             self.assertLess(len(events), len(large_events))  # Should be reduced
             self.assertIn("reduction_info", signals)  # Should have reduction info
-    
+
+    async def test_reduced_input_fits_token_cap(self):
+        """Test that reduction of distinct events lands under the token cap."""
+        distinct_events = [
+            NormalizedEvent(
+                event_id=f"tx{i}:0",
+                wallet=f"0x{i % 7}",
+                event_type="lp_add",
+                pool=f"pool{i % 3}",
+                value={"usd_value": i},
+                timestamp=MOCK_EVENT.timestamp,
+                source_id="source123",
+                chain="base"
+            )
+            for i in range(500)
+        ]
+
+        events, signals = reduce_events(distinct_events, dict(MOCK_SIGNALS), 2000)
+        rollups = {k: v for k, v in signals.items() if k != "reduction_info"}
+
+        self.assertLess(len(events), len(distinct_events))
+        self.assertGreater(len(events), 10)
+        self.assertLessEqual(estimate_tokens(events, rollups), 2000)
+
+    async def test_reduction_keeps_important_events(self):
+        """Test a few oversized events early in the list never cost important ones."""
+        def make(event_id, wallet, note=""):
+            return NormalizedEvent(
+                event_id=event_id,
+                wallet=wallet,
+                event_type="lp_add",
+                pool=None,
+                value={"usd_value": 1, "note": note},
+                timestamp=MOCK_EVENT.timestamp,
+                source_id="source123",
+                chain="base"
+            )
+
+        # First and last event per wallet are kept; the bulky ones sit between
+        bulky = [make(f"bulky{i}", "0xw", "x" * 2000) for i in range(5)]
+        important = [make(f"k{i}", f"0xk{i}") for i in range(30)]
+        events = [make("first", "0xw"), *bulky, make("last", "0xw"), *important]
+
+        events_out, signals = reduce_events(events, dict(MOCK_SIGNALS), 3000)
+        rollups = {k: v for k, v in signals.items() if k != "reduction_info"}
+        kept = {e.event_id for e in events_out}
+
+        self.assertTrue({"first", "last"} | {e.event_id for e in important} <= kept)
+        self.assertLess(len(events_out), len(events))
+        self.assertLessEqual(estimate_tokens(events_out, rollups), 3000)
+
     async def test_persistence(self):
         """Test that all LLM fields are persisted correctly."""
         with patch("nodes.config.BRIEF_MODE", "both"), \
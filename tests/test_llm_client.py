@@ -0,0 +1,637 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM client: response cache, streaming, batch fan-out, Batch API,
+prompt caching, pooling and log buffering.
+"""
+
+import unittest
+import asyncio
+import tempfile
+import time
+import json
+import sys
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import llm_client
+import json_storage
+from llm_client import llm_call, HAIKU_MODEL
+
+MESSAGES = [
+    {"role": "system", "content": "You are a concise planner."},
+    {"role": "user", "content": "Plan a wallet scan."}
+]
+
+
+class TestLLMResponseCache(unittest.IsolatedAsyncioTestCase):
+    """Test that repeated requests are served from the cache."""
+    
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_db.close()
+        
+        self.client = MagicMock()
+        self.client.ainvoke = AsyncMock(return_value=SimpleNamespace(
+            content="scan the wallet",
+            response_metadata={"token_usage": {"prompt_tokens": 40, "completion_tokens": 10}}
+        ))
+        
+        self.patchers = [
+            patch('json_storage.DB_PATH', Path(self.temp_db.name)),
+            patch('json_storage._db_manager', None),
+            patch.object(llm_client, 'HAIKU_CLIENT', self.client),
+            patch.object(llm_client, '_log_interaction'),
+            patch.object(llm_client, '_response_cache', llm_client.OrderedDict()),
+            # A deterministic client, so default calls are cacheable
+            patch.dict(llm_client._MODEL_TEMPERATURES, {HAIKU_MODEL: 0.0}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+    
+    async def asyncTearDown(self):
+        await json_storage.close_db()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        Path(self.temp_db.name).unlink(missing_ok=True)
+    
+    async def test_repeat_call_hits_cache(self):
+        """Test an identical request is answered without calling the model."""
+        first = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        second = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        
+        self.client.ainvoke.assert_awaited_once()
+        self.assertNotIn("cached", first)
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["text"], "scan the wallet")
+        self.assertEqual(second["estimated_cost"], 0.0)
+        
+        # A different max_tokens is a different request
+        await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=200)
+        self.assertEqual(self.client.ainvoke.await_count, 2)
+    
+    async def test_cache_persists_across_processes(self):
+        """Test a response stored in json_storage survives losing the memory tier."""
+        await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        llm_client._response_cache.clear()
+        
+        result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        self.assertTrue(result["cached"])
+        self.client.ainvoke.assert_awaited_once()
+    
+    async def test_expired_and_disabled_cache(self):
+        """Test expired entries and a zero TTL both go to the model."""
+        await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        
+        with patch.object(llm_client, 'LLM_CACHE_TTL', 0):
+            await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        self.assertEqual(self.client.ainvoke.await_count, 2)
+        
+        with patch.object(llm_client.time, 'time', return_value=llm_client.time.time() + 2 * llm_client.LLM_CACHE_TTL):
+            await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        self.assertEqual(self.client.ainvoke.await_count, 3)
+
+    async def test_whitespace_variants_share_entry(self):
+        """Test prompts differing only in whitespace hit the same entry."""
+        await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        spaced = [{"role": m["role"], "content": f"\n  {m['content']}  \n"} for m in MESSAGES]
+        result = await llm_call(spaced, model=HAIKU_MODEL, max_tokens=100)
+        
+        self.assertTrue(result["cached"])
+        self.client.ainvoke.assert_awaited_once()
+    
+    async def test_sampling_temperature_bypasses_cache(self):
+        """Test calls asking for temperature > 0 always reach the model."""
+        for _ in range(2):
+            result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100, temperature=0.7)
+            self.assertNotIn("cached", result)
+        self.assertEqual(self.client.ainvoke.await_count, 2)
+        
+        await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100, temperature=0)
+        result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100, temperature=0)
+        self.assertTrue(result["cached"])
+    
+    async def test_client_default_temperature_bypasses_cache(self):
+        """Test calls left at a sampling client's default temperature are not cached."""
+        with patch.dict(llm_client._MODEL_TEMPERATURES, {HAIKU_MODEL: 0.2}):
+            for _ in range(2):
+                result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+                self.assertNotIn("cached", result)
+            self.assertEqual(self.client.ainvoke.await_count, 2)
+            
+            # An explicit temperature=0 overrides the default and is cached
+            await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100, temperature=0)
+            result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100, temperature=0)
+            self.assertTrue(result["cached"])
+            self.assertEqual(self.client.ainvoke.await_count, 3)
+
+    async def test_stream_stops_when_array_complete(self):
+        """Test stop_when ends the stream early and the cut reply is not cached."""
+        pieces = ['Here: [{"result": ', '"built"}', ']', ' Let me explain', ' at length']
+        read = []
+        closed = []
+
+        async def stream():
+            try:
+                for piece in pieces:
+                    read.append(piece)
+                    yield SimpleNamespace(content=piece, usage_metadata=None)
+            finally:
+                closed.append(True)
+
+        self.client.astream = MagicMock(return_value=stream())
+        result = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100,
+                                stop_when=llm_client.json_array_complete)
+
+        self.assertEqual(result["text"], 'Here: [{"result": "built"}]')
+        self.assertEqual(len(read), 3)
+        self.assertEqual(closed, [True])
+        self.assertTrue(result["usage"]["estimated"])
+        self.assertGreater(result["estimated_cost"], 0.0)
+        self.client.ainvoke.assert_not_awaited()
+        self.assertEqual(len(llm_client._response_cache), 0)
+
+    async def test_identical_inflight_calls_coalesce(self):
+        """Test concurrent identical calls share one request, even with the cache off."""
+        release = asyncio.Event()
+
+        async def slow_invoke(*args, **kwargs):
+            await release.wait()
+            return SimpleNamespace(content="scan the wallet", response_metadata={
+                "token_usage": {"prompt_tokens": 40, "completion_tokens": 10}})
+
+        self.client.ainvoke = AsyncMock(side_effect=slow_invoke)
+        with patch.object(llm_client, 'LLM_CACHE_TTL', 0):
+            calls = [asyncio.create_task(llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100))
+                     for _ in range(3)]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*calls)
+
+            self.client.ainvoke.assert_awaited_once()
+            self.assertEqual({r["text"] for r in results}, {"scan the wallet"})
+            self.assertEqual([r.get("coalesced", False) for r in results], [False, True, True])
+            self.assertEqual(results[1]["estimated_cost"], 0.0)
+            self.assertEqual(llm_client._inflight, {})
+
+            # Once the first call finished, the next identical call goes out again
+            await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+            self.assertEqual(self.client.ainvoke.await_count, 2)
+
+    async def test_coalesced_callers_share_failure(self):
+        """Test a failing in-flight call raises for every caller waiting on it."""
+        release = asyncio.Event()
+
+        async def failing_invoke(*args, **kwargs):
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        self.client.ainvoke = AsyncMock(side_effect=failing_invoke)
+        with patch.object(llm_client, '_log_error', AsyncMock()):
+            calls = [asyncio.create_task(llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100))
+                     for _ in range(2)]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*calls, return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.client.ainvoke.assert_awaited_once()
+        self.assertEqual(llm_client._inflight, {})
+
+    async def test_bound_caller_reuses_system_turn(self):
+        """Test make_llm_caller sends its fixed system prompt and shares the cache."""
+        worker = llm_client.make_llm_caller(MESSAGES[0]["content"], model=HAIKU_MODEL, max_tokens=100)
+        
+        first = await worker(MESSAGES[1]["content"])
+        plain = await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100)
+        
+        sent = self.client.ainvoke.await_args.args[0]
+        self.assertIs(sent[0], llm_client._system_message(MESSAGES[0]["content"]))
+        self.assertEqual(sent[1].content, MESSAGES[1]["content"])
+        self.assertEqual(first["text"], "scan the wallet")
+        self.assertTrue(plain["cached"])
+        
+        await worker(MESSAGES[1]["content"], max_tokens=200)
+        self.assertEqual(self.client.ainvoke.await_args.kwargs["max_tokens"], 200)
+
+    async def test_llm_call_stream_yields_chunks_then_result(self):
+        """Test llm_call_stream yields text as it arrives, then caches the full reply."""
+        async def stream():
+            for piece in ["scan ", "the ", "wallet"]:
+                yield SimpleNamespace(content=piece, usage_metadata=None)
+            yield SimpleNamespace(content="", usage_metadata={
+                "input_tokens": 40, "output_tokens": 10, "total_tokens": 50})
+
+        self.client.astream = MagicMock(return_value=stream())
+        pieces = [p async for p in llm_client.llm_call_stream(MESSAGES, model=HAIKU_MODEL, max_tokens=100)]
+
+        self.assertEqual(pieces[:3], ["scan ", "the ", "wallet"])
+        self.assertEqual(pieces[-1]["text"], "scan the wallet")
+        self.assertEqual(pieces[-1]["usage"]["total_tokens"], 50)
+        llm_client._log_interaction.assert_called_once()
+
+        # The full reply was written back, so llm_call and a second stream hit the cache
+        self.assertTrue((await llm_call(MESSAGES, model=HAIKU_MODEL, max_tokens=100))["cached"])
+        again = [p async for p in llm_client.llm_call_stream(MESSAGES, model=HAIKU_MODEL, max_tokens=100)]
+        self.assertEqual(again[0], "scan the wallet")
+        self.assertTrue(again[-1]["cached"])
+        self.client.astream.assert_called_once()
+        self.client.ainvoke.assert_not_awaited()
+
+    def test_json_array_complete(self):
+        """Test the stop predicate only fires on a parseable closed array."""
+        self.assertFalse(llm_client.json_array_complete('[{"a": [1]'))
+        self.assertFalse(llm_client.json_array_complete('no array ]'))
+        self.assertTrue(llm_client.json_array_complete('ok [1, 2] '))
+
+
+class TestNodeCallCaching(unittest.IsolatedAsyncioTestCase):
+    """Test agent nodes make cacheable calls at the clients' real temperatures."""
+    
+    async def asyncSetUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_db.close()
+        
+        self.release = asyncio.Event()
+        self.release.set()
+        
+        async def invoke(messages, **kwargs):
+            await self.release.wait()
+            return SimpleNamespace(
+                content='["Scan the wallet", "Summarize the scan"]',
+                response_metadata={"token_usage": {"prompt_tokens": 40, "completion_tokens": 10}}
+            )
+        
+        self.client = MagicMock()
+        self.client.ainvoke = AsyncMock(side_effect=invoke)
+        
+        self.patchers = [
+            patch('json_storage.DB_PATH', Path(self.temp_db.name)),
+            patch('json_storage._db_manager', None),
+            patch.object(llm_client, 'HAIKU_CLIENT', self.client),
+            patch.object(llm_client, 'SONNET_CLIENT', self.client),
+            patch.object(llm_client, '_log_interaction'),
+            patch.object(llm_client, '_response_cache', llm_client.OrderedDict()),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+    
+    async def asyncTearDown(self):
+        await json_storage.close_db()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        Path(self.temp_db.name).unlink(missing_ok=True)
+    
+    def _state(self):
+        import datetime
+        return {
+            "goal": "Scan a wallet",
+            "plan": [],
+            "current_step": 0,
+            "completed_actions": [],
+            "messages": [],
+            "status": "planning",
+            "spent_today": 0.0,
+            "last_date": datetime.date.today().isoformat()
+        }
+    
+    async def test_repeat_planner_call_hits_cache(self):
+        """Test planning the same goal twice calls the model once."""
+        from agent import step_planner_node
+        
+        first = await step_planner_node(self._state())
+        second = await step_planner_node(self._state())
+        
+        self.client.ainvoke.assert_awaited_once()
+        self.assertEqual(self.client.ainvoke.await_args.kwargs["temperature"], 0)
+        self.assertEqual(second["plan"], first["plan"])
+        self.assertGreater(first["spent_today"], 0.0)
+        self.assertEqual(second["spent_today"], 0.0)
+    
+    async def test_concurrent_planner_calls_coalesce(self):
+        """Test simultaneous planner runs for one goal share a single request."""
+        from agent import step_planner_node
+        
+        self.release.clear()
+        with patch.object(llm_client, 'LLM_CACHE_TTL', 0):
+            runs = [asyncio.create_task(step_planner_node(self._state())) for _ in range(3)]
+            await asyncio.sleep(0)
+            self.release.set()
+            results = await asyncio.gather(*runs)
+        
+        self.client.ainvoke.assert_awaited_once()
+        self.assertEqual({tuple(r["plan"]) for r in results}, {("Scan the wallet", "Summarize the scan")})
+        self.assertEqual(sorted(r["spent_today"] > 0 for r in results), [False, False, True])
+
+
+class TestLLMCallBatch(unittest.IsolatedAsyncioTestCase):
+    """Test concurrent fan-out of independent calls."""
+    
+    async def asyncSetUp(self):
+        self.patchers = [
+            patch.object(llm_client, 'LLM_BATCH_BASE_DELAY', 0),
+            patch.object(llm_client.random, 'uniform', return_value=0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+    
+    async def asyncTearDown(self):
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+    
+    async def test_results_ordered_and_concurrency_bounded(self):
+        """Test results keep input order and no more than max_concurrency run at once."""
+        in_flight = []
+        peak = []
+        
+        async def fake_llm_call(messages, **kwargs):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            # Later prompts finish first
+            await asyncio.sleep(0.01 * (10 - int(messages[0]["content"])))
+            in_flight.pop()
+            return {"text": messages[0]["content"], "max_tokens": kwargs["max_tokens"]}
+        
+        prompts = [[{"role": "user", "content": str(i)}] for i in range(6)]
+        with patch.object(llm_client, 'llm_call', fake_llm_call):
+            results = await llm_client.llm_call_batch(prompts, max_concurrency=3, max_tokens=50)
+        
+        self.assertEqual([r["text"] for r in results], [str(i) for i in range(6)])
+        self.assertEqual(max(peak), 3)
+        self.assertTrue(all(r["max_tokens"] == 50 for r in results))
+    
+    async def test_transient_failure_retried(self):
+        """Test a failed attempt is retried and a persistent failure is reported."""
+        flaky = AsyncMock(side_effect=[RuntimeError("429"), {"text": "ok"}])
+        with patch.object(llm_client, 'llm_call', flaky):
+            results = await llm_client.llm_call_batch([MESSAGES])
+        self.assertEqual(results, [{"text": "ok"}])
+        
+        broken = AsyncMock(side_effect=RuntimeError("down"))
+        with patch.object(llm_client, 'llm_call', broken):
+            results = await llm_client.llm_call_batch([MESSAGES], return_exceptions=True)
+            self.assertIsInstance(results[0], RuntimeError)
+            self.assertEqual(broken.await_count, llm_client.LLM_BATCH_RETRIES)
+            with self.assertRaises(RuntimeError):
+                await llm_client.llm_call_batch([MESSAGES])
+
+
+class TestLLMBatchAPI(unittest.IsolatedAsyncioTestCase):
+    """Test submitting and collecting Batch API jobs through LiteLLM."""
+    
+    async def asyncSetUp(self):
+        self.requests = []
+        self.polls = 0
+        
+        def handler(request):
+            self.requests.append(request)
+            path = request.url.path
+            if path == "/v1/files":
+                return httpx.Response(200, json={"id": "file-in"})
+            if path == "/v1/batches":
+                return httpx.Response(200, json={"id": "batch-1", "status": "validating"})
+            if path == "/v1/batches/batch-1":
+                self.polls += 1
+                status = "completed" if self.polls > 1 else "in_progress"
+                return httpx.Response(200, json={"id": "batch-1", "status": status,
+                                                 "output_file_id": "file-out"})
+            if path == "/v1/files/file-out/content":
+                lines = [
+                    {"custom_id": "a", "response": {"body": {
+                        "model": "claude-3-haiku-20240307",
+                        "choices": [{"message": {"content": "done"}}],
+                        "usage": {"prompt_tokens": 1000, "completion_tokens": 100}}}},
+                    {"custom_id": "b", "error": {"message": "overloaded"}},
+                ]
+                return httpx.Response(200, content="\n".join(json.dumps(l) for l in lines))
+            return httpx.Response(404)
+        
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.patchers = [
+            patch.object(llm_client, 'HTTP_CLIENT', self.http),
+            patch.object(llm_client, 'LOGS_DIR', Path(tempfile.mkdtemp())),
+            patch.object(llm_client, 'BATCH_POLL_SECONDS', 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+    
+    async def asyncTearDown(self):
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        await self.http.aclose()
+    
+    async def test_submit_and_collect(self):
+        """Test jobs round-trip by custom_id at the batch discount."""
+        batch_id = await llm_client.llm_batch_submit([("a", MESSAGES), ("b", MESSAGES)])
+        self.assertEqual(batch_id, "batch-1")
+        self.assertIn("batch-1", llm_client.pending_batches())
+        
+        uploaded = self.requests[0].content
+        self.assertIn(b'"custom_id":"a"', uploaded.replace(b" ", b""))
+        self.assertEqual(json.loads(self.requests[1].content)["input_file_id"], "file-in")
+        
+        results = await llm_client.llm_batch_collect(batch_id)
+        self.assertEqual(self.polls, 2)
+        self.assertEqual(results["a"]["text"], "done")
+        self.assertAlmostEqual(
+            results["a"]["estimated_cost"],
+            llm_client.estimate_cost("haiku", results["a"]["usage"]) * llm_client.BATCH_DISCOUNT
+        )
+        self.assertIn("error", results["b"])
+        self.assertEqual(llm_client.pending_batches(), {})
+
+
+class TestPromptCaching(unittest.TestCase):
+    """Test Anthropic prompt-cache marking and billing."""
+    
+    def test_long_system_prompt_marked(self):
+        """Test only system prompts long enough to cache get cache_control."""
+        short = llm_client._system_message("You are a precise worker.")
+        self.assertEqual(short.content, "You are a precise worker.")
+        
+        long_prompt = "x" * llm_client.PROMPT_CACHE_MIN_CHARS
+        block = llm_client._system_message(long_prompt).content[0]
+        self.assertEqual(block["text"], long_prompt)
+        self.assertEqual(block["cache_control"], {"type": "ephemeral"})
+    
+    def test_system_message_reused(self):
+        """Test a repeated system prompt is converted once, per threshold."""
+        prompt = "You are a precise worker."
+        self.assertIs(llm_client._system_message(prompt), llm_client._system_message(prompt))
+        
+        with patch.object(llm_client, 'PROMPT_CACHE_MIN_CHARS', 1):
+            self.assertEqual(llm_client._system_message(prompt).content[0]["text"], prompt)
+        self.assertEqual(llm_client._system_message(prompt).content, prompt)
+    
+    def test_cache_tokens_billed_at_cache_rates(self):
+        """Test cache reads and writes are priced separately from fresh input."""
+        pricing = llm_client.PRICING["sonnet"]
+        usage = {"prompt_tokens": 3000, "completion_tokens": 100,
+                 "cache_read_input_tokens": 2000, "cache_creation_input_tokens": 500}
+        expected = (500 * pricing["in"] + 2000 * pricing["cache_read"]
+                    + 500 * pricing["cache_write"] + 100 * pricing["out"])
+        self.assertAlmostEqual(llm_client.estimate_cost("sonnet", usage), expected)
+        
+        plain = {"prompt_tokens": 3000, "completion_tokens": 100}
+        self.assertAlmostEqual(llm_client.estimate_cost("sonnet", plain),
+                               3000 * pricing["in"] + 100 * pricing["out"])
+
+
+class TestSharedHTTPClient(unittest.TestCase):
+    """Test the LiteLLM connection pool is shared."""
+    
+    def test_model_clients_share_pool(self):
+        """Test both model clients send through the one pooled httpx client."""
+        for client in (llm_client.HAIKU_CLIENT, llm_client.SONNET_CLIENT):
+            self.assertIs(client.root_async_client._client, llm_client.HTTP_CLIENT)
+            self.assertIs(client.root_client._client, llm_client._sync_http)
+    
+    def test_langchain_loaded_on_first_use(self):
+        """Test importing the client does not import LangChain."""
+        code = ("import sys, llm_client; loaded = 'langchain_openai' in sys.modules; "
+                "llm_client.HAIKU_CLIENT; print(loaded, 'langchain_openai' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=Path(__file__).parent.parent, check=True)
+        self.assertEqual(result.stdout.split()[-2:], ["False", "True"])
+
+
+class TestLLMLogBuffer(unittest.IsolatedAsyncioTestCase):
+    """Test that call logs are written in batches."""
+    
+    async def asyncSetUp(self):
+        self.logs_dir = Path(tempfile.mkdtemp())
+        self.patchers = [
+            patch.object(llm_client, 'LOGS_DIR', self.logs_dir),
+            patch.object(llm_client, 'LLM_CACHE_TTL', 0),
+            patch.object(llm_client, '_log_buffer', {}),
+            patch.object(llm_client, '_log_paths', {}),
+            patch.object(llm_client, '_log_timer', None),
+            patch.object(llm_client, '_log_fds', {}),
+            patch.object(llm_client, '_stats_date', None),
+            patch.object(llm_client, '_stats', {}),
+            patch.object(llm_client, '_today_cache', (0.0, llm_client.datetime.date.min)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+    
+    async def asyncTearDown(self):
+        llm_client._close_log_files()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+    
+    def _lines(self, prefix):
+        return [json.loads(line) for path in self.logs_dir.glob(f"{prefix}-*.jsonl")
+                for line in path.read_text().splitlines()]
+    
+    async def test_call_logs_batched(self):
+        """Test call records stay buffered until the batch is due."""
+        client = MagicMock()
+        client.ainvoke = AsyncMock(return_value=SimpleNamespace(
+            content="ok", response_metadata={"token_usage": {"prompt_tokens": 5, "completion_tokens": 1}}
+        ))
+        with patch.object(llm_client, 'HAIKU_CLIENT', client), \
+             patch.object(llm_client, 'LOG_FLUSH_ENTRIES', 3), \
+             patch.object(llm_client, 'LOG_FLUSH_SECONDS', 3600), \
+             patch.object(llm_client, '_log_last_flush', llm_client.time.monotonic()):
+            for _ in range(2):
+                await llm_call(MESSAGES, model=HAIKU_MODEL)
+            self.assertEqual(self._lines("llm-calls"), [])
+            
+            await llm_call(MESSAGES, model=HAIKU_MODEL)
+            self.assertEqual(len(self._lines("llm-calls")), 3)
+            
+            await llm_call(MESSAGES, model=HAIKU_MODEL)
+            self.assertEqual(llm_client.get_model_stats()["total_calls"], 4)
+    
+    def test_model_stats_seeded_once_then_incremental(self):
+        """Test stats scan today's log once and then track calls in memory."""
+        path = llm_client._daily_log_path("calls")
+        path.write_bytes(b'{"model": "haiku", "estimated_cost": 0.5}\nnot json\n')
+        
+        with patch.object(llm_client, '_scan_model_stats', wraps=llm_client._scan_model_stats) as scan:
+            self.assertEqual(llm_client.get_model_stats()["total_calls"], 1)
+            llm_client._log_interaction("sonnet", [("user", "hi")], "ok",
+                                        {"prompt_tokens": 10, "completion_tokens": 2})
+            stats = llm_client.get_model_stats()
+        
+        scan.assert_called_once()
+        self.assertEqual(stats["total_calls"], 2)
+        self.assertEqual(stats["model_breakdown"], {"haiku": 1, "sonnet": 1})
+        self.assertAlmostEqual(stats["total_cost"], 0.5 + llm_client.estimate_cost("sonnet", {
+            "prompt_tokens": 10, "completion_tokens": 2}))
+        
+        # Returned stats are a copy
+        stats["model_breakdown"]["haiku"] = 99
+        self.assertEqual(llm_client.get_model_stats()["model_breakdown"]["haiku"], 1)
+    
+    def test_response_preview_only_truncates_long_text(self):
+        """Test the logged preview keeps short replies and cuts long ones."""
+        usage = {"prompt_tokens": 1, "completion_tokens": 1}
+        llm_client._log_interaction("haiku", [("user", "hi")], "x" * 200, usage)
+        llm_client._log_interaction("haiku", [("user", "hi")], "y" * 201, usage)
+        llm_client.flush_llm_logs()
+        
+        short, long = [entry["response"] for entry in self._lines("llm-calls")]
+        self.assertEqual(short["text"], "x" * 200)
+        self.assertEqual(long["text"], "y" * 200 + "...")
+        self.assertEqual(long["full_text"], "y" * 201)
+    
+    def test_timer_flushes_idle_buffer(self):
+        """Test a buffered line reaches disk without a later call, via one open descriptor."""
+        path = llm_client._daily_log_path("calls")
+        with patch.object(llm_client, 'LOG_FLUSH_SECONDS', 0.05):
+            llm_client._queue_log_line(path, {"n": 1})
+            for _ in range(100):
+                if self._lines("llm-calls"):
+                    break
+                time.sleep(0.01)
+        self.assertEqual(self._lines("llm-calls"), [{"n": 1}])
+        self.assertIsNone(llm_client._log_timer)
+        
+        fd = llm_client._log_fds[path]
+        llm_client._queue_log_line(path, {"n": 2})
+        llm_client.flush_llm_logs()
+        self.assertEqual(llm_client._log_fds[path], fd)
+        self.assertEqual(len(self._lines("llm-calls")), 2)
+    
+    def test_daily_log_path_follows_date(self):
+        """Test the log path is reused within a day and rebuilt on a new one."""
+        path = llm_client._daily_log_path("calls")
+        self.assertIs(llm_client._daily_log_path("calls"), path)
+        self.assertEqual(path.name, f"llm-calls-{llm_client.datetime.date.today().isoformat()}.jsonl")
+        self.assertTrue(llm_client.utc_timestamp().endswith("Z"))
+        
+        # The date is cached until midnight, so only a clock past it rolls over
+        tomorrow = llm_client.datetime.date.today() + llm_client.datetime.timedelta(days=1)
+        with patch.object(llm_client.datetime, 'date', MagicMock(today=MagicMock(return_value=tomorrow))):
+            self.assertIs(llm_client._daily_log_path("calls"), path)
+            with patch.object(llm_client.time, 'time', return_value=llm_client._today_cache[0]):
+                self.assertEqual(llm_client._daily_log_path("calls").name, f"llm-calls-{tomorrow.isoformat()}.jsonl")
+    
+    def test_utc_timestamp_format(self):
+        """Test timestamps match datetime's ISO 8601 output."""
+        with patch.object(llm_client.time, 'time', return_value=1700000000.25):
+            self.assertEqual(llm_client.utc_timestamp(), "2023-11-14T22:13:20.250000Z")
+            self.assertEqual(llm_client.utc_timestamp(), "2023-11-14T22:13:20.250000Z")
+    
+    async def test_error_logged_immediately(self):
+        """Test a failed call's record is on disk when the error is raised."""
+        client = MagicMock()
+        client.ainvoke = AsyncMock(side_effect=RuntimeError("gateway down"))
+        with patch.object(llm_client, 'HAIKU_CLIENT', client), \
+             patch.object(llm_client, 'LOG_FLUSH_SECONDS', 3600):
+            with self.assertRaises(RuntimeError):
+                await llm_call(MESSAGES, model=HAIKU_MODEL)
+        
+        errors = self._lines("llm-errors")
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["error"], "gateway down")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -360,6 +360,24 @@ class TestPlannerWorker(unittest.IsolatedAsyncioTestCase):
         signals = result["signals"]
         self.assertIsInstance(signals, dict)
     
+    async def test_analyze_wallet_signals(self):
+        """Test wallet recon signals across legacy and Bitquery-style events."""
+        from nodes.analyze import compute_wallet_signals
+        
+        events = [
+            {"kind": "lp_add", "usd": 1000.0, "pool": "0xpool_b"},
+            {"type": "swap", "usd": 250.0, "direction": "in", "token_address": "0xpool_a"},
+            {"type": "swap", "usd": 400.0, "direction": "out", "pool": "0xpool_b"},
+            {"kind": "lp_remove", "usd": 300.0, "direction": "out"},
+            {"type": "transfer", "usd": None, "raw": {"covalent_tx": {"to_address": "0x0000000000000000000000000000000000000000"}}},
+        ]
+        
+        signals = compute_wallet_signals(events)
+        self.assertEqual(signals["net_lp_usd_24h"], 950.0)
+        self.assertEqual(signals["new_pools_touched_24h"], ["0xpool_b", "0xpool_a"])
+        
+        self.assertEqual(compute_wallet_signals([]), {"net_lp_usd_24h": 0.0, "new_pools_touched_24h": []})
+    
     async def test_brief_gate_emit_vs_skip(self):
         """Test brief gate behavior (emit/skip)."""
         from nodes.brief import brief_node
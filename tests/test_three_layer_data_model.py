@@ -6,18 +6,19 @@ Tests for the three-layer data model.
 import unittest
 import asyncio
 import tempfile
+import io
 import json
+from dataclasses import asdict
 from pathlib import Path
 from unittest.mock import patch
 
 import sys
-from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from data_model import (
     ThreeLayerDataModel, NormalizedEvent, Artifact,
     save_raw_response, normalize_event, persist_brief,
-    get_events_by_wallet, get_recent_briefs
+    get_events_by_wallet, get_recent_briefs, compute_content_hash
 )
 
 
@@ -63,6 +64,73 @@ class TestThreeLayerDataModel(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(loaded["wallet"], "0x123")
         self.assertEqual(loaded["_provenance"]["source"], "mock_tools")
     
+    async def test_layer1_raw_response_wide_integers(self):
+        """Test Layer 1: Raw payloads with wei-sized integers round-trip."""
+        test_data = {"wallet": "0x123", "amount_wei": 2 ** 80, 7: "int key"}
+        await self.data_model.save_raw_response("wide_ints", "wallet_activity", test_data)
+        
+        loaded = await self.data_model.get_raw_response("wide_ints")
+        self.assertEqual(loaded["amount_wei"], 2 ** 80)
+        self.assertEqual(loaded["7"], "int key")
+    
+    async def test_layer1_content_hash_skips_unchanged(self):
+        """Test Layer 1: A matching content hash skips the rewrite."""
+        test_data = {"wallet": "0x123", "events": []}
+        content_hash = compute_content_hash(test_data)
+        self.assertEqual(content_hash, compute_content_hash({"events": [], "wallet": "0x123"}))
+        
+        await self.data_model.save_raw_response(
+            "hashed_response", "wallet_activity", test_data, {"run": 1}, content_hash=content_hash
+        )
+        await self.data_model.save_raw_response(
+            "hashed_response", "wallet_activity", test_data, {"run": 2}, content_hash=content_hash
+        )
+        loaded = await self.data_model.get_raw_response("hashed_response")
+        self.assertEqual(loaded["_provenance"]["run"], 1)
+        
+        # A different payload is written through
+        changed = {"wallet": "0x123", "events": [{"txHash": "0xabc"}]}
+        await self.data_model.save_raw_response(
+            "hashed_response", "wallet_activity", changed, {"run": 3},
+            content_hash=compute_content_hash(changed)
+        )
+        loaded = await self.data_model.get_raw_response("hashed_response")
+        self.assertEqual(loaded["_provenance"]["run"], 3)
+    
+    async def test_layer1_content_hash_matches_json_storage(self):
+        """Test Layer 1: Rows written by json_storage carry the same content hash."""
+        from json_storage import DatabaseManager
+        payload = {"wallet": "0x123", "events": [{"txHash": "0xabc"}]}
+        manager = DatabaseManager(Path(self.temp_db.name))
+        await manager.initialize()
+        await manager.upsert_json("shared", "wallet_activity", {"events": payload["events"], "wallet": "0x123"})
+        await manager.close()
+        
+        await self.data_model.save_raw_response(
+            "shared", "wallet_activity", payload, {"run": 2},
+            content_hash=compute_content_hash(payload)
+        )
+        loaded = await self.data_model.get_raw_response("shared")
+        self.assertNotIn("_provenance", loaded)
+    
+    async def test_layer1_reads_compressed_payloads(self):
+        """Test Layer 1: Rows stored compressed by json_storage read back whole."""
+        from json_storage import COMPRESS_MIN_BYTES, DatabaseManager
+        big = {"wallet": "0x123", "events": [{"txHash": f"0x{i:064x}"} for i in range(COMPRESS_MIN_BYTES // 32)]}
+        manager = DatabaseManager(Path(self.temp_db.name))
+        await manager.initialize()
+        await manager.upsert_json("big_source", "wallet_activity", big)
+        await manager.close()
+        
+        self.assertEqual(await self.data_model.get_raw_response("big_source"), big)
+        
+        await self.data_model.persist_brief(Artifact(
+            artifact_id="brief_big", timestamp=1234567890, summary_text="Big",
+            signals={}, discovered_pools=[], source_ids=["big_source"], event_count=0
+        ))
+        chain = await self.data_model.get_provenance_chain("brief_big")
+        self.assertEqual(chain["raw_responses"], [big])
+    
     async def test_layer2_normalize_events(self):
         """Test Layer 2: Normalize events."""
         # Create normalized event
@@ -87,6 +155,56 @@ class TestThreeLayerDataModel(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(events[0].event_type, "swap")
         self.assertEqual(events[0].pool, "WETH/USDC")
     
+    async def test_layer2_normalize_events_bulk(self):
+        """Test Layer 2: Normalize a batch of events in one call."""
+        events = [
+            NormalizedEvent(
+                event_id=f"0xabc:{i}",
+                wallet="0x123",
+                event_type="swap",
+                pool="WETH/USDC",
+                value={"amount": 100 + i},
+                timestamp=1234567890 + i,
+                source_id="test_response",
+                chain="base"
+            )
+            for i in range(3)
+        ]
+        
+        event_ids = await self.data_model.normalize_events_bulk(events)
+        self.assertEqual(event_ids, ["0xabc:0", "0xabc:1", "0xabc:2"])
+        
+        # Re-running the batch upserts rather than duplicating
+        await self.data_model.normalize_events_bulk(events)
+        stored = await self.data_model.get_events_by_wallet("0x123")
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(stored[0].value["amount"], 102)
+        
+        self.assertEqual(await self.data_model.normalize_events_bulk([]), [])
+    
+    async def test_layer2_normalize_events_bulk_jsonl(self):
+        """Test Layer 2: A bulk batch can also be written out as JSONL."""
+        events = [
+            NormalizedEvent(
+                event_id=f"0xdef:{i}",
+                wallet="0x456",
+                event_type="lp_add",
+                pool=None,
+                value={"usd": 10.5 * i},
+                timestamp=1234567890 + i,
+                source_id="test_response"
+            )
+            for i in range(2)
+        ]
+        
+        out = io.BytesIO()
+        event_ids = await self.data_model.normalize_events_bulk(events, out)
+        self.assertEqual(event_ids, ["0xdef:0", "0xdef:1"])
+        
+        lines = out.getvalue().decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [asdict(e) for e in events])
+        self.assertEqual(len(await self.data_model.get_events_by_wallet("0x456")), 2)
+    
     async def test_layer3_persist_briefs(self):
         """Test Layer 3: Persist briefs."""
         # Create artifact
@@ -147,6 +265,78 @@ class TestThreeLayerDataModel(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(chain["raw_responses"]), 1)
         self.assertEqual(len(chain["events"]), 1)
     
+    async def test_provenance_chain_multiple_sources(self):
+        """Test provenance across several sources, including a missing one."""
+        await self.data_model.save_raw_response("source_a", "wallet_activity", {"wallet": "0xa"})
+        await self.data_model.save_raw_response("source_b", "wallet_activity", {"wallet": "0xb"}, {"source": "mock"})
+        await self.data_model.normalize_events_bulk([
+            NormalizedEvent(
+                event_id=f"0x{src}:{i}",
+                wallet="0x123",
+                event_type="swap",
+                pool=None,
+                value={"i": i},
+                timestamp=1234567890 + i,
+                source_id=f"source_{src}"
+            )
+            for src in ("a", "b") for i in range(2)
+        ])
+        await self.data_model.persist_brief(Artifact(
+            artifact_id="brief_multi",
+            timestamp=1234567890,
+            summary_text="Multi-source brief",
+            signals={},
+            discovered_pools=[],
+            source_ids=["source_b", "source_missing", "source_a"],
+            event_count=4
+        ))
+        
+        chain = await self.data_model.get_provenance_chain("brief_multi")
+        self.assertEqual([r["wallet"] for r in chain["raw_responses"]], ["0xb", "0xa"])
+        self.assertEqual(chain["raw_responses"][0]["_provenance"], {"source": "mock"})
+        self.assertEqual(
+            [e["event_id"] for e in chain["events"]],
+            ["0xb:1", "0xb:0", "0xa:1", "0xa:0"]
+        )
+        self.assertEqual(await self.data_model.get_provenance_chain("brief_unknown"), {})
+    
+    async def test_provenance_chain_cache_invalidation(self):
+        """Test that cached provenance chains are refreshed after writes."""
+        await self.data_model.save_raw_response("source_1", "wallet_activity", {"wallet": "0x123"})
+        artifact = Artifact(
+            artifact_id="brief_cached",
+            timestamp=1234567890,
+            summary_text="Cached brief",
+            signals={},
+            discovered_pools=[],
+            source_ids=["source_1"],
+            event_count=0
+        )
+        await self.data_model.persist_brief(artifact)
+        
+        chain = await self.data_model.get_provenance_chain("brief_cached")
+        self.assertEqual(len(chain["events"]), 0)
+        self.assertIs(await self.data_model.get_provenance_chain("brief_cached"), chain)
+        
+        # A new event from the same source must show up in the chain
+        await self.data_model.normalize_event(NormalizedEvent(
+            event_id="0xcached:0",
+            wallet="0x123",
+            event_type="swap",
+            pool="WETH/USDC",
+            value={},
+            timestamp=1234567890,
+            source_id="source_1"
+        ))
+        chain = await self.data_model.get_provenance_chain("brief_cached")
+        self.assertEqual(len(chain["events"]), 1)
+        
+        # Re-persisting the artifact with new sources refreshes its entry
+        artifact.source_ids = ["source_2"]
+        await self.data_model.persist_brief(artifact)
+        chain = await self.data_model.get_provenance_chain("brief_cached")
+        self.assertEqual(chain["raw_responses"], [])
+    
     async def test_idempotent_upserts(self):
         """Test that upserts are idempotent."""
         # Test Layer 1 idempotency